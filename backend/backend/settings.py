@@ -2,6 +2,7 @@
 Django settings for backend project.
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'equipment_api.metrics.MetricsMiddleware',
+    'equipment_api.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -39,6 +42,8 @@ MIDDLEWARE = [
     # CSRF middleware disabled for development (using @csrf_exempt on endpoints instead)
     # 'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'equipment_api.auth.TokenAuthenticationMiddleware',
+    'equipment_api.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -62,13 +67,25 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+# Served through uvicorn, backend.asgi runs the async read views on an event loop
+ASGI_APPLICATION = 'backend.asgi.application'
 
 
 # Database
+# EQUIPMENT_DB_PATH selects another SQLite file (bench_suite.py uses a throwaway one)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('EQUIPMENT_DB_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # WAL lets reads proceed while an upload is writing; IMMEDIATE takes
+            # the write lock when a transaction starts, so concurrent writers
+            # wait for it (up to timeout seconds) instead of failing with
+            # "database is locked" when they try to upgrade a read lock
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 30,
+        },
     }
 }
 
@@ -110,7 +127,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings (dev mode: no auth, no CSRF)
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    # Signed bearer tokens, verified by equipment_api.auth.TokenAuthenticationMiddleware
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'equipment_api.auth.TokenAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
@@ -127,3 +147,83 @@ CORS_ALLOWED_ORIGINS = [
 
 # Do NOT use wildcard with CORS_ALLOW_CREDENTIALS - explicitly list origins above
 CORS_ALLOW_CREDENTIALS = False
+
+# Let browser clients read the per-stage timings and upload back-off hints
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'Retry-After']
+
+
+# Uploaded files are hashed while they stream in (used to deduplicate uploads)
+FILE_UPLOAD_HANDLERS = [
+    'equipment_api.uploads.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+
+# Chunked uploads (see equipment_api/ingest.py)
+# Chunks are kept here only until they have been parsed
+CHUNKED_UPLOAD_ROOT = BASE_DIR / 'upload_chunks'
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # Default chunk size offered to clients
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Per-stage request timings in a Server-Timing header and one JSON log line
+# per request (see equipment_api/timing.py); False removes the middleware
+SERVER_TIMING = True
+
+# Profiles of requests made by staff users with ?profile=1 or X-Profile: 1
+# (see equipment_api/profiling.py)
+PROFILE_ROOT = BASE_DIR / 'profiles'
+
+# Lifetime of the API tokens returned by /api/auth/login/ (seconds)
+AUTH_TOKEN_MAX_AGE = 7 * 24 * 60 * 60
+
+# Threads per process for CSV parsing (see equipment_api/executors.py);
+# None means one per CPU
+CPU_WORKERS = None
+
+# Processes per worker for chart and PDF rendering (see
+# equipment_api/executors.py); None means one per CPU
+PROCESS_WORKERS = None
+
+# Upload admission control (see equipment_api/admission.py)
+INGEST_BATCH_ROWS = 100_000  # rows parsed and stored at a time
+INGEST_MEMORY_BUDGET = 512 * 1024 * 1024  # estimated ingest memory per process (bytes)
+INGEST_MAX_ACTIVE = 2  # concurrent ingestions per process
+INGEST_MAX_GLOBAL = None  # concurrent ingestions across all workers on the host; None = 1 on SQLite, else 4 (0 = no limit)
+INGEST_MAX_QUEUED = 8  # waiting uploads per process before new ones get 429 straight away
+INGEST_QUEUE_TIMEOUT = 30  # seconds an upload waits for capacity before 429
+INGEST_SLOT_ROOT = BASE_DIR / 'ingest_slots'
+UPLOAD_QUOTA_ROWS = 20_000_000  # stored rows per user
+UPLOAD_QUOTA_BYTES = 2 * 1024 * 1024 * 1024  # stored CSV bytes per user
+
+# Uploads per user kept in the trend rollups (see equipment_api/rollups.py),
+# including ones whose datasets retention has deleted
+TREND_WINDOW = 100
+
+# Most rows the admin counts for a filtered equipment changelist; unfiltered
+# lists use the table statistics instead (see equipment_api/paginators.py)
+ADMIN_COUNT_LIMIT = 100000
+
+# Server-Sent Events (see equipment_api/events.py). Events only reach streams
+# served by the worker that published them unless a broker carries them
+# between workers: 'equipment_api.events.SocketBroker' does for all workers on
+# one host (Unix sockets in EVENT_SOCKET_ROOT)
+EVENT_BROKER = None
+EVENT_SOCKET_ROOT = BASE_DIR / 'event_sockets'
+EVENT_QUEUE_SIZE = 100  # undelivered events per stream before it is told to resync
+EVENT_KEEPALIVE = 15  # seconds between keep-alive comments on an idle stream
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'equipment_api.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Engineering limits used by the anomaly endpoint and PDF reports (see
+# equipment_api/anomalies.py): {type or '*': {metric: [min, max]}}, None = unbounded
+EQUIPMENT_LIMITS = {}
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+Latency benchmark for the equipment admin changelist on a large table
+Seeds a throwaway SQLite database with --rows equipment rows spread over
+--datasets datasets (generated in SQL, so 10M rows take minutes rather than
+hours), then renders the changelist for a set of typical views - first and
+a deep page, dataset and type filters, substring and short searches - with
+the admin as configured in equipment_api/admin.py and with the previous
+stock configuration (exact COUNT(*), list_filter = ['type', 'dataset'],
+icontains search, ordering by name). Prints the time and number of queries of each; exits non-zero if
+any view of the current admin takes longer than --max-seconds.
+
+Usage (from the backend directory):
+    python bench_admin.py                            # 1M rows
+    python bench_admin.py --rows 10000000 --db /tmp/admin_10m.sqlite3 --keep
+    python bench_admin.py --db /tmp/admin_10m.sqlite3 --skip-baseline
+        # reuses the database seeded by the previous run
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+SCENARIOS = [
+    # (label, query string)
+    ('first page', ''),
+    ('page 500', 'p=499'),
+    ('dataset filter', 'dataset={dataset}'),
+    ('type filter', 'equipment_type=Reactor'),
+    ('dataset + type', 'dataset={dataset}&equipment_type=Reactor'),
+    ('search "EQ-0123"', 'q=EQ-0123'),
+    ('search "EQ"', 'q=EQ'),
+    ('search, no match', 'q=nothing-like-this'),
+    ('short, in dataset', 'dataset={dataset}&q=zz'),
+]
+
+TYPES = ['Pump', 'Valve', 'Compressor', 'HeatExchanger', 'Reactor', 'Condenser']
+
+
+def seed(connection, rows, datasets):
+    # Datasets through the ORM, equipment rows with a recursive CTE. The FTS
+    # triggers are dropped while loading and the trigram index rebuilt once
+    # afterwards, which is much faster than maintaining it row by row
+    from django.contrib.auth.models import User
+    from equipment_api.ingest import equipment_type_ids
+    from equipment_api.models import Dataset
+    from equipment_api.search import FTS_TABLE
+
+    user = User.objects.create(username='bench')
+    per_dataset = rows // datasets
+    distribution = {t: len(range(i, per_dataset, len(TYPES))) for i, t in enumerate(TYPES)}
+    ids = []
+    for i in range(datasets):
+        dataset = Dataset(name=f'bench_{i}.csv', uploaded_by=user, total_count=per_dataset)
+        dataset.set_type_distribution(distribution)
+        dataset.save()
+        ids.append(dataset.id)
+    type_ids = equipment_type_ids(TYPES)
+    types = ' '.join(f'WHEN {i} THEN {type_ids[t]}' for i, t in enumerate(TYPES))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s", [f'{FTS_TABLE}_%'])
+        triggers = [sql for (sql,) in cursor.fetchall()]
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        for n, dataset_id in enumerate(ids):
+            cursor.execute(
+                'WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i < %s) '
+                'INSERT INTO equipment_api_equipmentdata '
+                '(dataset_id, equipment_name, type_id, flowrate, pressure, temperature) '
+                f"SELECT %s, printf('EQ-%%07d', %s + i), CASE (i %% 6) {types} END, "
+                '100 + (i %% 97), 5 + (i %% 13) / 4.0, 90 + (i %% 53) FROM seq',
+                [per_dataset - 1, dataset_id, n * per_dataset],
+            )
+            print(f'\r  {(n + 1) * per_dataset:,} rows', end='', flush=True)
+        print()
+        if triggers:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            for sql in triggers:
+                cursor.execute(sql)
+    return ids
+
+
+def baseline_admin():
+    # The changelist configuration before it was tuned for large tables
+    from django.contrib import admin
+    from equipment_api.models import EquipmentData
+
+    class StockEquipmentDataAdmin(admin.ModelAdmin):
+        list_display = ['equipment_name', 'type', 'flowrate', 'pressure', 'temperature', 'dataset']
+        list_filter = ['type', 'dataset']
+        search_fields = ['equipment_name', 'type__name']
+
+    return StockEquipmentDataAdmin(EquipmentData, admin.site)
+
+
+def render(model_admin, request_factory, user, query):
+    # Returns (seconds, queries, result count shown)
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    request = request_factory.get(f'/admin/equipment_api/equipmentdata/?{query}')
+    request.user = user
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = model_admin.changelist_view(request)
+        response.render()
+        elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f'?{query} returned {response.status_code}')
+    return elapsed, len(queries), response.context_data['cl'].result_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Admin changelist benchmark')
+    parser.add_argument('--rows', type=int, default=1000000, help='Equipment rows to seed')
+    parser.add_argument('--datasets', type=int, default=100, help='Datasets the rows are spread over')
+    parser.add_argument('--db', help='SQLite file to use; reused if it already holds a seeded database')
+    parser.add_argument('--keep', action='store_true', help='Keep the database file afterwards')
+    parser.add_argument('--skip-baseline', action='store_true', help="Don't time the stock admin")
+    parser.add_argument('--max-seconds', type=float, default=1.0, help='Slowest acceptable changelist view')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_admin.sqlite3')
+    os.environ['EQUIPMENT_DB_PATH'] = path
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+    from django.contrib import admin
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import setup_test_environment
+    from equipment_api.models import Dataset, EquipmentData
+
+    setup_test_environment()
+    reused = os.path.exists(path)
+    call_command('migrate', verbosity=0)
+    try:
+        if reused and EquipmentData.objects.exists():
+            dataset_ids = list(Dataset.objects.order_by('id').values_list('id', flat=True))
+            print(f'Reusing {path}')
+        else:
+            print(f'Seeding {args.rows:,} rows into {path}...')
+            start = time.perf_counter()
+            dataset_ids = seed(connection, args.rows, args.datasets)
+            print(f'  seeded in {time.perf_counter() - start:.0f} s')
+
+        admin_user = User.objects.filter(is_superuser=True).first() or User.objects.create_superuser('bench_admin')
+        request_factory = RequestFactory()
+        admins = [('current', admin.site._registry[EquipmentData])]
+        if not args.skip_baseline:
+            admins.append(('stock', baseline_admin()))
+
+        dataset = dataset_ids[len(dataset_ids) // 2]
+        for _, model_admin in admins:
+            # Template loading and the first connection aren't part of any view
+            render(model_admin, request_factory, admin_user, f'dataset={dataset}')
+        slowest = 0.0
+        print(f'{"view":<20}' + ''.join(f'{name:>28}' for name, _ in admins))
+        for label, query in SCENARIOS:
+            query = query.format(dataset=dataset)
+            cells = []
+            for name, model_admin in admins:
+                seconds, queries, count = render(model_admin, request_factory, admin_user, query)
+                cells.append(f'{seconds * 1000:9.0f} ms {queries:3d} q {count:>10,}')
+                if name == 'current':
+                    slowest = max(slowest, seconds)
+            print(f'{label:<20}' + ''.join(f'{cell:>28}' for cell in cells))
+    finally:
+        connection.close()
+        if not args.keep and not args.db:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    print(f'Slowest view: {slowest * 1000:.0f} ms')
+    if slowest > args.max_seconds:
+        print(f'FAIL: slower than {args.max_seconds} s')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
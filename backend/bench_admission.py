@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+Burst of concurrent large uploads against a real server, to check that upload
+admission control (equipment_api/admission.py) keeps memory bounded.
+Starts gunicorn on a throwaway database, writes one synthetic CSV of --size-mb
+and POSTs it --uploads times at once to /api/upload/ (each copy gets a unique
+first row, so none are deduplicated). Bodies are streamed from disk and
+responses are discarded as they arrive, so the client stays small. Uploads
+refused with 429 are retried after their Retry-After, like a real client.
+Reports the peak RSS of all server processes together (sampled every 100 ms),
+each worker's own peak (VmHWM), the number of 429s and the outcome.
+
+Usage (from the backend directory):
+    python bench_admission.py                      # 20 uploads of 500 MB
+    python bench_admission.py --size-mb 20 --asgi --workers 2
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_suite import ServerTarget, child_pids, vm_hwm_kb
+from synthetic_data import write_csv
+
+BYTES_PER_ROW = 40  # synthetic rows without timestamps, for sizing the file
+MAX_ATTEMPTS = 50
+SAMPLE_INTERVAL = 0.1  # seconds
+
+
+class UploadBody:
+    """
+    multipart/form-data body for one upload, read from the shared CSV file:
+    its header, a row unique to this upload, then the rest of the file.
+    """
+
+    def __init__(self, path, header, tag):
+        self.boundary = uuid.uuid4().hex
+        self.head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="burst_{tag}.csv"\r\n'
+            f'Content-Type: text/csv\r\n\r\n'
+        ).encode('utf-8') + header + f'Burst-{tag},Pump,1,1,1\n'.encode('utf-8')
+        self.tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self.path = path
+        self.header_length = len(header)
+
+    def __len__(self):
+        # requests sends a Content-Length for bodies with a length
+        return len(self.head) + os.path.getsize(self.path) - self.header_length + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        with open(self.path, 'rb') as f:
+            f.seek(self.header_length)
+            while block := f.read(1024 * 1024):
+                yield block
+        yield self.tail
+
+
+def server_rss_kb(master):
+    total = 0
+    for pid in [master, *child_pids(master)]:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+def upload(base_url, path, header, tag, stats, lock):
+    # POST until accepted; returns the final status code
+    for attempt in range(MAX_ATTEMPTS):
+        body = UploadBody(path, header, tag)
+        response = requests.post(
+            f'{base_url}/api/upload/', data=body, stream=True, timeout=3600,
+            headers={'Content-Type': f'multipart/form-data; boundary={body.boundary}'}
+        )
+        if response.status_code not in (201, 429):
+            with lock:
+                stats['errors'].add(response.text[:200])
+            return response.status_code
+        for _ in response.iter_content(1024 * 1024):
+            pass
+        if response.status_code != 429:
+            return response.status_code
+        with lock:
+            stats['rejected'] += 1
+        time.sleep(int(response.headers.get('Retry-After', 1)))
+    return 429
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak server memory under a burst of large uploads')
+    parser.add_argument('--uploads', type=int, default=20, help='Concurrent uploads')
+    parser.add_argument('--size-mb', type=float, default=500, help='Size of each uploaded CSV')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+    parser.add_argument('--asgi', action='store_true', help='Serve with uvicorn workers (concurrent requests per worker)')
+    args = parser.parse_args()
+    args.concurrency = args.uploads
+
+    workdir = tempfile.mkdtemp(prefix='equipment_admission_')
+    target = None
+    try:
+        path = os.path.join(workdir, 'burst.csv')
+        write_csv(path, max(1, int(args.size_mb * 1024 * 1024 / BYTES_PER_ROW)))
+        with open(path, 'rb') as f:
+            header = f.readline()
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        target = ServerTarget(args)
+        master = target.process.pid
+        idle_kb = server_rss_kb(master)
+        peak = {'kb': idle_kb}
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(SAMPLE_INTERVAL):
+                peak['kb'] = max(peak['kb'], server_rss_kb(master))
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        stats, lock = {'rejected': 0, 'errors': set()}, threading.Lock()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.uploads) as pool:
+            codes = list(pool.map(
+                lambda i: upload(target.base_url, path, header, i, stats, lock), range(args.uploads)
+            ))
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+
+        worker_peaks = [vm_hwm_kb(pid) / 1024 for pid in child_pids(master)]
+        print(f'{args.uploads} concurrent uploads of {size_mb:.0f} MB, {args.workers} '
+              f'{"uvicorn" if args.asgi else "sync"} worker(s)')
+        print(f'  outcome: {codes.count(201)} created, {len(codes) - codes.count(201)} failed '
+              f'({sorted(set(codes))}), {stats["rejected"]} 429 responses retried, {elapsed:.0f} s')
+        print(f'  server RSS: {idle_kb / 1024:.0f} MB idle, {peak["kb"] / 1024:.0f} MB peak (all processes)')
+        print(f'  worker peak RSS (VmHWM): {", ".join(f"{mb:.0f} MB" for mb in worker_peaks)}')
+        for error in sorted(stats['errors']):
+            print(f'  error: {error}')
+    finally:
+        if target is not None:
+            target.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Throughput and memory benchmark for the streaming export endpoint
+Fills a throwaway in-memory database with synthetic equipment rows, streams
+/api/export/<id>/<format>/ for every format and reports MB/s and the peak
+Python memory allocated while streaming. Exits non-zero if the peak for the
+full dataset is more than --max-growth times the peak for a quarter of it,
+i.e. if memory use is no longer independent of dataset size.
+
+Usage (from the backend directory):
+    python bench_export.py                 # 200k rows
+    python bench_export.py --rows 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.test.runner import DiscoverRunner
+from equipment_api.export import FORMATS
+from equipment_api.ingest import create_dataset_from_dataframe
+from synthetic_data import generate_frame
+
+
+def stream(client, url):
+    # Returns (bytes received, seconds)
+    start = time.perf_counter()
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} returned {response.status_code}')
+    size = sum(len(chunk) for chunk in response.streaming_content)
+    return size, time.perf_counter() - start
+
+
+def peak_memory(client, url):
+    # Peak traced allocation while streaming, in bytes
+    tracemalloc.start()
+    stream(client, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming export benchmark')
+    parser.add_argument('--rows', type=int, default=200000, help='Rows in the full dataset')
+    parser.add_argument('--max-growth', type=float, default=2.0,
+                        help='Allowed ratio of peak memory between the full and the quarter dataset')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    databases = runner.setup_databases()
+    try:
+        user = User.objects.create(username='demo')
+        print(f'Loading {args.rows} + {args.rows // 4} rows...')
+        full = create_dataset_from_dataframe('bench.csv', user, generate_frame(args.rows))
+        quarter = create_dataset_from_dataframe('bench_small.csv', user, generate_frame(args.rows // 4, seed=1))
+        client = Client()
+
+        failed = False
+        for file_format in FORMATS:
+            url = f'/api/export/{{}}/{file_format}/'
+            try:
+                size, seconds = stream(client, url.format(full.id))
+            except RuntimeError as e:
+                print(f'{file_format:>8}: skipped ({e})')
+                continue
+            small_peak = peak_memory(client, url.format(quarter.id))
+            full_peak = peak_memory(client, url.format(full.id))
+            print(f'{file_format:>8}: {size / 1e6:8.1f} MB in {seconds:6.2f} s = {size / 1e6 / seconds:6.1f} MB/s, '
+                  f'{args.rows / seconds:9.0f} rows/s, peak {full_peak / 1e6:5.1f} MB '
+                  f'({small_peak / 1e6:.1f} MB at {args.rows // 4} rows)')
+            if full_peak > small_peak * args.max_growth:
+                print(f'FAIL: {file_format} peak memory grows with dataset size')
+                failed = True
+    finally:
+        runner.teardown_databases(databases)
+
+    if not failed:
+        print('OK')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Wall-time benchmark for the report bundle endpoint
+Fills a throwaway database with --datasets synthetic datasets twice over (so
+both runs start with cold caches), then fetches the reports of one set one by
+one through /api/report/<id>/ - what clients did before bundles - and of the
+other set in one /api/reports/bundle/ request. Reports the total time of
+each, the bundle's time to first byte and a fully cached bundle. The process
+pool is started before timing, so neither run pays for spawning it.
+
+Bundles render up to PROCESS_WORKERS reports at once (one per CPU by
+default), so the speedup over serial requests grows with the number of cores.
+
+Usage (from the backend directory):
+    python bench_reports.py                          # 8 datasets of 20k rows
+    python bench_reports.py --datasets 16 --rows 100000 --anomalies
+"""
+
+import argparse
+import os
+import time
+
+
+def fetch(client, url):
+    # Returns (seconds to the first body chunk, total seconds, bytes)
+    start = time.perf_counter()
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} returned {response.status_code}')
+    if not response.streaming:
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed, len(response.content)
+    first, size = None, 0
+    for chunk in response.streaming_content:
+        if chunk and first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    return first, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report bundle benchmark')
+    parser.add_argument('--datasets', type=int, default=8, help='Reports per run')
+    parser.add_argument('--rows', type=int, default=20000, help='Rows per dataset')
+    parser.add_argument('--anomalies', action='store_true', help='Include the anomalies section')
+    args = parser.parse_args()
+
+    # Set up here rather than at import: the process pool's workers are spawned
+    # and import this module too, and don't need Django
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.test.runner import DiscoverRunner
+    from equipment_api.executors import PROCESS_WORKERS
+    from equipment_api.ingest import create_dataset_from_dataframe
+    from synthetic_data import generate_frame
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    databases = runner.setup_databases()
+    try:
+        print(f'Loading 2 x {args.datasets} datasets of {args.rows} rows...')
+        # One owner per dataset, so retention (5 per user) keeps them all
+        ids = [
+            create_dataset_from_dataframe(
+                f'bench_{seed}.csv', User.objects.create(username=f'bench_{seed}'), generate_frame(args.rows, seed=seed)
+            ).id
+            for seed in range(2 * args.datasets + 1)
+        ]
+        warmup, serial_ids, bundle_ids = ids[0], ids[1:args.datasets + 1], ids[args.datasets + 1:]
+        query = '?anomalies=1' if args.anomalies else ''
+        client = Client()
+        fetch(client, f'/api/report/{warmup}/{query}')
+
+        serial = sum(fetch(client, f'/api/report/{dataset_id}/{query}')[1] for dataset_id in serial_ids)
+        bundle_url = f'/api/reports/bundle/?ids={",".join(map(str, bundle_ids))}{query.replace("?", "&")}'
+        first, bundle, size = fetch(client, bundle_url)
+        _, cached, _ = fetch(client, bundle_url)
+
+        print(f'{args.datasets} reports, {PROCESS_WORKERS} pool processes, {os.cpu_count()} CPUs')
+        print(f'  serial /api/report/:  {serial:6.2f} s ({serial / args.datasets * 1000:.0f} ms per report)')
+        print(f'  bundle:               {bundle:6.2f} s ({serial / bundle:.1f}x), '
+              f'first byte after {first:.2f} s, {size / 1024 / 1024:.1f} MB')
+        print(f'  bundle, all cached:   {cached:6.2f} s')
+    finally:
+        runner.teardown_databases(databases)
+
+
+if __name__ == '__main__':
+    main()
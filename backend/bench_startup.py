@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Cold-start time and per-worker memory of the backend under gunicorn
+Starts gunicorn (sync workers, gunicorn.conf.py) on a throwaway database and
+reports:
+- cold start: seconds from launching gunicorn until /api/health/ first answers
+- per-worker RSS, PSS and USS (Linux /proc) after light traffic (health and
+  history only), then again after every worker has served an upload and a PDF
+  report. PSS counts pages shared with other processes fractionally, so it
+  shows what --preload saves; RSS counts shared pages in full for every worker.
+
+Usage (from the backend directory):
+    python bench_startup.py
+    python bench_startup.py --preload --workers 4
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_suite import child_pids, free_port
+from synthetic_data import generate_csv_bytes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+START_TIMEOUT = 60  # seconds
+
+
+def memory_kb(pid):
+    # {'rss', 'pss', 'uss'} in KB from /proc/<pid>/smaps_rollup
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def report(label, master, workers):
+    rows = [memory_kb(pid) for pid in workers]
+    mean = {key: sum(row[key] for row in rows) / len(rows) / 1024 for key in ('rss', 'pss', 'uss')}
+    total_pss = (sum(row['pss'] for row in rows) + memory_kb(master)['pss']) / 1024
+    print(f'{label} ({len(rows)} workers): per worker RSS {mean["rss"]:6.1f} MB  PSS {mean["pss"]:6.1f} MB  '
+          f'USS {mean["uss"]:6.1f} MB; total PSS incl. master {total_pss:6.1f} MB')
+
+
+def hit_every_worker(url, workers, method='get', make_kwargs=lambda i: {}):
+    # Enough parallel requests that every (single-threaded) worker serves some
+    def send(i):
+        response = getattr(requests, method)(url, timeout=300, **make_kwargs(i))
+        if not response.ok:
+            raise RuntimeError(f'{url} returned {response.status_code}: {response.text[:200]}')
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(send, range(workers * 4)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gunicorn cold start and per-worker memory')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--preload', action='store_true', help='Import the app in the gunicorn master')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='equipment_startup_')
+    env = dict(os.environ, EQUIPMENT_DB_PATH=os.path.join(workdir, 'db.sqlite3'))
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=HERE, env=env, check=True)
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}/api'
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'backend.wsgi', '--workers', str(args.workers),
+         '--bind', f'127.0.0.1:{port}', '--timeout', '300', *(['--preload'] if args.preload else [])],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            if time.perf_counter() - start > START_TIMEOUT:
+                raise RuntimeError('gunicorn did not start in time')
+            try:
+                requests.get(f'{base_url}/health/', timeout=5).raise_for_status()
+                break
+            except requests.RequestException:
+                time.sleep(0.05)
+        print(f'cold start ({"preload" if args.preload else "no preload"}, {args.workers} workers): '
+              f'{time.perf_counter() - start:.2f} s to the first response')
+
+        # The first response can come before every worker is up
+        while len(workers := child_pids(process.pid)) < args.workers:
+            time.sleep(0.05)
+        hit_every_worker(f'{base_url}/health/', args.workers)
+        hit_every_worker(f'{base_url}/history/', args.workers)
+        report('health/history', process.pid, workers)
+
+        csv = generate_csv_bytes(2000)
+        response = requests.post(f'{base_url}/upload/', files={'file': ('startup.csv', csv, 'text/csv')}, timeout=300)
+        response.raise_for_status()
+        dataset_id = response.json()['data']['id']
+        # Report first: the uploads' retention evicts the dataset
+        hit_every_worker(f'{base_url}/report/{dataset_id}/?anomalies=1', args.workers)
+        # Distinct files: concurrent identical uploads would be deduplicated
+        csvs = [generate_csv_bytes(2000, seed=i + 1) for i in range(args.workers * 4)]
+        hit_every_worker(f'{base_url}/upload/', args.workers, method='post',
+                         make_kwargs=lambda i: {'files': {'file': (f'startup_{i}.csv', csvs[i], 'text/csv')}})
+        report('+ upload/report', process.pid, workers)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
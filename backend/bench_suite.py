@@ -0,0 +1,524 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark and load test for every API endpoint
+Loads synthetic datasets (see synthetic_data.py), then drives each endpoint in
+equipment_api/urls.py and records throughput, p50/p95/p99 latency and peak
+memory per endpoint to a JSON file. With --baseline the results are compared
+against an earlier run, and the script exits non-zero on regressions.
+
+Two targets:
+- default: Django's test client against an in-memory database, one request
+  at a time (measures the application code alone). Also counts the SQL
+  queries per call and fails the run if a read endpoint writes to the
+  database.
+- --server: a real gunicorn on a throwaway SQLite file, driven by
+  --concurrency parallel HTTP clients (peak memory is per gunicorn worker);
+  add --asgi to serve backend.asgi on uvicorn workers instead of backend.wsgi
+
+--mixed (with --server) finally measures read throughput (health, history,
+summary) on its own and again while --uploaders clients keep appending CSVs;
+with --asgi the async read endpoints should keep most of their throughput.
+
+Read endpoints run first; uploads and appends run last, since retention
+evicts older datasets as new ones arrive.
+
+Usage (from the backend directory):
+    python bench_suite.py --output bench.json
+    python bench_suite.py --server --workers 3 --concurrency 8 --output bench.json
+    python bench_suite.py --output new.json --baseline bench.json
+    python bench_suite.py --server --asgi --mixed --output bench_asgi.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from synthetic_data import generate_block, generate_csv_bytes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# A regression is a p95 latency this much higher, or a throughput this much
+# lower, than the baseline's
+DEFAULT_TOLERANCE = 0.25
+SERVER_START_TIMEOUT = 30  # seconds
+# Distinct CSVs the --mixed uploaders cycle through (generated before timing)
+MIXED_PAYLOADS = 4
+
+
+class ClientTarget:
+    """Django test client against a throwaway in-memory test database."""
+
+    name = 'client'
+
+    def __init__(self, args):
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+        import django
+        django.setup()
+        from django.test import Client
+        from django.test.runner import DiscoverRunner
+        from django.test.utils import setup_test_environment
+
+        # Per-request log lines (timings, 4xx warnings) would drown the results
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        logging.getLogger('equipment_api.timing').setLevel(logging.WARNING)
+
+        setup_test_environment()
+        self.runner = DiscoverRunner(verbosity=0)
+        self.databases = self.runner.setup_databases()
+        self.client = Client()
+        # The test client and the in-memory database are not thread safe
+        self.concurrency = 1
+        self.queries = []
+
+    def request(self, method, path, json_body=None, file=None, body=None, headers=None):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        kwargs = {'headers': headers or {}}
+        if json_body is not None:
+            kwargs.update(data=json.dumps(json_body), content_type='application/json')
+        elif file is not None:
+            kwargs['data'] = {'file': SimpleUploadedFile(file[0], file[1], content_type='text/csv')}
+        elif body is not None:
+            kwargs.update(data=body, content_type='application/octet-stream')
+        # Queries on this thread's connection: the view's own, and those of async
+        # views (their ORM calls come back to this thread); not the CPU pool's
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method.lower())(path, **kwargs)
+            # Consume streamed bodies so they are part of the measured time
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        self.queries.extend(query['sql'] for query in captured.captured_queries)
+        return response.status_code, content
+
+    def take_queries(self):
+        # SQL statements run since the last call
+        queries, self.queries = self.queries, []
+        return queries
+
+    def peak_memory_mb(self):
+        # Peak RSS of this process (ru_maxrss is in KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+    def close(self):
+        self.runner.teardown_databases(self.databases)
+
+
+class ServerTarget:
+    """gunicorn (with gunicorn.conf.py) on a free local port and a throwaway database."""
+
+    name = 'server'
+    app = ['backend.wsgi']
+
+    def __init__(self, args):
+        import requests
+
+        self.requests = requests
+        if args.asgi:
+            self.name = 'server-asgi'
+            self.app = ['backend.asgi:application', '-k', 'uvicorn_worker.UvicornWorker']
+        self.concurrency = args.concurrency
+        self.workdir = tempfile.mkdtemp(prefix='equipment_bench_')
+        port = free_port()
+        self.base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, EQUIPMENT_DB_PATH=os.path.join(self.workdir, 'db.sqlite3'))
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=HERE, env=env, check=True)
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *self.app, '--workers', str(args.workers),
+             '--bind', f'127.0.0.1:{port}', '--timeout', '300'],
+            cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.local = threading.local()
+        self.wait_until_ready()
+
+    def session(self):
+        # One keep-alive session per client thread
+        if not hasattr(self.local, 'session'):
+            self.local.session = self.requests.Session()
+        return self.local.session
+
+    def wait_until_ready(self):
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                self.session().get(f'{self.base_url}/api/health/', timeout=1)
+                return
+            except self.requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError('gunicorn did not start in time')
+
+    def request(self, method, path, json_body=None, file=None, body=None, headers=None):
+        kwargs = {'headers': headers or {}, 'timeout': 300}
+        if json_body is not None:
+            kwargs['json'] = json_body
+        elif file is not None:
+            kwargs['files'] = {'file': (file[0], file[1], 'text/csv')}
+        elif body is not None:
+            kwargs['data'] = body
+            kwargs['headers']['Content-Type'] = 'application/octet-stream'
+        response = self.session().request(method, self.base_url + path, **kwargs)
+        return response.status_code, response.content
+
+    def peak_memory_mb(self):
+        # Largest peak RSS (VmHWM) of any gunicorn worker; Linux only
+        peaks = [vm_hwm_kb(pid) for pid in child_pids(self.process.pid)]
+        peaks = [peak for peak in peaks if peak]
+        return round(max(peaks) / 1024, 1) if peaks else None
+
+    def take_queries(self):
+        # Not visible from outside the server
+        return None
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def child_pids(parent):
+    pids = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields after it are fixed
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent:
+            pids.append(int(entry))
+    return pids
+
+
+def vm_hwm_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class Scenario:
+    """
+    One endpoint (or one protocol, for chunked uploads) to measure.
+    prepare(i) builds the input of the i-th call outside the timed region;
+    run(target, payload) performs it and returns True if every status was expected.
+    """
+
+    def __init__(self, name, run, prepare=None, writes=False):
+        self.name = name
+        self.run = run
+        self.prepare = prepare or (lambda i: None)
+        self.writes = writes
+
+
+def call(method, path, expected=(200,), **kwargs):
+    def run(target, payload):
+        status, _ = target.request(method, path, **kwargs)
+        return status in expected
+    return run
+
+
+def upload_dataset(target, name, content):
+    status, body = target.request('POST', '/api/upload/', file=(name, content))
+    if status != 201:
+        raise RuntimeError(f'Loading {name} failed with HTTP {status}: {body[:200]!r}')
+    return json.loads(body)['data']['id']
+
+
+def chunked_upload(target, payload):
+    # Initiate, query status, send the chunk(s), complete - the whole protocol
+    name, content = payload
+    chunk_size = 1024 * 1024
+    status, body = target.request('POST', '/api/uploads/', json_body={
+        'filename': name, 'total_size': len(content), 'chunk_size': chunk_size
+    })
+    if status != 201:
+        return False
+    upload_id = json.loads(body)['id']
+    ok = target.request('GET', f'/api/uploads/{upload_id}/')[0] == 200
+    chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    for index, chunk in enumerate(chunks):
+        ok &= target.request('PUT', f'/api/uploads/{upload_id}/chunks/{index}/', body=chunk)[0] == 201
+    status, _ = target.request('POST', f'/api/uploads/{upload_id}/complete/', json_body={'total_chunks': len(chunks)})
+    return ok and status == 201
+
+
+def build_scenarios(target, args):
+    print(f'Loading datasets ({args.rows} rows each)...')
+    base = upload_dataset(target, 'bench_base.csv', generate_csv_bytes(args.rows, seed=0))
+    other = upload_dataset(target, 'bench_other.csv', generate_csv_bytes(args.rows, seed=1))
+    series_rows = min(args.rows, 50000)
+    series = upload_dataset(target, 'bench_series.csv', generate_csv_bytes(series_rows, seed=2, equipment=10, interval=60))
+    appendable = upload_dataset(target, 'bench_append.csv', generate_csv_bytes(args.upload_rows, seed=3))
+    series_name = generate_block(0, 1, seed=2, equipment=10, interval=60)['Equipment Name'][0]
+
+    # Every write gets different content, so deduplication doesn't short-circuit it
+    def fresh_csv(prefix):
+        return lambda i: (f'{prefix}_{i}.csv', generate_csv_bytes(args.upload_rows, seed=1000 + i))
+
+    return [
+        Scenario('health', call('GET', '/api/health/')),
+        Scenario('history', call('GET', '/api/history/')),
+        Scenario('summary', call('GET', f'/api/summary/{base}/')),
+        Scenario('readings', call('GET', f'/api/readings/{series}/?equipment={series_name}')),
+        Scenario('anomalies', call('GET', f'/api/anomalies/{base}/')),
+        Scenario('compare', call('GET', f'/api/compare/{base}/{other}/')),
+        Scenario('search_prefix', call('GET', '/api/search/?q=pump-12')),
+        Scenario('search_substring', call('GET', '/api/search/?q=ump-12&mode=substring')),
+        Scenario('export_csv', call('GET', f'/api/export/{base}/csv/')),
+        # 501 when pyarrow isn't installed
+        Scenario('export_parquet', call('GET', f'/api/export/{base}/parquet/', expected=(200, 501))),
+        Scenario('report', call('GET', f'/api/report/{base}/')),
+        Scenario('metrics', call('GET', '/api/metrics/')),
+        Scenario('login', call('POST', '/api/auth/login/', expected=(401,),
+                               json_body={'username': 'bench', 'password': 'wrong'})),
+        Scenario('logout', call('POST', '/api/auth/logout/')),
+        Scenario('append',
+                 lambda target, payload: target.request('POST', f'/api/append/{appendable}/', file=payload)[0] == 200,
+                 fresh_csv('append'), writes=True),
+        Scenario('chunked_upload', chunked_upload, fresh_csv('chunked'), writes=True),
+        Scenario('upload',
+                 lambda target, payload: target.request('POST', '/api/upload/', file=payload)[0] == 201,
+                 fresh_csv('upload'), writes=True),
+    ]
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def measure(target, scenario, count):
+    payloads = [scenario.prepare(i) for i in range(count)]
+    if not scenario.writes:
+        # Untimed first call, so one-off work (imports, caches) isn't counted
+        scenario.run(target, scenario.prepare(0))
+    target.take_queries()
+
+    def timed(payload):
+        start = time.perf_counter()
+        try:
+            ok = scenario.run(target, payload)
+        except Exception:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=target.concurrency) as pool:
+        results = list(pool.map(timed, payloads))
+    wall = time.perf_counter() - start
+
+    latencies = np.array([ms for ms, _ in results])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    queries = target.take_queries()
+    result = {
+        'requests': count,
+        'errors': sum(1 for _, ok in results if not ok),
+        'throughput_rps': round(count / wall, 2),
+        'latency_ms': {
+            'p50': round(float(p50), 2),
+            'p95': round(float(p95), 2),
+            'p99': round(float(p99), 2),
+            'mean': round(float(latencies.mean()), 2),
+            'max': round(float(latencies.max()), 2),
+        },
+        'peak_memory_mb': target.peak_memory_mb(),
+    }
+    if queries is not None:
+        writes = [sql for sql in queries if sql.lstrip().upper().startswith(WRITE_STATEMENTS)]
+        result['queries_per_call'] = round(len(queries) / count, 2)
+        result['writes_per_call'] = round(len(writes) / count, 2)
+        if writes and not scenario.writes:
+            print(f'{scenario.name} writes to the database: {writes[0][:200]}')
+    return result
+
+
+def read_rate(target, paths, seconds):
+    # (requests per second, errors) with target.concurrency clients cycling through paths
+    deadline = time.monotonic() + seconds
+
+    def reader(offset):
+        done = errors = 0
+        while time.monotonic() < deadline:
+            try:
+                ok = target.request('GET', paths[(offset + done) % len(paths)])[0] == 200
+            except Exception:
+                ok = False
+            done += 1
+            errors += not ok
+        return done, errors
+
+    with ThreadPoolExecutor(max_workers=target.concurrency) as pool:
+        results = list(pool.map(reader, range(target.concurrency)))
+    return sum(done for done, _ in results) / seconds, sum(errors for _, errors in results)
+
+
+def reads_under_upload(target, args):
+    """Read throughput alone, then while --uploaders clients keep appending CSVs."""
+    # Fresh datasets: the upload scenarios have evicted the earlier ones by now
+    base = upload_dataset(target, 'mixed_base.csv', generate_csv_bytes(args.rows, seed=4))
+    appendable = upload_dataset(target, 'mixed_append.csv', generate_csv_bytes(args.upload_rows, seed=5))
+    paths = ['/api/health/', '/api/history/', f'/api/summary/{base}/']
+    payloads = [(f'mixed_{i}.csv', generate_csv_bytes(args.mixed_upload_rows, seed=5000 + i))
+                for i in range(MIXED_PAYLOADS)]
+    print(f'Reads alone for {args.mixed_seconds} s...')
+    idle_rps, idle_errors = read_rate(target, paths, args.mixed_seconds)
+
+    stop = threading.Event()
+
+    def uploader(i):
+        count = errors = 0
+        while not stop.is_set():
+            payload = payloads[(i + count) % len(payloads)]
+            try:
+                ok = target.request('POST', f'/api/append/{appendable}/', file=payload)[0] == 200
+            except Exception:
+                ok = False
+            count += 1
+            errors += not ok
+        return count, errors
+
+    print(f'Reads with {args.uploaders} clients appending {args.mixed_upload_rows}-row CSVs...')
+    with ThreadPoolExecutor(max_workers=args.uploaders) as pool:
+        uploads = [pool.submit(uploader, i) for i in range(args.uploaders)]
+        time.sleep(1)  # let the uploads get going
+        busy_rps, busy_errors = read_rate(target, paths, args.mixed_seconds)
+        stop.set()
+        upload_counts = [future.result() for future in uploads]
+
+    return {
+        'read_paths': paths,
+        'uploaders': args.uploaders,
+        'upload_rows': args.mixed_upload_rows,
+        'idle_read_rps': round(idle_rps, 2),
+        'busy_read_rps': round(busy_rps, 2),
+        'busy_to_idle': round(busy_rps / max(idle_rps, 1e-6), 3),
+        'read_errors': idle_errors + busy_errors,
+        'uploads': sum(count for count, _ in upload_counts),
+        'upload_errors': sum(errors for _, errors in upload_counts),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against a baseline run and return the names of regressed scenarios."""
+    regressions = []
+    print(f'\nAgainst baseline ({baseline["meta"]["timestamp"]}, target {baseline["meta"]["target"]}):')
+    settings_keys = ('target', 'rows', 'upload_rows', 'concurrency', 'workers')
+    different = [key for key in settings_keys if results['meta'].get(key) != baseline['meta'].get(key)]
+    if different:
+        print(f'WARNING: runs differ in {", ".join(different)}; the comparison is not like for like')
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+        p95_change = current['latency_ms']['p95'] / max(previous['latency_ms']['p95'], 1e-6) - 1
+        rps_change = current['throughput_rps'] / max(previous['throughput_rps'], 1e-6) - 1
+        regressed = p95_change > tolerance or rps_change < -tolerance
+        print(f'{name:>18}: p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}'
+              f'{"  REGRESSION" if regressed else ""}')
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end API benchmark')
+    parser.add_argument('--server', action='store_true', help='Benchmark a real gunicorn instead of the test client')
+    parser.add_argument('--asgi', action='store_true', help='Serve backend.asgi on uvicorn workers (--server)')
+    parser.add_argument('--workers', type=int, default=3, help='gunicorn workers (--server)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Parallel clients (--server)')
+    parser.add_argument('--rows', type=int, default=20000, help='Rows in each loaded dataset')
+    parser.add_argument('--upload-rows', type=int, default=2000, help='Rows per uploaded/appended file')
+    parser.add_argument('--requests', type=int, default=50, help='Calls per read endpoint')
+    parser.add_argument('--write-requests', type=int, default=10, help='Calls per upload/append endpoint')
+    parser.add_argument('--mixed', action='store_true', help='Measure reads during uploads (--server)')
+    parser.add_argument('--uploaders', type=int, default=4, help='Appending clients during --mixed')
+    parser.add_argument('--mixed-upload-rows', type=int, default=50000, help='Rows per CSV appended during --mixed')
+    parser.add_argument('--mixed-seconds', type=float, default=10, help='Length of each --mixed phase')
+    parser.add_argument('--output', default='bench_results.json', help='JSON file to write')
+    parser.add_argument('--baseline', help='Earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative p95/throughput change before a regression is reported')
+    args = parser.parse_args()
+    if (args.asgi or args.mixed) and not args.server:
+        parser.error('--asgi and --mixed need --server')
+
+    target = (ServerTarget if args.server else ClientTarget)(args)
+    try:
+        results = {
+            'meta': {
+                'target': target.name,
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'rows': args.rows,
+                'upload_rows': args.upload_rows,
+                'concurrency': target.concurrency,
+                'workers': args.workers if args.server else None,
+            },
+            'scenarios': {},
+        }
+        scenarios = build_scenarios(target, args)
+        scenario_writes = {scenario.name: scenario.writes for scenario in scenarios}
+        for scenario in scenarios:
+            count = args.write_requests if scenario.writes else args.requests
+            result = measure(target, scenario, count)
+            results['scenarios'][scenario.name] = result
+            latency = result['latency_ms']
+            queries = f'  queries {result["queries_per_call"]:g}' if 'queries_per_call' in result else ''
+            print(f'{scenario.name:>18}: {result["throughput_rps"]:8.1f} req/s  '
+                  f'p50 {latency["p50"]:8.1f}  p95 {latency["p95"]:8.1f}  p99 {latency["p99"]:8.1f} ms  '
+                  f'peak {result["peak_memory_mb"]} MB  errors {result["errors"]}{queries}')
+        if args.mixed:
+            mixed = results['mixed_load'] = reads_under_upload(target, args)
+            print(f'reads: {mixed["idle_read_rps"]:.1f} req/s alone, {mixed["busy_read_rps"]:.1f} req/s during '
+                  f'{mixed["uploads"]} appends ({mixed["busy_to_idle"]:.0%}); '
+                  f'errors {mixed["read_errors"]} reads, {mixed["upload_errors"]} appends')
+    finally:
+        target.close()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {args.output}')
+
+    failed = any(result['errors'] for result in results['scenarios'].values())
+    # Read endpoints must not write (e.g. user lookups that save on every request)
+    failed |= any(result.get('writes_per_call') for name, result in results['scenarios'].items()
+                  if not scenario_writes[name])
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed |= bool(compare(results, json.load(f), args.tolerance))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,157 @@
-from django.contrib import admin
-from .models import Dataset, EquipmentData
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from .models import Dataset, EquipmentData, EquipmentReading, EquipmentType, TrendRollup, UploadSession
+from .paginators import EstimatedCountPaginator
+from .search import MIN_SUBSTRING_LENGTH, filter_name, prefix_successor
+
+# Datasets offered in the dataset filter of the equipment changelists; older
+# ones are reached with ?dataset=<id> or from the dataset's own admin page
+FILTER_DATASETS = 20
+
+
+class DatasetFilter(admin.SimpleListFilter):
+    # Lists only the newest datasets that own rows, instead of every Dataset
+    # as list_filter = ['dataset'] would
+    title = 'dataset'
+    parameter_name = 'dataset'
+
+    def lookups(self, request, model_admin):
+        datasets = list(
+            Dataset.objects.filter(source__isnull=True).order_by('-uploaded_at')
+            .values_list('id', 'name')[:FILTER_DATASETS]
+        )
+        selected = self.value()
+        if selected and selected.isdigit() and int(selected) not in {dataset_id for dataset_id, _ in datasets}:
+            datasets += Dataset.objects.filter(id=selected).values_list('id', 'name')
+        return [(str(dataset_id), f'{name} (#{dataset_id})') for dataset_id, name in datasets]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        if not self.value().isdigit():
+            raise IncorrectLookupParameters('dataset must be an id')
+        return queryset.filter(dataset_id=int(self.value()))
+
+
+class EquipmentTypeFilter(admin.SimpleListFilter):
+    # Types come from the EquipmentType table, or the selected dataset's stored
+    # distribution, rather than a SELECT DISTINCT over every equipment row
+    title = 'equipment type'
+    parameter_name = 'equipment_type'
+
+    def lookups(self, request, model_admin):
+        selected = request.GET.get(DatasetFilter.parameter_name, '')
+        dataset = Dataset.objects.filter(id=selected).first() if selected.isdigit() else None
+        types = sorted(dataset.type_distribution) if dataset else EquipmentType.objects.values_list('name', flat=True)
+        return [(eq_type, eq_type) for eq_type in types]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(type__name=self.value())
+        return queryset
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Changelist settings for the equipment tables, which reach millions of rows:
+    # - page counts come from table statistics or a bounded COUNT (paginators.py)
+    # - newest rows first, read backwards along the primary key; column sorting
+    #   is off, since sorting the whole table by any other column means a full sort
+    # - no facet counts, and the dataset of every row is fetched in the same query
+    # - the edit form takes a dataset id rather than a select of every dataset
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    ordering = ['-id']
+    sortable_by = []
+    list_select_related = ['dataset']
+    raw_id_fields = ['dataset']
 
 
 @admin.register(Dataset)
 class DatasetAdmin(admin.ModelAdmin):
-    list_display = ['name', 'uploaded_at', 'uploaded_by', 'total_count']
+    list_display = ['name', 'uploaded_at', 'uploaded_by', 'total_count', 'is_complete']
     list_filter = ['uploaded_at', 'uploaded_by']
+    list_select_related = ['uploaded_by']
     search_fields = ['name']
+    
+    def delete_queryset(self, request, queryset):
+        # Delete one by one so Dataset.delete() can hand shared rows to deduplicated references
+        for dataset in queryset:
+            dataset.delete()
 
 
 @admin.register(EquipmentData)
-class EquipmentDataAdmin(admin.ModelAdmin):
-    list_display = ['equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature', 'dataset']
-    list_filter = ['equipment_type', 'dataset']
-    search_fields = ['equipment_name', 'equipment_type']
+class EquipmentDataAdmin(LargeTableAdmin):
+    list_display = ['equipment_name', 'type', 'flowrate', 'pressure', 'temperature', 'dataset']
+    list_filter = [DatasetFilter, EquipmentTypeFilter]
+    list_select_related = ['dataset', 'type']
+    search_fields = ['equipment_name']
+    search_help_text = (
+        f'Equipment names containing the text (of at least {MIN_SUBSTRING_LENGTH} characters, '
+        'or starting with it within a dataset)'
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Through the search endpoint's indexes (trigram index for substrings,
+        # lower(equipment_name) for prefixes) instead of icontains on every row
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if len(term) >= MIN_SUBSTRING_LENGTH:
+            return filter_name(queryset, term, 'substring'), False
+        # Short prefixes are only indexed within a dataset; across the whole
+        # table they would mean a scan of every row
+        if not request.GET.get(DatasetFilter.parameter_name):
+            messages.info(
+                request, f'Pick a dataset to search for names under {MIN_SUBSTRING_LENGTH} characters.',
+                fail_silently=True,
+            )
+            return queryset.none(), False
+        return filter_name(queryset, term, 'prefix'), False
+
+
+@admin.register(EquipmentType)
+class EquipmentTypeAdmin(admin.ModelAdmin):
+    list_display = ['name', 'id']
+    search_fields = ['name']
+
+    def has_delete_permission(self, request, obj=None):
+        # Ingestion caches type ids per process (ingest.TYPE_IDS), so types are never deleted
+        return False
+
+
+@admin.register(EquipmentReading)
+class EquipmentReadingAdmin(LargeTableAdmin):
+    list_display = ['equipment_name', 'timestamp', 'flowrate', 'pressure', 'temperature', 'dataset']
+    list_filter = [DatasetFilter]
+    search_fields = ['equipment_name']
+    search_help_text = 'Equipment names starting with the text, case-sensitively, within a dataset'
+
+    def get_search_results(self, request, queryset, search_term):
+        # A range over reading_series_idx (dataset, equipment_name, timestamp)
+        # instead of icontains on every reading; the index leads with the
+        # dataset, so there is no indexed search across the whole table
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if not request.GET.get(DatasetFilter.parameter_name):
+            messages.info(request, 'Pick a dataset to search its readings.', fail_silently=True)
+            return queryset.none(), False
+        return queryset.filter(equipment_name__gte=term, equipment_name__lt=prefix_successor(term)), False
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'uploaded_by', 'created_at', 'status', 'parsed_chunks', 'row_count']
+    list_filter = ['status']
+    list_select_related = ['uploaded_by']
+    raw_id_fields = ['dataset']
+
+
+@admin.register(TrendRollup)
+class TrendRollupAdmin(admin.ModelAdmin):
+    list_display = ['dataset_name', 'equipment_type', 'uploaded_at', 'user', 'count', 'avg_flowrate', 'evicted']
+    list_filter = ['evicted']
+    list_select_related = ['user']
+    search_fields = ['dataset_name']
+    raw_id_fields = ['user', 'dataset']
@@ -0,0 +1,242 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from .ingest import INGEST_BATCH_ROWS, MAX_DATASETS_PER_USER, REQUIRED_COLUMNS, TIMESTAMP_COLUMN, chunk_path
+from .models import Dataset
+from .timing import stage
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the per-process limits apply
+    fcntl = None
+
+# Admission control for CSV ingestion. Parsing and storing an upload needs far
+# more memory than the file itself (DataFrames, then one model instance per
+# row), so a burst of large uploads could take a worker - or the whole host -
+# out of memory. Before ingesting, each request:
+# - is checked against the user's quota of stored rows and bytes (413)
+# - estimates its peak memory from the file size and header, and waits for
+#   room in this process's memory budget, for a free per-process slot and for
+#   one of the host-wide slots shared by all workers (lock files)
+# - gives up after INGEST_QUEUE_TIMEOUT seconds, or at once when too many
+#   requests are already waiting, with 429 and a Retry-After estimate
+# Ingestion itself is batched (ingest.INGEST_BATCH_ROWS), so no upload needs
+# more than one batch's worth of memory however large the file is.
+
+INGEST_MEMORY_BUDGET = getattr(settings, 'INGEST_MEMORY_BUDGET', 512 * 1024 * 1024)  # bytes per process
+INGEST_MAX_ACTIVE = getattr(settings, 'INGEST_MAX_ACTIVE', 2)  # per process
+# SQLite has one writer at a time: a second ingestion would only wait for the
+# write lock, and fail with "database is locked" if the first takes longer than
+# the lock timeout. Queued here instead, it waits its turn (or gets a 429).
+INGEST_MAX_GLOBAL = getattr(settings, 'INGEST_MAX_GLOBAL', None)  # per host; 0 = no limit
+if INGEST_MAX_GLOBAL is None:
+    INGEST_MAX_GLOBAL = 1 if settings.DATABASES['default']['ENGINE'].endswith('sqlite3') else 4
+INGEST_MAX_QUEUED = getattr(settings, 'INGEST_MAX_QUEUED', 8)  # waiting requests per process
+INGEST_QUEUE_TIMEOUT = getattr(settings, 'INGEST_QUEUE_TIMEOUT', 30)  # seconds
+INGEST_SLOT_ROOT = Path(getattr(settings, 'INGEST_SLOT_ROOT', settings.BASE_DIR / 'ingest_slots'))
+UPLOAD_QUOTA_ROWS = getattr(settings, 'UPLOAD_QUOTA_ROWS', 20_000_000)
+UPLOAD_QUOTA_BYTES = getattr(settings, 'UPLOAD_QUOTA_BYTES', 2 * 1024 * 1024 * 1024)
+
+# Peak memory per parsed row, measured with tracemalloc on synthetic uploads
+# (about 900 B for the DataFrame and EquipmentData objects, about 750 B more
+# with a Timestamp column for the readings) and rounded up for allocator slack
+ROW_MEMORY = 1024
+READING_ROW_MEMORY = 1024
+EXTRA_COLUMN_MEMORY = 64  # per row for each column beyond the required ones
+BASE_MEMORY = 32 * 1024 * 1024
+
+SAMPLE_BYTES = 64 * 1024  # read from the start of a file for the estimate
+SLOT_POLL_INTERVAL = 0.25  # seconds; host-wide slots freed by other workers aren't signalled
+DEFAULT_INGEST_SECONDS = 5.0  # Retry-After basis until ingest durations have been seen
+
+
+class Overloaded(Exception):
+    """No ingestion capacity became free in time; retry after retry_after seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__('Server is busy ingesting other uploads, retry later')
+        self.retry_after = retry_after
+
+
+class QuotaExceeded(Exception):
+    """The upload would take the user's stored data over UPLOAD_QUOTA_ROWS or UPLOAD_QUOTA_BYTES."""
+
+
+def read_sample(csv_file):
+    # First bytes of an uploaded file (the header and some rows); the file is rewound
+    csv_file.seek(0)
+    sample = csv_file.read(SAMPLE_BYTES)
+    csv_file.seek(0)
+    return sample
+
+
+def estimate_rows(size, sample):
+    """Rows in a CSV file of size bytes, from the average line length of its first bytes."""
+    header, _, body = sample.partition(b'\n')
+    lines = body.count(b'\n')
+    if lines == 0:
+        return 1 if size > len(header) + 1 else 0
+    line_length = (body.rfind(b'\n') + 1) / lines
+    return math.ceil(max(size - len(header) - 1, 0) / line_length)
+
+
+def estimate_memory(size, sample, buffered=0):
+    """
+    Estimated peak memory (bytes) of ingesting a CSV file of size bytes that
+    starts with sample; buffered counts raw data held in memory meanwhile.
+    """
+    columns = [column.strip().strip('"') for column in sample.partition(b'\n')[0].decode('utf-8', 'replace').split(',')]
+    per_row = ROW_MEMORY + EXTRA_COLUMN_MEMORY * max(len(columns) - len(REQUIRED_COLUMNS), 0)
+    if TIMESTAMP_COLUMN in columns:
+        per_row += READING_ROW_MEMORY
+    rows = min(estimate_rows(size, sample), INGEST_BATCH_ROWS)
+    return BASE_MEMORY + buffered + rows * per_row
+
+
+def check_quota(user, new_bytes, new_rows, new_dataset=True):
+    """
+    Raise QuotaExceeded if storing new_bytes / new_rows more would take user
+    over their quota. A new dataset makes retention evict the oldest one, so
+    that one isn't counted; deduplicated references store nothing and are free.
+    """
+    kept = Dataset.objects.filter(uploaded_by=user, is_complete=True)
+    if new_dataset:
+        kept = kept[:MAX_DATASETS_PER_USER - 1]
+    rows, size = new_rows, new_bytes
+    for total_count, file_size, source_id in kept.values_list('total_count', 'file_size', 'source_id'):
+        if source_id is None:
+            rows += total_count
+            size += file_size
+    if rows > UPLOAD_QUOTA_ROWS:
+        raise QuotaExceeded(f'Upload quota exceeded: at most {UPLOAD_QUOTA_ROWS} stored rows per user')
+    if size > UPLOAD_QUOTA_BYTES:
+        raise QuotaExceeded(f'Upload quota exceeded: at most {UPLOAD_QUOTA_BYTES} stored bytes per user')
+
+
+class IngestSlots:
+    """
+    Host-wide cap on concurrent ingestions: one lock file per slot, held with
+    flock for the duration of an ingestion. The kernel releases the lock when
+    the file is closed - including when a worker is killed - so slots never leak.
+    """
+
+    def __init__(self, directory, count):
+        self.directory = directory
+        self.count = count if fcntl is not None else 0
+
+    def acquire(self):
+        # A release callable, or None if every slot is taken
+        if not self.count:
+            return lambda: None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for index in range(self.count):
+            slot = open(self.directory / f'{index}.lock', 'a')
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                slot.close()
+                continue
+            return slot.close
+        return None
+
+
+class IngestAdmission:
+    """Per-process memory budget and concurrency limit, plus the host-wide slots."""
+
+    def __init__(self, memory_budget, max_active, max_queued, queue_timeout, slots):
+        self.memory_budget = memory_budget
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.slots = slots
+        self.reserved = 0  # estimated bytes of the running ingestions
+        self.active = 0
+        self.waiting = 0
+        self.average_seconds = DEFAULT_INGEST_SECONDS
+        self._changed = threading.Condition()
+
+    def retry_after(self):
+        # Seconds until the requests already waiting have probably been served
+        return max(1, math.ceil(self.average_seconds * (self.waiting + 1) / self.max_active))
+
+    def _fits(self, cost):
+        if self.active >= self.max_active:
+            return False
+        # An estimate over the whole budget still runs, alone, rather than never
+        return self.active == 0 or self.reserved + cost <= self.memory_budget
+
+    def _acquire(self, cost, timeout):
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            if timeout and self.waiting >= self.max_queued:
+                raise Overloaded(self.retry_after())
+            self.waiting += 1
+            try:
+                while True:
+                    release = self._fits(cost) and self.slots.acquire()
+                    if release:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Overloaded(self.retry_after())
+                    self._changed.wait(min(remaining, SLOT_POLL_INTERVAL))
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.reserved += cost
+        return release
+
+    @contextmanager
+    def admit(self, cost, timeout=None):
+        """
+        Hold capacity for an ingestion of estimated cost (bytes) while the block
+        runs. Waits up to timeout seconds (default INGEST_QUEUE_TIMEOUT); raises
+        Overloaded if no capacity is free by then.
+        """
+        with stage('admission'):
+            release = self._acquire(cost, self.queue_timeout if timeout is None else timeout)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            release()
+            with self._changed:
+                self.active -= 1
+                self.reserved -= cost
+                self.average_seconds += (time.monotonic() - start - self.average_seconds) * 0.2
+                self._changed.notify_all()
+
+
+admission = IngestAdmission(
+    INGEST_MEMORY_BUDGET, INGEST_MAX_ACTIVE, INGEST_MAX_QUEUED, INGEST_QUEUE_TIMEOUT,
+    IngestSlots(INGEST_SLOT_ROOT, INGEST_MAX_GLOBAL)
+)
+
+
+def precheck_upload(user, content_length, new_dataset=True):
+    """Checks that can refuse an upload from its Content-Length, before the body is received."""
+    if admission.waiting >= admission.max_queued:
+        raise Overloaded(admission.retry_after())
+    check_quota(user, content_length, 0, new_dataset)
+
+
+@contextmanager
+def admit_upload(user, csv_file, new_dataset=True):
+    """Quota check, then admission, for ingesting an uploaded CSV file."""
+    sample = read_sample(csv_file)
+    check_quota(user, csv_file.size, estimate_rows(csv_file.size, sample), new_dataset)
+    with admission.admit(estimate_memory(csv_file.size, sample)):
+        yield
+
+
+def chunk_cost(upload, index):
+    # Estimated memory of parsing a chunked upload's next chunk (read fully into memory)
+    sample = bytes(upload.header)
+    path = chunk_path(upload.id, index)
+    if path.exists():
+        with open(path, 'rb') as f:
+            sample += f.read(SAMPLE_BYTES)
+    return estimate_memory(upload.chunk_size, sample, buffered=2 * upload.chunk_size)
@@ -0,0 +1,182 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from .frames import equipment_frame
+from .lazy import LazyModule
+from .models import EquipmentData
+from .stats import METRIC_COLUMNS
+
+np = LazyModule('numpy')
+
+METRICS = list(METRIC_COLUMNS)
+METHODS = ['zscore', 'iqr', 'limits']
+
+DEFAULT_Z_THRESHOLD = 3.0
+DEFAULT_IQR_K = 1.5
+# Anomalous rows listed per response; counts always cover all of them
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+# Engineering limits per equipment type, '*' applying to every type, e.g.
+# {'*': {'temperature': [None, 150]}, 'Pump': {'pressure': [2, 8]}}
+DEFAULT_LIMITS = getattr(settings, 'EQUIPMENT_LIMITS', {})
+
+ANOMALY_CACHE_TIMEOUT = 60 * 60  # seconds
+
+FRAME_COLUMNS = ['id', 'equipment_type'] + METRICS
+
+
+def parse_anomaly_params(query_params):
+    """
+    Build the detection parameters from request query parameters:
+    methods (comma separated), z, iqr_k, limit, and <metric>_min / <metric>_max
+    limits that apply to every type on top of the configured ones.
+    Raises ValueError on invalid values.
+    """
+    methods = [m.strip() for m in query_params.get('methods', ','.join(METHODS)).split(',') if m.strip()]
+    unknown = [m for m in methods if m not in METHODS]
+    if unknown or not methods:
+        raise ValueError(f'methods must be a comma separated subset of: {", ".join(METHODS)}')
+
+    def number(name, default, cast=float):
+        value = query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return cast(value)
+        except ValueError:
+            raise ValueError(f'{name} must be a number')
+
+    limits = {eq_type: dict(bounds) for eq_type, bounds in DEFAULT_LIMITS.items()}
+    for metric in METRICS:
+        lower, upper = number(f'{metric}_min', None), number(f'{metric}_max', None)
+        if lower is not None or upper is not None:
+            limits.setdefault('*', {})[metric] = [lower, upper]
+
+    params = {
+        'methods': sorted(methods),
+        'z_threshold': number('z', DEFAULT_Z_THRESHOLD),
+        'iqr_k': number('iqr_k', DEFAULT_IQR_K),
+        'limits': limits,
+        'limit': min(max(number('limit', DEFAULT_LIMIT, int), 0), MAX_LIMIT),
+    }
+    if params['z_threshold'] <= 0 or params['iqr_k'] < 0:
+        raise ValueError('z must be positive and iqr_k non-negative')
+    return params
+
+
+def default_anomaly_params():
+    return parse_anomaly_params({})
+
+
+def flag_anomalies(df, params):
+    """
+    Flag outliers in df (one row per equipment) and return {(method, metric): bool array}.
+
+    zscore: |x - mean| / std of the row's equipment type above z_threshold.
+    iqr: outside [Q1 - k*IQR, Q3 + k*IQR] of the row's equipment type.
+    limits: outside the configured [min, max] for the type (or '*').
+    Everything is computed with grouped, column-wise pandas/NumPy operations.
+    """
+    flags = {}
+    if df.empty:
+        return flags
+    values = df[METRICS]
+    groups = values.groupby(df['equipment_type'], sort=False)
+
+    if 'zscore' in params['methods']:
+        # std is NaN for single-row types and 0 for constant ones - never flagged
+        std = groups.transform('std').replace(0, np.nan)
+        z = ((values - groups.transform('mean')) / std).abs()
+        for metric in METRICS:
+            flags[('zscore', metric)] = (z[metric] > params['z_threshold']).to_numpy()
+
+    if 'iqr' in params['methods']:
+        q1 = groups.transform('quantile', 0.25)
+        q3 = groups.transform('quantile', 0.75)
+        spread = (q3 - q1) * params['iqr_k']
+        outside = (values < q1 - spread) | (values > q3 + spread)
+        for metric in METRICS:
+            flags[('iqr', metric)] = outside[metric].to_numpy()
+
+    if 'limits' in params['methods'] and params['limits']:
+        types = df['equipment_type']
+        for metric in METRICS:
+            lower = np.full(len(df), -np.inf)
+            upper = np.full(len(df), np.inf)
+            # Type-specific limits override the '*' ones
+            for eq_type in sorted(params['limits'], key=lambda t: t != '*'):
+                bounds = params['limits'][eq_type].get(metric)
+                if not bounds:
+                    continue
+                rows = slice(None) if eq_type == '*' else (types == eq_type).to_numpy()
+                if bounds[0] is not None:
+                    lower[rows] = bounds[0]
+                if bounds[1] is not None:
+                    upper[rows] = bounds[1]
+            column = values[metric].to_numpy()
+            flags[('limits', metric)] = (column < lower) | (column > upper)
+
+    return flags
+
+
+def detect_anomalies(dataset, params):
+    """
+    Return the anomaly report for a dataset: counts by type and method plus
+    up to params['limit'] flagged rows, each with the reasons it was flagged.
+    Results are cached per dataset contents and parameter set.
+    """
+    params_hash = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    # Deduplicated uploads share rows, so they share results too
+    key = f'anomalies:{dataset.storage_id}:{dataset.total_count}:{params_hash}'
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    df = equipment_frame(dataset, FRAME_COLUMNS)
+    flags = flag_anomalies(df, params)
+    any_flag = np.zeros(len(df), dtype=bool)
+    for flagged in flags.values():
+        any_flag |= flagged
+
+    by_method = {method: 0 for method in params['methods']}
+    for method in params['methods']:
+        method_flags = [flagged for (m, _), flagged in flags.items() if m == method]
+        if method_flags:
+            by_method[method] = int(np.logical_or.reduce(method_flags).sum())
+
+    flagged_rows = df[any_flag]
+    listed = flagged_rows.head(params['limit'])
+    names = dict(
+        EquipmentData.objects.filter(id__in=listed['id'].tolist()).values_list('id', 'equipment_name')
+    )
+    positions = np.flatnonzero(any_flag)[:params['limit']]
+    anomalies = []
+    for position, row in zip(positions, listed.itertuples(index=False)):
+        # Plain Python numbers - the JSON encoder doesn't accept NumPy scalars
+        row_id = int(row.id)
+        values = {metric: float(getattr(row, metric)) for metric in METRICS}
+        reasons = [
+            {'method': method, 'metric': metric, 'value': values[metric]}
+            for (method, metric), flagged in flags.items() if flagged[position]
+        ]
+        anomalies.append({
+            'id': row_id,
+            'equipment_name': names.get(row_id, ''),
+            'equipment_type': row.equipment_type,
+            **values,
+            'reasons': reasons,
+        })
+
+    result = {
+        'parameters': params,
+        'total_rows': len(df),
+        'anomaly_count': int(any_flag.sum()),
+        'by_type': {k: int(v) for k, v in flagged_rows['equipment_type'].value_counts().items()},
+        'by_method': by_method,
+        'truncated': len(flagged_rows) > len(listed),
+        'anomalies': anomalies,
+    }
+    cache.set(key, result, ANOMALY_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,132 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.http import JsonResponse
+from rest_framework.authentication import BaseAuthentication
+
+# Stateless API authentication. /api/auth/login/ returns a token signed with
+# SECRET_KEY that carries the user's id and username; clients send it as
+#     Authorization: Bearer <token>
+# and TokenAuthenticationMiddleware verifies it without touching the database.
+# The price: a token stays valid until it expires (AUTH_TOKEN_MAX_AGE) even if
+# the user is deactivated, and logging out can't revoke it (rotating
+# SECRET_KEY revokes all of them).
+# Requests without a token act as the demo user, whose id is cached, so a read
+# request makes no database writes and at most one cache lookup for its user.
+
+TOKEN_SALT = 'equipment_api.auth.token'
+TOKEN_MAX_AGE = getattr(settings, 'AUTH_TOKEN_MAX_AGE', 7 * 24 * 60 * 60)  # seconds
+
+DEMO_USERNAME = 'demo'
+DEMO_USER_CACHE_KEY = 'auth:demo_user_id'
+DEMO_USER_CACHE_TIMEOUT = 60 * 60  # seconds
+
+
+def issue_token(user):
+    return signing.dumps({'id': user.pk, 'username': user.username}, salt=TOKEN_SALT)
+
+
+def known_user(pk, username):
+    # User instance for a row known to exist, built without a query. Only pk and
+    # username are filled in: good for filters and foreign keys, never save() it.
+    user = User(pk=pk, username=username)
+    user._state.adding = False
+    user._state.db = 'default'
+    return user
+
+
+def token_user(token):
+    """User a token was issued to; raises signing.BadSignature if it's forged or expired."""
+    payload = signing.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE)
+    try:
+        return known_user(int(payload['id']), str(payload['username']))
+    except (KeyError, TypeError, ValueError):
+        raise signing.BadSignature('Malformed token payload')
+
+
+def get_demo_user():
+    """Fallback user for requests without a token; the database is only used on a cache miss."""
+    pk = cache.get(DEMO_USER_CACHE_KEY)
+    if pk is not None:
+        return known_user(pk, DEMO_USERNAME)
+    demo_user, created = User.objects.get_or_create(username=DEMO_USERNAME)
+    if created or demo_user.has_usable_password():
+        demo_user.set_unusable_password()
+        demo_user.save(update_fields=['password'])
+    cache.set(DEMO_USER_CACHE_KEY, demo_user.pk, DEMO_USER_CACHE_TIMEOUT)
+    return demo_user
+
+
+async def aget_demo_user():
+    pk = await cache.aget(DEMO_USER_CACHE_KEY)
+    if pk is not None:
+        return known_user(pk, DEMO_USERNAME)
+    return await sync_to_async(get_demo_user)()
+
+
+@receiver(post_delete, sender=User)
+def forget_demo_user(sender, instance, **kwargs):
+    if instance.username == DEMO_USERNAME:
+        cache.delete(DEMO_USER_CACHE_KEY)
+
+
+def get_request_user(request):
+    """The token's user, or the demo user (works for DRF and plain Django requests)."""
+    return getattr(request, 'token_user', None) or get_demo_user()
+
+
+async def aget_request_user(request):
+    return getattr(request, 'token_user', None) or await aget_demo_user()
+
+
+class TokenAuthenticationMiddleware:
+    """
+    Verify Authorization: Bearer tokens for every view, sync or async.
+    Sets request.token_user (None without a token); a bad or expired token is
+    rejected with 401 before the view runs.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.authenticate(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.authenticate(request) or await self.get_response(request)
+
+    def authenticate(self, request):
+        # None to carry on, or the 401 response
+        request.token_user = None
+        scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() != 'bearer':
+            return None
+        try:
+            request.token_user = token_user(token.strip())
+        except signing.BadSignature:
+            response = JsonResponse({'error': 'Invalid or expired token'}, status=401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+        return None
+
+
+class TokenAuthentication(BaseAuthentication):
+    """DRF's request.user for the token TokenAuthenticationMiddleware verified."""
+
+    def authenticate(self, request):
+        user = getattr(request._request, 'token_user', None)
+        return None if user is None else (user, None)
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -0,0 +1,84 @@
+import io
+
+# Chart drawing with matplotlib's Agg backend, for the chart endpoint and the
+# PDF report. Nothing here imports Django: render_chart takes plain data and
+# runs in the chart process pool (executors.run_in_process), whose workers are
+# fresh interpreters. Figures are built with matplotlib.figure.Figure rather
+# than pyplot, so there's no global figure state to leak between renders.
+
+# Same palette as the web and desktop clients
+COLORS = ['#2563eb', '#1e40af', '#3b82f6', '#059669', '#d97706', '#dc2626']
+TEXT_COLOR = '#0f172a'
+GRID_COLOR = '#e2e8f0'
+METRIC_LABELS = {'flowrate': 'Flowrate', 'pressure': 'Pressure', 'temperature': 'Temperature'}
+
+
+def style_axes(ax, title):
+    ax.set_title(title, fontweight='bold', fontsize=12, color=TEXT_COLOR)
+    ax.tick_params(colors=TEXT_COLOR)
+    for spine in ('top', 'right'):
+        ax.spines[spine].set_visible(False)
+
+
+def draw_types(fig, data):
+    # data: {type: count}
+    ax = fig.add_subplot(1, 1, 1)
+    if not data:
+        ax.axis('off')
+        ax.text(0.5, 0.5, 'No equipment', ha='center', va='center', color=TEXT_COLOR)
+        return
+    colors = [COLORS[i % len(COLORS)] for i in range(len(data))]
+    ax.pie(list(data.values()), labels=list(data), autopct='%1.1f%%', colors=colors, startangle=90,
+           textprops={'color': TEXT_COLOR})
+    style_axes(ax, 'Equipment Type Distribution')
+
+
+def draw_averages(fig, data):
+    # data: {metric: average}
+    ax = fig.add_subplot(1, 1, 1)
+    bars = ax.bar([METRIC_LABELS[m] for m in data], list(data.values()), color=COLORS[:len(data)])
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2, height, f'{height:.2f}',
+                ha='center', va='bottom', fontweight='bold', color=TEXT_COLOR)
+    ax.set_ylabel('Value', fontweight='bold', color=TEXT_COLOR)
+    ax.grid(axis='y', color=GRID_COLOR)
+    ax.set_axisbelow(True)
+    style_axes(ax, 'Average Parameter Values')
+
+
+def draw_histograms(fig, data):
+    # data: {metric: (counts, bin edges)}, one panel per metric
+    for i, (metric, (counts, edges)) in enumerate(data.items()):
+        ax = fig.add_subplot(1, len(data), i + 1)
+        widths = [right - left for left, right in zip(edges, edges[1:])]
+        ax.bar(edges[:-1], counts, width=widths, align='edge', color=COLORS[i % len(COLORS)], edgecolor='white')
+        if i == 0:
+            ax.set_ylabel('Equipment', fontweight='bold', color=TEXT_COLOR)
+        ax.grid(axis='y', color=GRID_COLOR)
+        ax.set_axisbelow(True)
+        style_axes(ax, METRIC_LABELS[metric])
+
+
+DRAW = {
+    'types': draw_types,
+    'averages': draw_averages,
+    'histograms': draw_histograms,
+}
+
+
+def render_chart(kind, data, file_format, width, height, dpi=100):
+    """Draw one chart (a DRAW kind) from plain data and return it as png or svg bytes."""
+    import matplotlib
+    from matplotlib.figure import Figure
+
+    # Fixed ids and no timestamps: the same data always renders to the same bytes
+    matplotlib.rcParams['svg.hashsalt'] = 'equipment-charts'
+    metadata = {'Date': None} if file_format == 'svg' else {'Software': None}
+
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi, facecolor='white')
+    DRAW[kind](fig, data)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=file_format, metadata=metadata)
+    return buffer.getvalue()
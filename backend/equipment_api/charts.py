@@ -0,0 +1,167 @@
+import hashlib
+from collections import namedtuple
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Max, Min
+from .chart_render import render_chart
+from .executors import arun_in_process, run_in_process
+from .lazy import LazyModule
+from .metrics import CHART_REQUESTS
+from .stats import METRIC_COLUMNS
+from .timing import stage
+
+np = LazyModule('numpy')
+
+# Server-rendered charts (PNG or SVG) for the chart endpoint, the PDF report
+# and the desktop client. Gathering the data needs the database and happens in
+# the request; drawing (chart_render.py) happens in the process pool. Images
+# are cached per dataset and chart spec. The ETag is derived from the same
+# inputs as the cache key, so a client revalidating an image it already has
+# gets a 304 without anything being drawn.
+
+CHART_FORMATS = {
+    # format: content type
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+CHART_KINDS = ('types', 'averages', 'histograms')
+
+DEFAULT_WIDTH, DEFAULT_HEIGHT = 640, 480  # pixels
+MIN_SIZE, MAX_SIZE = 100, 2000
+DEFAULT_BINS, MAX_BINS = 20, 100
+CHART_DPI = 100
+
+CHART_CACHE_TIMEOUT = 60 * 60  # seconds
+# Bump when the drawing code changes, so cached images and ETags go stale
+CHART_STYLE_VERSION = 1
+
+# Rows read per round trip when binning the histograms
+HISTOGRAM_BATCH_SIZE = 10000
+
+ChartSpec = namedtuple('ChartSpec', 'kind file_format width height bins dpi')
+
+
+def parse_int_param(params, name, default, low, high):
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    if not low <= number <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return number
+
+
+def chart_spec(kind, file_format, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT, bins=DEFAULT_BINS, dpi=CHART_DPI):
+    # Only histograms use bins; fixing it otherwise keeps one cache entry per chart
+    return ChartSpec(kind, file_format, width, height, bins if kind == 'histograms' else 0, dpi)
+
+
+def parse_chart_spec(kind, file_format, params):
+    """ChartSpec from the URL and query parameters (width, height, bins); raises ValueError."""
+    if kind not in CHART_KINDS:
+        raise ValueError(f'chart must be one of: {", ".join(CHART_KINDS)}')
+    if file_format not in CHART_FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(CHART_FORMATS)}')
+    return chart_spec(
+        kind, file_format,
+        width=parse_int_param(params, 'width', DEFAULT_WIDTH, MIN_SIZE, MAX_SIZE),
+        height=parse_int_param(params, 'height', DEFAULT_HEIGHT, MIN_SIZE, MAX_SIZE),
+        bins=parse_int_param(params, 'bins', DEFAULT_BINS, 1, MAX_BINS),
+    )
+
+
+def chart_cache_key(dataset, spec):
+    # total_count is part of the key so appends make a new image (as for reports)
+    return (f'chart:{CHART_STYLE_VERSION}:{dataset.id}:{dataset.total_count}:'
+            f'{spec.kind}:{spec.file_format}:{spec.width}x{spec.height}@{spec.dpi}:{spec.bins}')
+
+
+def chart_etag(dataset, spec):
+    return '"%s"' % hashlib.md5(chart_cache_key(dataset, spec).encode('utf-8')).hexdigest()
+
+
+def histogram_data(dataset, bins):
+    """{metric: (counts, bin edges)} over the dataset's rows, read in batches."""
+    equipment = dataset.get_equipment()
+    metrics = list(METRIC_COLUMNS)
+    bounds = equipment.aggregate(
+        **{f'{m}_min': Min(m) for m in metrics}, **{f'{m}_max': Max(m) for m in metrics}
+    )
+    edges = {}
+    for metric in metrics:
+        low, high = bounds[f'{metric}_min'], bounds[f'{metric}_max']
+        if low is None:
+            low, high = 0.0, 1.0
+        elif low == high:
+            low, high = low - 0.5, high + 0.5
+        edges[metric] = np.linspace(low, high, bins + 1)
+
+    counts = {metric: np.zeros(bins, dtype=np.int64) for metric in metrics}
+    rows = equipment.order_by().values_list(*metrics).iterator(chunk_size=HISTOGRAM_BATCH_SIZE)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == HISTOGRAM_BATCH_SIZE:
+            add_to_histograms(counts, edges, batch)
+            batch = []
+    if batch:
+        add_to_histograms(counts, edges, batch)
+    return {metric: (counts[metric].tolist(), edges[metric].tolist()) for metric in metrics}
+
+
+def add_to_histograms(counts, edges, batch):
+    values = np.array(batch, dtype=float)
+    for i, metric in enumerate(counts):
+        counts[metric] += np.histogram(values[:, i], bins=edges[metric])[0]
+
+
+def chart_data(dataset, spec):
+    # Plain data for chart_render.DRAW[spec.kind]
+    if spec.kind == 'types':
+        return dataset.get_type_distribution()
+    if spec.kind == 'averages':
+        return {metric: getattr(dataset, f'avg_{metric}') for metric in METRIC_COLUMNS}
+    return histogram_data(dataset, spec.bins)
+
+
+def render_args(spec, data):
+    return spec.kind, data, spec.file_format, spec.width, spec.height, spec.dpi
+
+
+def lookup_chart(dataset, spec):
+    """(cache key, cached image or None) for a chart."""
+    key = chart_cache_key(dataset, spec)
+    with stage('cache'):
+        content = cache.get(key)
+    CHART_REQUESTS.labels('miss' if content is None else 'hit').inc()
+    return key, content
+
+
+def get_chart(dataset, spec):
+    """Return (image bytes, etag) for a chart, rendering only on cache miss."""
+    key, content = lookup_chart(dataset, spec)
+    if content is None:
+        with stage('chart_data'):
+            data = chart_data(dataset, spec)
+        with stage('chart_render'):
+            content = run_in_process(render_chart, *render_args(spec, data))
+        cache.set(key, content, CHART_CACHE_TIMEOUT)
+    return content, chart_etag(dataset, spec)
+
+
+async def aget_chart(dataset, spec):
+    """Async form of get_chart: the event loop keeps serving while the chart is drawn."""
+    key = chart_cache_key(dataset, spec)
+    with stage('cache'):
+        content = await cache.aget(key)
+    CHART_REQUESTS.labels('miss' if content is None else 'hit').inc()
+    if content is None:
+        with stage('chart_data'):
+            data = await sync_to_async(chart_data)(dataset, spec)
+        with stage('chart_render'):
+            content = await arun_in_process(render_chart, *render_args(spec, data))
+        await cache.aset(key, content, CHART_CACHE_TIMEOUT)
+    return content, chart_etag(dataset, spec)
@@ -0,0 +1,126 @@
+from django.core.cache import cache
+from .frames import equipment_frame
+from .lazy import LazyModule
+from .stats import METRIC_COLUMNS
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+METRICS = list(METRIC_COLUMNS)
+STATUSES = ['added', 'removed', 'changed', 'unchanged']
+
+DIFF_CACHE_TIMEOUT = 60 * 60  # seconds
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_TOP = 10
+MAX_TOP = 100
+
+
+def per_equipment(dataset):
+    # One row per equipment name, sorted by name. Names that occur more than
+    # once (e.g. time-series uploads) are averaged.
+    df = equipment_frame(dataset, ['equipment_name', 'equipment_type'] + METRICS)
+    if df.empty:
+        return pd.DataFrame(columns=['equipment_type'] + METRICS, index=pd.Index([], name='equipment_name'))
+    grouped = df.groupby('equipment_name', sort=True)
+    result = grouped[METRICS].mean()
+    result.insert(0, 'equipment_type', grouped['equipment_type'].first())
+    return result
+
+
+def compute_diff(base, other):
+    """
+    Join two datasets on equipment_name with a vectorized outer merge.
+    Returns a DataFrame indexed by equipment_name (sorted, for keyset
+    pagination) with the type, base_/other_ values, delta_ per metric and status.
+    """
+    merged = per_equipment(base).join(per_equipment(other), how='outer', lsuffix='_base', rsuffix='_other', sort=True)
+    in_base = merged[f'{METRICS[0]}_base'].notna().to_numpy()
+    in_other = merged[f'{METRICS[0]}_other'].notna().to_numpy()
+
+    diff = pd.DataFrame(index=merged.index)
+    diff['equipment_type'] = merged['equipment_type_other'].fillna(merged['equipment_type_base'])
+    changed = np.zeros(len(merged), dtype=bool)
+    for metric in METRICS:
+        base_values = merged[f'{metric}_base'].to_numpy(dtype=float)
+        other_values = merged[f'{metric}_other'].to_numpy(dtype=float)
+        diff[f'base_{metric}'] = base_values
+        diff[f'other_{metric}'] = other_values
+        diff[f'delta_{metric}'] = other_values - base_values
+        changed |= in_base & in_other & ~np.isclose(base_values, other_values)
+
+    diff['status'] = np.select(
+        [in_base & ~in_other, ~in_base & in_other, changed],
+        ['removed', 'added', 'changed'],
+        default='unchanged'
+    )
+    return diff
+
+
+def get_diff(base, other):
+    # Cached per dataset pair and contents (row counts change on append)
+    key = f'diff:{base.storage_id}:{base.total_count}:{other.storage_id}:{other.total_count}'
+    diff = cache.get(key)
+    if diff is None:
+        diff = compute_diff(base, other)
+        cache.set(key, diff, DIFF_CACHE_TIMEOUT)
+    return diff
+
+
+def clean(value):
+    # NaN (no value on that side) -> None; NumPy scalars -> plain floats for JSON
+    return None if pd.isna(value) else float(value)
+
+
+def diff_row(name, row):
+    def side(prefix):
+        if pd.isna(row[f'{prefix}_{METRICS[0]}']):
+            return None
+        return {metric: clean(row[f'{prefix}_{metric}']) for metric in METRICS}
+    return {
+        'equipment_name': name,
+        'equipment_type': row['equipment_type'],
+        'status': row['status'],
+        'base': side('base'),
+        'other': side('other'),
+        'delta': side('delta'),
+    }
+
+
+def top_movers(diff, top):
+    # The equipment present in both datasets with the largest absolute change, per metric
+    common = diff[diff['status'].isin(['changed', 'unchanged'])]
+    movers = {}
+    for metric in METRICS:
+        delta = common[f'delta_{metric}']
+        largest = delta.abs().nlargest(top).index
+        movers[metric] = [
+            {
+                'equipment_name': name,
+                'base': clean(common.at[name, f'base_{metric}']),
+                'other': clean(common.at[name, f'other_{metric}']),
+                'delta': clean(delta[name]),
+            }
+            for name in largest
+        ]
+    return movers
+
+
+def diff_page(diff, statuses, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return (rows, next_cursor) for the rows with the given statuses whose
+    equipment_name sorts after `after`. The cursor is the last name on the
+    page, so pages stay consistent however deep the client goes.
+    """
+    names = diff.index
+    start = names.searchsorted(after, side='right') if after is not None else 0
+    selected = diff.iloc[start:]
+    selected = selected[selected['status'].isin(statuses)].head(limit + 1)
+    rows = [diff_row(name, row) for name, row in selected.head(limit).iterrows()]
+    next_cursor = rows[-1]['equipment_name'] if len(selected) > limit else None
+    return rows, next_cursor
+
+
+def diff_summary(diff):
+    counts = diff['status'].value_counts()
+    return {status: int(counts.get(status, 0)) for status in STATUSES}
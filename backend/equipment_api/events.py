@@ -0,0 +1,258 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Server-Sent Events for /api/events/: ingestion progress, datasets that
+# became ready or were appended to, and datasets retention evicted, pushed to
+# the user they belong to so clients update their history in place instead of
+# re-polling /history/ after every action.
+# Ingestion publishes from its sync threads; each open stream holds a
+# Subscription (a bounded queue) in this process's EventHub. An event is
+# encoded once, whatever the number of listeners. Delivery is best effort: a
+# stream that falls EVENT_QUEUE_SIZE events behind has its backlog replaced
+# by a single 'resync' event, and clients refetch /history/ whenever they
+# (re)connect, so nothing is replayed.
+# With several workers the upload and the stream are usually served by
+# different processes. EVENT_BROKER then names a broker class that carries
+# events between them: SocketBroker below, for the workers of one host, or
+# any class with the same listening(user_id), publish(user_id, message) and
+# start() methods.
+
+logger = logging.getLogger(__name__)
+
+EVENT_BROKER = getattr(settings, 'EVENT_BROKER', None)  # dotted path; None = this process only
+EVENT_QUEUE_SIZE = getattr(settings, 'EVENT_QUEUE_SIZE', 100)  # undelivered events per stream
+EVENT_KEEPALIVE = getattr(settings, 'EVENT_KEEPALIVE', 15)  # seconds between keep-alive comments
+EVENT_SOCKET_ROOT = Path(getattr(settings, 'EVENT_SOCKET_ROOT', settings.BASE_DIR / 'event_sockets'))
+
+# Clients wait this long before reconnecting a dropped stream
+RETRY_MILLISECONDS = 3000
+
+
+def encode_event(event, data):
+    """One SSE message (bytes) for an event name and a JSON-serializable payload."""
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+
+RESYNC = encode_event('resync', {})
+KEEPALIVE = b': keep-alive\n\n'
+
+
+class Subscription:
+    """
+    Events for one open stream. put() may be called from any thread; an
+    async stream reads them on its event loop (loop given), a sync one from
+    a thread-safe queue.
+    """
+
+    def __init__(self, user_id, loop=None):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(EVENT_QUEUE_SIZE) if loop else queue.Queue(EVENT_QUEUE_SIZE)
+
+    def put(self, message):
+        if self.loop is None:
+            self._put(message)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except (asyncio.QueueFull, queue.Full):
+            # The client refetches everything, so the backlog is worthless -
+            # and applied after the refetch, it would undo newer changes
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def aget(self, timeout):
+        # Next message, or KEEPALIVE after timeout seconds without one
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return KEEPALIVE
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return KEEPALIVE
+
+
+class EventHub:
+    """The open streams of this process, by user id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id, loop=None):
+        subscription = Subscription(user_id, loop)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def listening(self, user_id):
+        return user_id in self._subscriptions
+
+    def deliver(self, user_id, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+hub = EventHub()
+
+
+class LocalBroker:
+    """Delivers events to the streams of the publishing process only."""
+
+    def listening(self, user_id):
+        return hub.listening(user_id)
+
+    def publish(self, user_id, message):
+        hub.deliver(user_id, message)
+
+    def start(self):
+        pass
+
+
+class SocketBroker:
+    """
+    Delivers events to the streams of every worker on the host. A worker
+    binds a Unix datagram socket in EVENT_SOCKET_ROOT once it has a stream
+    open; publishing delivers locally and sends the event to every other
+    socket there. Sockets of workers that have exited are removed by the
+    first publisher that finds them dead. An event too large for a datagram
+    (about 200 KB on Linux) reaches remote streams as 'resync'; one that
+    finds a worker's socket buffer full is dropped for that worker's streams.
+    """
+
+    def __init__(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError('SocketBroker needs Unix domain sockets')
+        self._lock = threading.Lock()
+        self._sender = None
+        self._path = None
+
+    def listening(self, user_id):
+        # Remote workers' streams aren't known here
+        return True
+
+    def publish(self, user_id, message):
+        hub.deliver(user_id, message)
+        try:
+            paths = [path for path in EVENT_SOCKET_ROOT.glob('*.sock') if path != self._path]
+        except OSError:
+            return
+        if not paths:
+            return
+        datagram = f'{user_id}\n'.encode() + message
+        with self._lock:
+            if self._sender is None:
+                self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sender.setblocking(False)
+            for path in paths:
+                self._send(path, datagram, user_id)
+
+    def _send(self, path, datagram, user_id):
+        try:
+            self._sender.sendto(datagram, str(path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            path.unlink(missing_ok=True)
+        except BlockingIOError:
+            logger.warning('Event socket %s is full, event dropped', path.name)
+        except OSError:
+            # Most likely EMSGSIZE: the receiving streams refetch instead
+            try:
+                self._sender.sendto(f'{user_id}\n'.encode() + RESYNC, str(path))
+            except OSError:
+                pass
+
+    def start(self):
+        with self._lock:
+            if self._path is not None:
+                return
+            EVENT_SOCKET_ROOT.mkdir(parents=True, exist_ok=True)
+            path = EVENT_SOCKET_ROOT / f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock'
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(str(path))
+            self._path = path
+        atexit.register(path.unlink, missing_ok=True)
+        threading.Thread(target=self._receive, args=(receiver,), name='equipment-events', daemon=True).start()
+
+    def _receive(self, receiver):
+        while True:
+            datagram = receiver.recv(256 * 1024)
+            user_id, _, message = datagram.partition(b'\n')
+            try:
+                hub.deliver(int(user_id), message)
+            except ValueError:
+                pass
+
+
+broker = import_string(EVENT_BROKER)() if EVENT_BROKER else LocalBroker()
+
+
+def subscribe(user_id, loop=None):
+    """Open a subscription to user_id's events; unsubscribe() it when the stream ends."""
+    broker.start()
+    return hub.subscribe(user_id, loop)
+
+
+def unsubscribe(subscription):
+    hub.unsubscribe(subscription)
+
+
+def publish(user_id, event, data):
+    """Send an event to user_id's open streams (a no-op when nobody is listening)."""
+    if broker.listening(user_id):
+        broker.publish(user_id, encode_event(event, data))
+
+
+def dataset_payload(dataset):
+    # The same fields as a /history/ entry
+    from .serializers import DatasetSummarySerializer
+    return DatasetSummarySerializer(dataset).data
+
+
+def publish_progress(user_id, name, rows, bytes_read=None, total_bytes=None, upload_id=None, dataset_id=None):
+    """Rows stored so far by an upload (new dataset, chunked upload or append) still in progress."""
+    publish(user_id, 'progress', {
+        'name': name,
+        'rows': rows,
+        'bytes': bytes_read,
+        'total_bytes': total_bytes,
+        'upload_id': str(upload_id) if upload_id else None,
+        'dataset_id': dataset_id,
+    })
+
+
+def publish_dataset(event, dataset):
+    """'ready' for a newly complete dataset, 'updated' after rows were appended to one."""
+    if broker.listening(dataset.uploaded_by_id):
+        publish(dataset.uploaded_by_id, event, dataset_payload(dataset))
+
+
+def publish_evicted(dataset):
+    publish(dataset.uploaded_by_id, 'evicted', {'id': dataset.id, 'name': dataset.name})
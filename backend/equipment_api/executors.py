@@ -0,0 +1,116 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps
+from django.conf import settings
+from django.db import close_old_connections
+
+# Bounded pool for CPU-heavy work: CSV parsing.
+# Under uvicorn every request's sync code gets a thread of its own, so without a
+# bound a burst of uploads would all parse at once and starve the event loop
+# serving the async read endpoints. At most CPU_WORKERS jobs run per process;
+# the rest wait their turn. Jobs must not submit further jobs (a full pool
+# waiting on itself would deadlock).
+
+CPU_WORKERS = getattr(settings, 'CPU_WORKERS', None) or os.cpu_count() or 1
+
+_cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix='equipment-cpu')
+
+
+def _pooled(func, args, kwargs):
+    # Pool threads outlive requests, so close their database connections the way
+    # Django does at the start and end of a request
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def _submit(func, args, kwargs):
+    # The caller's context goes along, so stage() timings inside the job still
+    # reach the request's Server-Timing header
+    context = contextvars.copy_context()
+    return _cpu_executor.submit(context.run, _pooled, func, args, kwargs)
+
+
+def run_cpu(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the CPU pool and return its result (sync callers)."""
+    return _submit(func, args, kwargs).result()
+
+
+async def arun_cpu(func, *args, **kwargs):
+    """Async form of run_cpu: the event loop keeps serving other requests meanwhile."""
+    return await asyncio.wrap_future(_submit(func, args, kwargs))
+
+
+def cpu_bound(func):
+    """Decorator: every call of func runs in the CPU pool."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_cpu(func, *args, **kwargs)
+    return wrapper
+
+
+# Process pool for work that holds the GIL for long stretches in pure Python
+# (matplotlib charts and ReportLab reports): in a thread it would stall every other request
+# the worker is serving. Pool processes are spawned, not forked - forking a
+# multi-threaded server is unsafe - so jobs must be importable functions that
+# don't need Django, taking and returning plain picklable data. The pool is
+# started on first use, by the worker that needs it (never by a preloading
+# gunicorn master), and replaced if one of its processes dies.
+
+PROCESS_WORKERS = getattr(settings, 'PROCESS_WORKERS', None) or os.cpu_count() or 1
+
+_process_executor = None
+_process_lock = threading.Lock()
+
+
+def _process_pool():
+    global _process_executor
+    with _process_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(
+                max_workers=PROCESS_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_executor
+
+
+def _discard_pool(executor):
+    # A killed pool process breaks the whole pool; the next job starts a new one
+    global _process_executor
+    with _process_lock:
+        if _process_executor is executor:
+            _process_executor = None
+    executor.shutdown(wait=False)
+
+
+def _discard_if_broken(executor, future):
+    if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+        _discard_pool(executor)
+
+
+def submit_in_process(func, *args, **kwargs):
+    """Start func(*args, **kwargs) in the process pool and return its Future."""
+    executor = _process_pool()
+    try:
+        future = executor.submit(func, *args, **kwargs)
+    except BrokenProcessPool:
+        _discard_pool(executor)
+        raise
+    future.add_done_callback(lambda done: _discard_if_broken(executor, done))
+    return future
+
+
+def run_in_process(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the process pool and return its result."""
+    return submit_in_process(func, *args, **kwargs).result()
+
+
+async def arun_in_process(func, *args, **kwargs):
+    """Async form of run_in_process."""
+    return await asyncio.wrap_future(submit_in_process(func, *args, **kwargs))
@@ -0,0 +1,143 @@
+import csv
+import io
+import zlib
+from pathlib import PurePath
+from .search import filter_equipment
+from .stats import METRIC_COLUMNS
+
+# Exported field -> column name; the same headers as an uploaded CSV, so an
+# export can be uploaded again
+EXPORT_COLUMNS = {
+    'equipment_name': 'Equipment Name',
+    'equipment_type': 'Type',
+    **METRIC_COLUMNS,
+}
+FORMATS = {
+    # format: (file extension, content type)
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+# Rows fetched from the database per round trip, and rows per written block
+# (CSV chunk or Parquet row group). Memory use depends on these, not on the dataset.
+EXPORT_BATCH_SIZE = 10000
+
+
+class ExportUnavailable(Exception):
+    """Raised when a format needs an optional dependency that isn't installed."""
+
+
+def parse_columns(value):
+    """Comma separated field names to export (all if empty); raises ValueError on unknown ones."""
+    columns = [c.strip() for c in (value or '').split(',') if c.strip()]
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f'columns must be a comma separated subset of: {", ".join(EXPORT_COLUMNS)}')
+    return columns or list(EXPORT_COLUMNS)
+
+
+def export_filename(dataset, file_format):
+    return PurePath(dataset.name).stem + FORMATS[file_format][0]
+
+
+def row_batches(dataset, columns, params):
+    # Lists of up to EXPORT_BATCH_SIZE value tuples, in id order. iterator() reads
+    # through a server-side cursor on PostgreSQL and fetchmany() on SQLite, so
+    # rows are never all in memory at once
+    queryset = filter_equipment(dataset.get_equipment(), params).order_by('id')
+    batch = []
+    for row in queryset.values_list(*columns).iterator(chunk_size=EXPORT_BATCH_SIZE):
+        batch.append(row)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([EXPORT_COLUMNS[c] for c in columns])
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks):
+    # wbits=31 writes the gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class ChunkSink:
+    # Write-only file object for ParquetWriter that hands written bytes back
+    # to the generator after each row group
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_chunks(batches, columns):
+    # pyarrow is optional and heavy, so it is only imported for Parquet exports
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportUnavailable('Parquet export requires pyarrow')
+
+    schema = pa.schema([
+        (EXPORT_COLUMNS[c], pa.float64() if c in METRIC_COLUMNS else pa.string())
+        for c in columns
+    ])
+
+    def generate():
+        sink = ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for batch in batches:
+                # One row group per batch, flushed to the client straight away
+                arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                yield sink.take()
+        yield sink.take()
+    return generate()
+
+
+def export_chunks(dataset, file_format, columns, params):
+    """
+    Byte chunks of the dataset's equipment rows (filtered by the search params)
+    in the given format. Raises ExportUnavailable before anything is read if
+    the format can't be produced.
+    """
+    batches = row_batches(dataset, columns, params)
+    if file_format == 'parquet':
+        return parquet_chunks(batches, columns)
+    chunks = csv_chunks(batches, columns)
+    return gzip_chunks(chunks) if file_format == 'csv.gz' else chunks
@@ -0,0 +1,24 @@
+from functools import lru_cache
+from .lazy import LazyModule
+from .models import EquipmentData
+
+pd = LazyModule('pandas')
+
+# Datasets kept in memory as DataFrames, so repeated analyses with different
+# parameters don't reload the rows (loading, not computing, is the expensive part)
+FRAME_CACHE_SIZE = 4
+
+
+def equipment_frame(dataset, columns):
+    """
+    Equipment rows of a dataset as a DataFrame with the given columns, in id order.
+    The frame is shared between callers and must not be modified.
+    """
+    # total_count is only part of the cache key, so appends load fresh data
+    return load_frame(dataset.storage_id, dataset.total_count, tuple(columns))
+
+
+@lru_cache(maxsize=FRAME_CACHE_SIZE)
+def load_frame(storage_id, version, columns):
+    rows = EquipmentData.objects.filter(dataset_id=storage_id).order_by('id').values_list(*columns)
+    return pd.DataFrame.from_records(list(rows), columns=list(columns))
@@ -0,0 +1,587 @@
+import hashlib
+import io
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from .models import Dataset, EquipmentData, EquipmentReading, EquipmentType, UploadSession, UploadChunk
+from .stats import METRIC_COLUMNS, batch_moments, merge_moments, merge_type_distribution, merge_type_stats, type_moments
+from .events import publish_dataset, publish_evicted, publish_progress
+from .executors import run_cpu
+from .lazy import LazyModule
+from .metrics import observe_ingest
+from .rollups import prune_rollups, refresh_rollups
+from .timing import stage
+
+pd = LazyModule('pandas')
+
+# Columns every uploaded CSV must contain
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+
+# Optional column; when present every row is also stored as a time-series reading
+TIMESTAMP_COLUMN = 'Timestamp'
+
+# Number of datasets kept per user; older ones are deleted after each upload
+MAX_DATASETS_PER_USER = 5
+
+# Rows per INSERT when storing equipment records
+BULK_CREATE_BATCH_SIZE = 2000
+
+# Uploaded files are parsed and stored this many rows at a time, so an upload's
+# memory use is bounded by the batch size rather than the file size
+INGEST_BATCH_ROWS = getattr(settings, 'INGEST_BATCH_ROWS', 100_000)
+
+# Chunked uploads (defaults can be overridden in settings)
+DEFAULT_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+MAX_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024)
+CHUNK_ROOT = Path(getattr(settings, 'CHUNKED_UPLOAD_ROOT', settings.BASE_DIR / 'upload_chunks'))
+
+# Hex SHA-256 as clients declare it for a whole file or a chunk
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class IngestError(Exception):
+    """Raised when uploaded CSV data can't be ingested; the message is shown to the client."""
+
+
+class UploadNotReady(IngestError):
+    """Raised when a chunked upload can't be finalized yet; the client should retry."""
+
+
+def missing_columns_error():
+    return IngestError(f'CSV must contain columns: {", ".join(REQUIRED_COLUMNS)}')
+
+
+def validate_columns(df):
+    if not all(col in df.columns for col in REQUIRED_COLUMNS):
+        raise missing_columns_error()
+
+
+# Equipment type name -> EquipmentType id for the types this process has seen.
+# Types are never deleted, so an entry can't go stale once its row is committed
+TYPE_IDS = {}
+
+
+def equipment_type_ids(names):
+    """{name: EquipmentType id} for the given type names, creating types seen for the first time."""
+    missing = [name for name in names if name not in TYPE_IDS]
+    if not missing:
+        return {name: TYPE_IDS[name] for name in names}
+    EquipmentType.objects.bulk_create([EquipmentType(name=name) for name in missing], ignore_conflicts=True)
+    created = dict(EquipmentType.objects.filter(name__in=missing).values_list('name', 'id'))
+    # Only cached once committed: a rolled-back upload takes the new types with it
+    transaction.on_commit(lambda: TYPE_IDS.update(created))
+    return {name: TYPE_IDS.get(name) or created[name] for name in names}
+
+
+def build_equipment_rows(dataset, df):
+    # Convert DataFrame rows to unsaved EquipmentData objects for bulk_create
+    # Column-wise conversion is much faster than iterrows() on large files
+    types = df['Type'].astype(str)
+    type_ids = types.map(equipment_type_ids(types.unique())).tolist()
+    return [
+        EquipmentData(
+            dataset=dataset,
+            equipment_name=name,
+            type_id=type_id,
+            flowrate=flowrate,
+            pressure=pressure,
+            temperature=temperature
+        )
+        for name, type_id, flowrate, pressure, temperature in zip(
+            df['Equipment Name'].astype(str),
+            type_ids,
+            df['Flowrate'].astype(float),
+            df['Pressure'].astype(float),
+            df['Temperature'].astype(float)
+        )
+    ]
+
+
+def build_reading_rows(dataset, df):
+    # Unsaved EquipmentReading objects for the rows of df that have a timestamp.
+    # Timestamps without a timezone are taken as UTC; unparseable ones raise ValueError.
+    if TIMESTAMP_COLUMN not in df.columns:
+        return []
+    timestamps = pd.to_datetime(df[TIMESTAMP_COLUMN], utc=True)
+    has_time = timestamps.notna()
+    if not has_time.any():
+        return []
+    df = df[has_time]
+    return [
+        EquipmentReading(
+            dataset=dataset,
+            equipment_name=name,
+            timestamp=timestamp,
+            flowrate=flowrate,
+            pressure=pressure,
+            temperature=temperature
+        )
+        for name, timestamp, flowrate, pressure, temperature in zip(
+            df['Equipment Name'].astype(str),
+            timestamps[has_time].dt.to_pydatetime(),
+            df['Flowrate'].astype(float),
+            df['Pressure'].astype(float),
+            df['Temperature'].astype(float)
+        )
+    ]
+
+
+def apply_retention(user):
+    # Keep only the newest MAX_DATASETS_PER_USER complete datasets per user
+    # Dataset.delete() moves shared rows to a surviving reference, so evicting
+    # the original of a deduplicated upload doesn't break its re-uploads, and
+    # marks the evicted dataset's trend rollups (which are kept longer).
+    # Announced first: delete() clears the instance's id
+    user_datasets = Dataset.objects.filter(uploaded_by=user, is_complete=True)
+    for ds in user_datasets[MAX_DATASETS_PER_USER:]:
+        publish_evicted(ds)
+        ds.delete()
+    prune_rollups(user)
+
+
+def find_duplicate(user, content_hash):
+    # Newest complete dataset of this user with identical file content.
+    # Lookups are per user: chunked uploads declare their hash, and a claimed
+    # hash must never grant access to another user's data.
+    if not content_hash:
+        return None
+    return Dataset.objects.filter(uploaded_by=user, content_hash=content_hash, is_complete=True).first()
+
+
+def create_dataset_reference(existing, name, user):
+    """
+    Record a re-upload of identical content as a new Dataset that shares the
+    existing rows - no parsing or row inserts, so the cost doesn't depend on file size.
+    """
+    dataset = Dataset.objects.create(
+        name=name,
+        uploaded_by=user,
+        total_count=existing.total_count,
+        avg_flowrate=existing.avg_flowrate,
+        avg_pressure=existing.avg_pressure,
+        avg_temperature=existing.avg_temperature,
+        m2_flowrate=existing.m2_flowrate,
+        m2_pressure=existing.m2_pressure,
+        m2_temperature=existing.m2_temperature,
+        type_distribution=existing.type_distribution,
+        type_stats=existing.type_stats,
+        content_hash=existing.content_hash,
+        file_size=existing.file_size,
+        source_id=existing.storage_id
+    )
+    refresh_rollups(dataset)
+    publish_dataset('ready', dataset)
+    with stage('retention'):
+        apply_retention(user)
+    return dataset
+
+
+def append_dataframe(dataset, df):
+    """
+    Store df's rows under dataset and merge their statistics into its summary
+    (count, means, M2 for variance, type distribution). Only the new rows are
+    read, so the cost depends on len(df), not on the size of the dataset.
+    The caller saves the dataset. Bad values raise IngestError.
+    """
+    start = time.perf_counter()
+    try:
+        with stage('prepare'):
+            rows = build_equipment_rows(dataset, df)
+            readings = build_reading_rows(dataset, df)
+            batches = {
+                metric: batch_moments(df[column].astype(float))
+                for metric, column in METRIC_COLUMNS.items()
+            }
+            by_type = type_moments(df)
+    except ValueError as e:
+        raise IngestError(f'Invalid CSV data: {e}')
+    with stage('insert'):
+        EquipmentData.objects.bulk_create(rows, batch_size=BULK_CREATE_BATCH_SIZE)
+        EquipmentReading.objects.bulk_create(readings, batch_size=BULK_CREATE_BATCH_SIZE)
+
+    for metric, batch in batches.items():
+        stored = (dataset.total_count, getattr(dataset, f'avg_{metric}'), getattr(dataset, f'm2_{metric}'))
+        _, mean, m2 = merge_moments(stored, batch)
+        setattr(dataset, f'avg_{metric}', mean)
+        setattr(dataset, f'm2_{metric}', m2)
+    dataset.total_count += len(df)
+    dataset.set_type_distribution(merge_type_distribution(
+        dataset.type_distribution, df['Type'].astype(str).value_counts().to_dict()
+    ))
+    dataset.type_stats = merge_type_stats(dataset.type_stats, by_type)
+    observe_ingest(len(df), time.perf_counter() - start)
+
+
+def read_csv_batches(csv_file):
+    """Parse a CSV file lazily as DataFrames of up to INGEST_BATCH_ROWS rows (in the CPU pool)."""
+    try:
+        with stage('parse'):
+            reader = run_cpu(pd.read_csv, csv_file, chunksize=INGEST_BATCH_ROWS)
+        with reader:
+            while True:
+                with stage('parse'):
+                    df = run_cpu(next, reader, None)
+                if df is None:
+                    return
+                # How far into the file parsing has got, for progress events
+                df.attrs['bytes_read'] = csv_file.tell()
+                yield df
+    except ValueError as e:
+        raise IngestError(f'Invalid CSV data: {e}')
+
+
+def create_dataset_from_frames(name, user, frames, content_hash='', file_size=0):
+    """
+    Store an iterable of DataFrames (batches of one CSV) as a new Dataset with
+    its equipment rows and apply retention. Invalid data in any batch, or no
+    rows at all, rolls back the whole dataset.
+    """
+    with transaction.atomic():
+        dataset = Dataset.objects.create(
+            name=name, uploaded_by=user, content_hash=content_hash, file_size=file_size
+        )
+        for df in frames:
+            with stage('validate'):
+                validate_columns(df)
+            append_dataframe(dataset, df)
+            publish_progress(user.id, name, dataset.total_count, df.attrs.get('bytes_read'), file_size or None)
+        # Same check as finalize_upload, so both upload paths reject a header-only file
+        if dataset.total_count == 0:
+            raise IngestError('CSV contains no rows')
+        dataset.save()
+        refresh_rollups(dataset)
+        transaction.on_commit(lambda: publish_dataset('ready', dataset))
+
+    with stage('retention'):
+        apply_retention(user)
+    return dataset
+
+
+def create_dataset_from_dataframe(name, user, df, content_hash=''):
+    """Validate df, store it as a new Dataset with its equipment rows and apply retention."""
+    with stage('validate'):
+        validate_columns(df)
+    return create_dataset_from_frames(name, user, [df], content_hash)
+
+
+def detach_storage(dataset):
+    """
+    Give dataset rows of its own before it is modified, and return it.
+    A deduplicated reference gets a copy of its source's rows; a source that
+    others reference hands a copy to the newest reference, which becomes their
+    new source. The copy is a single INSERT ... SELECT inside the database and
+    only happens on the first append to shared data.
+    """
+    # The rows no longer match the uploaded file once they diverge, whether
+    # or not they were shared
+    dataset.content_hash = ''
+    if dataset.source_id:
+        copy_dataset_rows(dataset.source_id, dataset.id)
+        dataset.source = None
+        return dataset
+    heir = dataset.references.order_by('-uploaded_at').first()
+    if heir is not None:
+        copy_dataset_rows(dataset.id, heir.id)
+        dataset.references.exclude(id=heir.id).update(source=heir)
+        heir.source = None
+        heir.save(update_fields=['source'])
+    return dataset
+
+
+def copy_dataset_rows(from_dataset_id, to_dataset_id):
+    # Equipment rows and time-series readings both belong to the storage dataset
+    for model in (EquipmentData, EquipmentReading):
+        copy_rows(model, from_dataset_id, to_dataset_id)
+
+
+def copy_rows(model, from_dataset_id, to_dataset_id):
+    # Copy every row of model from one dataset to another with a single INSERT ... SELECT
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(
+        quote(field.column) for field in model._meta.concrete_fields
+        if not field.primary_key and field.name != 'dataset'
+    )
+    dataset_column = quote(model._meta.get_field('dataset').column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({dataset_column}, {columns}) '
+            f'SELECT %s, {columns} FROM {table} WHERE {dataset_column} = %s',
+            [to_dataset_id, from_dataset_id]
+        )
+
+
+def append_frames_to_dataset(dataset_id, user, frames, file_size=0):
+    """
+    Append an iterable of DataFrames to one of user's complete datasets.
+    Returns (dataset, appended row count), or (None, 0) if there's no such dataset.
+    """
+    with transaction.atomic():
+        # Lock the row so concurrent appends merge their statistics one after another
+        dataset = Dataset.objects.select_for_update().filter(
+            id=dataset_id, uploaded_by=user, is_complete=True
+        ).first()
+        if dataset is None:
+            return None, 0
+        detach_storage(dataset)
+        appended = 0
+        for df in frames:
+            with stage('validate'):
+                validate_columns(df)
+            append_dataframe(dataset, df)
+            appended += len(df)
+            publish_progress(
+                user.id, dataset.name, appended, df.attrs.get('bytes_read'), file_size or None, dataset_id=dataset.id
+            )
+        dataset.file_size += file_size
+        dataset.save()
+        refresh_rollups(dataset)
+        transaction.on_commit(lambda: publish_dataset('updated', dataset))
+    return dataset, appended
+
+
+# ---------------------------------------------------------------------------
+# Chunked uploads
+#
+# Protocol: POST /uploads/ (initiate) -> PUT /uploads/<id>/chunks/<n>/ (any
+# order, retries allowed) -> POST /uploads/<id>/complete/ (finalize).
+# Each PUT stores the chunk on disk and then parses every chunk that is now
+# contiguous with what has already been ingested, so by the time the last
+# chunk arrives almost all rows are already in the database.
+# ---------------------------------------------------------------------------
+
+def parse_sha256(value):
+    """A declared SHA-256 in lowercase hex, or '' if none was sent; raises ValueError if malformed."""
+    value = str(value or '').lower()
+    if value and not SHA256_PATTERN.match(value):
+        raise ValueError('sha256 must be 64 hexadecimal characters')
+    return value
+
+
+def chunk_dir(upload_id):
+    return CHUNK_ROOT / str(upload_id)
+
+
+def chunk_path(upload_id, index):
+    return chunk_dir(upload_id) / f'{index}.part'
+
+
+def store_chunk(upload, index, stream, expected_sha256=None):
+    """
+    Save one chunk from a readable stream and record its checksum.
+    Returns (chunk, created). Re-sending a chunk that was already received with
+    the same checksum is a no-op, which makes client retries safe.
+    Raises IngestError on checksum mismatch or oversize chunks.
+    """
+    directory = chunk_dir(upload.id)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / f'{index}.{uuid.uuid4().hex}.tmp'
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for block in iter(lambda: stream.read(64 * 1024), b''):
+                size += len(block)
+                if size > upload.chunk_size:
+                    raise IngestError(f'Chunk exceeds the chunk size of {upload.chunk_size} bytes')
+                digest.update(block)
+                f.write(block)
+        sha256 = digest.hexdigest()
+
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise IngestError('Chunk checksum mismatch')
+
+        existing = UploadChunk.objects.filter(session=upload, index=index).first()
+        if existing is not None:
+            if existing.sha256 != sha256:
+                raise IngestError(f'Chunk {index} was already received with different content')
+            return existing, False
+
+        with transaction.atomic():
+            chunk = UploadChunk.objects.create(session=upload, index=index, size=size, sha256=sha256)
+            tmp_path.replace(chunk_path(upload.id, index))
+        return chunk, True
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def ingest_block(upload, block):
+    # Parse complete CSV lines (the stored header is prepended) and append them
+    # to the upload's dataset, updating its summary. Bad data raises IngestError.
+    for df in read_csv_batches(io.BytesIO(bytes(upload.header) + block)):
+        with stage('validate'):
+            validate_columns(df)
+        append_dataframe(upload.dataset, df)
+        upload.row_count += len(df)
+    upload.dataset.save()
+
+
+def parse_next_chunk(upload_id):
+    """
+    Ingest the next unparsed chunk if it has arrived.
+    Returns True if a chunk was parsed, False if there's nothing to do.
+    The conditional UPDATE on parsed_chunks is a claim taken before anything
+    is read, so concurrent requests never parse the same chunk twice (and on
+    SQLite the write lock is held for the whole step).
+    """
+    index = UploadSession.objects.filter(
+        id=upload_id, status=UploadSession.STATUS_PENDING
+    ).values_list('parsed_chunks', flat=True).first()
+    if index is None:
+        return False
+    path = chunk_path(upload_id, index)
+    if not path.exists():
+        return False
+
+    with transaction.atomic():
+        claimed = UploadSession.objects.filter(
+            id=upload_id, status=UploadSession.STATUS_PENDING, parsed_chunks=index
+        ).update(parsed_chunks=index + 1)
+        if not claimed:
+            return False
+        upload = UploadSession.objects.select_related('dataset').get(id=upload_id)
+
+        if upload.dataset is None:
+            # Hidden from history and retention until finalize_upload marks it complete
+            upload.dataset = Dataset.objects.create(
+                name=upload.filename,
+                uploaded_by_id=upload.uploaded_by_id,
+                is_complete=False
+            )
+
+        data = bytes(upload.carry) + path.read_bytes()
+        if not upload.header and b'\n' in data:
+            header, _, data = data.partition(b'\n')
+            upload.header = header + b'\n'
+        # Only complete lines are parsed; the remainder waits for the next chunk
+        block, newline, carry = data.rpartition(b'\n') if upload.header else (b'', b'', data)
+        upload.carry = carry if newline else data
+        if newline:
+            ingest_block(upload, block + newline)
+        upload.save()
+
+    # The chunk file stays until finalize_upload has hashed the whole file
+    parsed_bytes = (index + 1) * upload.chunk_size
+    publish_progress(
+        upload.uploaded_by_id, upload.filename, upload.row_count,
+        min(parsed_bytes, upload.total_size) if upload.total_size else parsed_bytes, upload.total_size,
+        upload_id=upload.id, dataset_id=upload.dataset_id
+    )
+    return True
+
+
+def advance_parsing(upload):
+    # Parse as many contiguous chunks as are available; bad data fails the upload
+    try:
+        while parse_next_chunk(upload.id):
+            pass
+    except IngestError as e:
+        fail_upload(upload.id, e)
+        raise
+
+
+def fail_upload(upload_id, error):
+    # The session is saved without its partial dataset before that is deleted:
+    # saving it still pointing at the deleted row would raise ValueError
+    upload = UploadSession.objects.select_related('dataset').get(id=upload_id)
+    dataset = upload.dataset
+    upload.status = UploadSession.STATUS_FAILED
+    upload.error = str(error)
+    upload.dataset = None
+    upload.save()
+    if dataset is not None:
+        dataset.delete()
+    shutil.rmtree(chunk_dir(upload_id), ignore_errors=True)
+
+
+def missing_chunks(upload, total_chunks):
+    received = set(upload.chunks.values_list('index', flat=True))
+    return [i for i in range(total_chunks) if i not in received]
+
+
+def chunks_sha256(upload_id, total_chunks):
+    """SHA-256 of the whole file from its stored chunks, or None if they have been removed."""
+    digest = hashlib.sha256()
+    try:
+        for index in range(total_chunks):
+            with open(chunk_path(upload_id, index), 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def finalize_upload(upload, total_chunks):
+    """
+    Parse the remaining data, fill in the dataset summary and mark the upload complete.
+    Calling it again on a completed upload returns the same dataset.
+    Raises IngestError if chunks are missing, the data is invalid or the file
+    doesn't match the sha256 declared when the upload was initiated.
+    """
+    if upload.status == UploadSession.STATUS_COMPLETE:
+        return upload.dataset
+    if upload.status == UploadSession.STATUS_FAILED:
+        raise IngestError(upload.error)
+
+    missing = missing_chunks(upload, total_chunks)
+    if missing:
+        raise IngestError(f'Missing chunks: {", ".join(str(i) for i in missing[:20])}')
+    advance_parsing(upload)
+
+    try:
+        # The dataset's hash decides which later uploads share its rows, so it
+        # is computed here rather than taken from the client. None: a
+        # concurrent call has completed the upload and removed the chunks
+        with stage('hash'):
+            content_hash = chunks_sha256(upload.id, total_chunks)
+        if content_hash and upload.content_hash and content_hash != upload.content_hash:
+            raise IngestError('File checksum mismatch')
+        with transaction.atomic():
+            # Claim the upload so concurrent finalize calls don't both run
+            claimed = UploadSession.objects.filter(
+                id=upload.id, status=UploadSession.STATUS_PENDING, parsed_chunks=total_chunks
+            ).update(status=UploadSession.STATUS_COMPLETE)
+            upload.refresh_from_db()
+            if not claimed:
+                if upload.status == UploadSession.STATUS_COMPLETE:
+                    return upload.dataset
+                if upload.status == UploadSession.STATUS_FAILED:
+                    raise IngestError(upload.error)
+                raise UploadNotReady('Chunks are still being processed, retry shortly')
+
+            # The last line may not end with a newline
+            if upload.carry:
+                if upload.dataset is None:
+                    raise missing_columns_error()
+                ingest_block(upload, bytes(upload.carry))
+                upload.carry = b''
+            if upload.row_count == 0:
+                raise IngestError('CSV contains no rows')
+            if content_hash is None:
+                raise IngestError('Chunk files are missing')
+
+            # The summary has been kept up to date chunk by chunk
+            dataset = upload.dataset
+            dataset.content_hash = content_hash
+            dataset.file_size = upload.chunks.aggregate(total=Sum('size'))['total'] or 0
+            dataset.is_complete = True
+            dataset.save()
+            refresh_rollups(dataset)
+            upload.save()
+            transaction.on_commit(lambda: publish_dataset('ready', dataset))
+    except UploadNotReady:
+        raise
+    except IngestError as e:
+        fail_upload(upload.id, e)
+        raise
+
+    shutil.rmtree(chunk_dir(upload.id), ignore_errors=True)
+    with stage('retention'):
+        apply_retention(upload.uploaded_by)
+    return dataset
@@ -0,0 +1,50 @@
+import importlib
+
+# pandas, numpy and ReportLab take around half a second and tens of MB to
+# import, and /health/ or /history/ need none of them. Modules that use them
+# import them on first use:
+#     pd = LazyModule('pandas')
+# (or, for ReportLab, with imports inside the rendering functions).
+# For gunicorn with preload_app, preload() imports everything up front in the
+# master instead, so forked workers share the pages copy-on-write.
+
+# Imported by preload(); optional ones are skipped when not installed
+HEAVY_MODULES = [
+    'numpy',
+    'pandas',
+    'reportlab.platypus',
+    'reportlab.lib.styles',
+    'reportlab.lib.pagesizes',
+    'pyarrow',
+    'pyarrow.parquet',
+]
+OPTIONAL_MODULES = {'pyarrow', 'pyarrow.parquet'}
+
+
+class LazyModule:
+    """Stand-in for a module, imported on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+
+    def __getattr__(self, attr):
+        # Only called for names not copied yet: after the first access the
+        # module's attributes are plain lookups on this object
+        module = importlib.import_module(self._name)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f'<lazy module {self._name!r}>'
+
+
+def preload():
+    """Import the URLconf (and with it every view) and the heavy libraries now."""
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            if name not in OPTIONAL_MODULES:
+                raise
@@ -0,0 +1,99 @@
+import os
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+# Prometheus metrics, served in text format by metrics_view (/api/metrics/).
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py) makes every
+# worker write its samples to mmap'd files in that directory; the endpoint
+# aggregates all of them, so any worker can answer a scrape.
+
+# Fixed buckets so histograms from every worker (and every deploy) can be summed
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))  # 1 KB .. 1 GB
+ROW_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+REQUESTS = Counter(
+    'equipment_http_requests_total', 'HTTP requests handled', ['method', 'view', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'equipment_http_request_duration_seconds', 'Time to produce a response (streaming bodies excluded)',
+    ['method', 'view'], buckets=LATENCY_BUCKETS
+)
+UPLOAD_BYTES = Histogram(
+    'equipment_upload_bytes', 'Size of uploaded CSV files and chunks', ['kind'], buckets=SIZE_BUCKETS
+)
+INGEST_ROWS = Counter(
+    'equipment_ingested_rows_total', 'Equipment rows stored (rate() gives rows ingested per second)'
+)
+INGEST_BATCH_ROWS = Histogram(
+    'equipment_ingest_batch_rows', 'Rows per ingested batch (upload, append or parsed chunk)', buckets=ROW_BUCKETS
+)
+INGEST_LATENCY = Histogram(
+    'equipment_ingest_duration_seconds', 'Time to store one batch of rows and update the summary',
+    buckets=LATENCY_BUCKETS
+)
+REPORT_REQUESTS = Counter(
+    'equipment_report_requests_total', 'PDF report requests by cache result', ['cache']
+)
+REPORT_RENDER_LATENCY = Histogram(
+    'equipment_report_render_seconds', 'Time to render a PDF report', buckets=LATENCY_BUCKETS
+)
+CHART_REQUESTS = Counter(
+    'equipment_chart_requests_total', 'Chart image requests by cache result', ['cache']
+)
+
+
+def observe_ingest(rows, seconds):
+    INGEST_ROWS.inc(rows)
+    INGEST_BATCH_ROWS.observe(rows)
+    INGEST_LATENCY.observe(seconds)
+
+
+def collect():
+    # Text exposition of every worker's samples in multiprocess mode, of this process otherwise
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint (plain Django view: the body is text, not JSON)"""
+    return HttpResponse(collect(), content_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """Count requests and record their latency per view (URL name, to keep label values bounded)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self.record(request, response, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, start)
+
+    def record(self, request, response, start):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        REQUEST_LATENCY.labels(request.method, view).observe(time.perf_counter() - start)
+        REQUESTS.labels(request.method, view, str(response.status_code)).inc()
+        return response
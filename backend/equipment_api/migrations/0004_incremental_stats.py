@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:45
+
+from django.db import migrations, models
+from django.db.models import Avg, F, FloatField, Sum, Value
+
+
+def backfill_m2(apps, schema_editor):
+    # M2 = sum((x - mean)^2), computed in the database from the stored rows in
+    # two passes: sum(x^2) - n * mean^2 would lose most of its digits to
+    # cancellation when the spread is small next to the mean
+    Dataset = apps.get_model('equipment_api', 'Dataset')
+    EquipmentData = apps.get_model('equipment_api', 'EquipmentData')
+    for dataset in Dataset.objects.all():
+        rows = EquipmentData.objects.filter(dataset_id=dataset.source_id or dataset.id)
+        updates = {}
+        for metric in ('flowrate', 'pressure', 'temperature'):
+            mean = rows.aggregate(mean=Avg(metric))['mean']
+            if mean is not None:
+                deviation = F(metric) - Value(mean, output_field=FloatField())
+                updates[f'm2_{metric}'] = rows.aggregate(m2=Sum(deviation * deviation))['m2']
+        if updates:
+            Dataset.objects.filter(id=dataset.id).update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_api', '0003_dataset_dedup'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='uploadsession',
+            name='sum_flowrate',
+        ),
+        migrations.RemoveField(
+            model_name='uploadsession',
+            name='sum_pressure',
+        ),
+        migrations.RemoveField(
+            model_name='uploadsession',
+            name='sum_temperature',
+        ),
+        migrations.RemoveField(
+            model_name='uploadsession',
+            name='type_counts',
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='m2_flowrate',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='m2_pressure',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='m2_temperature',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_m2, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:33
+
+import django.db.models.functions.text
+from django.db import DatabaseError, migrations, models, transaction
+
+TABLE = 'equipment_api_equipmentdata'
+FTS_TABLE = 'equipment_api_equipmentdata_fts'
+TRIGRAM_INDEX = 'equipment_name_trgm_idx'
+
+# External-content FTS5 table: only the trigram index is stored, names are read
+# from the equipment table. Triggers keep it in sync with every write path
+# (bulk inserts, INSERT ... SELECT copies, cascaded deletes).
+SQLITE_FTS = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"equipment_name, content='{TABLE}', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, equipment_name) VALUES (new.id, new.equipment_name); END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, equipment_name) VALUES ('delete', old.id, old.equipment_name); END",
+    # Only name changes touch the index; moving rows between datasets doesn't
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF equipment_name ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, equipment_name) VALUES ('delete', old.id, old.equipment_name); "
+    f"INSERT INTO {FTS_TABLE}(rowid, equipment_name) VALUES (new.id, new.equipment_name); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+# Same expression as Django's icontains/istartswith lookups, so they can use the index
+POSTGRESQL_TRIGRAM = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX {TRIGRAM_INDEX} ON {TABLE} USING gin ((UPPER("equipment_name"::text)) gin_trgm_ops)',
+]
+
+
+def create_trigram_index(apps, schema_editor):
+    # Optional: without it substring search still works, just unindexed
+    # (SQLite built without FTS5 / before 3.34, pg_trgm not installable)
+    statements = {'sqlite': SQLITE_FTS, 'postgresql': POSTGRESQL_TRIGRAM}.get(schema_editor.connection.vendor, [])
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for statement in statements:
+                schema_editor.execute(statement)
+    except DatabaseError:
+        pass
+
+
+def drop_trigram_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_api', '0005_equipment_readings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipmentdata',
+            index=models.Index(models.F('dataset'), django.db.models.functions.text.Lower('equipment_name'), name='equipment_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentdata',
+            index=models.Index(fields=['dataset', 'equipment_type'], name='equipment_type_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:08
+
+import json
+import math
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, F, Sum
+
+METRICS = ('flowrate', 'pressure', 'temperature')
+
+
+def backfill_rollups(apps, schema_editor):
+    # Per-type statistics from the stored rows (M2 = sum(x^2) - n * mean^2, as
+    # in 0004), then the rollups of every complete dataset
+    Dataset = apps.get_model('equipment_api', 'Dataset')
+    EquipmentData = apps.get_model('equipment_api', 'EquipmentData')
+    TrendRollup = apps.get_model('equipment_api', 'TrendRollup')
+    for dataset in Dataset.objects.all():
+        rows = EquipmentData.objects.filter(dataset_id=dataset.source_id or dataset.id)
+        groups = rows.values('equipment_type').order_by().annotate(
+            n=Count('id'),
+            **{f'mean_{m}': Avg(m) for m in METRICS},
+            **{f'sumsq_{m}': Sum(F(m) * F(m)) for m in METRICS},
+        )
+        stats = {
+            group['equipment_type']: {
+                'count': group['n'],
+                **{m: [group[f'mean_{m}'], max(group[f'sumsq_{m}'] - group['n'] * group[f'mean_{m}'] ** 2, 0.0)]
+                   for m in METRICS},
+            }
+            for group in groups
+        }
+        Dataset.objects.filter(id=dataset.id).update(type_stats=json.dumps(stats))
+        if not dataset.is_complete:
+            continue
+
+        def rollup(equipment_type, count, moments):
+            row = TrendRollup(
+                user_id=dataset.uploaded_by_id, dataset_id=dataset.id, dataset_name=dataset.name,
+                uploaded_at=dataset.uploaded_at, equipment_type=equipment_type, count=count
+            )
+            for m, (mean, m2) in moments.items():
+                setattr(row, f'avg_{m}', mean)
+                setattr(row, f'std_{m}', math.sqrt(m2 / (count - 1)) if count > 1 else 0.0)
+            return row
+
+        TrendRollup.objects.bulk_create([
+            rollup('', dataset.total_count, {m: (getattr(dataset, f'avg_{m}'), getattr(dataset, f'm2_{m}')) for m in METRICS}),
+            *(rollup(eq_type, s['count'], {m: s[m] for m in METRICS}) for eq_type, s in stats.items()),
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_api', '0007_dataset_file_size'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='type_stats',
+            field=models.TextField(default='{}'),
+        ),
+        migrations.CreateModel(
+            name='TrendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset_name', models.CharField(max_length=255)),
+                ('uploaded_at', models.DateTimeField()),
+                ('equipment_type', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.IntegerField()),
+                ('avg_flowrate', models.FloatField()),
+                ('avg_pressure', models.FloatField()),
+                ('avg_temperature', models.FloatField()),
+                ('std_flowrate', models.FloatField()),
+                ('std_pressure', models.FloatField()),
+                ('std_temperature', models.FloatField()),
+                ('evicted', models.BooleanField(default=False)),
+                ('dataset', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='equipment_api.dataset')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='trend_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['uploaded_at'],
+                'indexes': [models.Index(fields=['user', 'uploaded_at'], name='rollup_user_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dataset', 'equipment_type'), name='unique_rollup_type')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
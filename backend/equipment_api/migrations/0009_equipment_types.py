@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+TABLE = 'equipment_api_equipmentdata'
+FTS_TABLE = 'equipment_api_equipmentdata_fts'
+
+# The search triggers of 0006. SQLite rebuilds the equipment table to change
+# its columns, which drops the triggers on it; the FTS index itself is keyed by
+# row id and stays valid, since the rebuild keeps every id.
+SQLITE_FTS_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, equipment_name) VALUES (new.id, new.equipment_name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, equipment_name) VALUES ('delete', old.id, old.equipment_name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF equipment_name ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, equipment_name) VALUES ('delete', old.id, old.equipment_name); "
+    f"INSERT INTO {FTS_TABLE}(rowid, equipment_name) VALUES (new.id, new.equipment_name); END",
+]
+
+
+def restore_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return
+    for statement in SQLITE_FTS_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+def fill_type_ids(apps, schema_editor):
+    # One EquipmentType per distinct name, then every row's key in one UPDATE
+    EquipmentData = apps.get_model('equipment_api', 'EquipmentData')
+    EquipmentType = apps.get_model('equipment_api', 'EquipmentType')
+    names = EquipmentData.objects.order_by().values_list('equipment_type', flat=True).distinct()
+    EquipmentType.objects.bulk_create([EquipmentType(name=name) for name in names])
+    EquipmentData.objects.update(type_id=Subquery(
+        EquipmentType.objects.filter(name=OuterRef('equipment_type')).values('id')[:1]
+    ))
+
+
+def fill_type_names(apps, schema_editor):
+    EquipmentData = apps.get_model('equipment_api', 'EquipmentData')
+    EquipmentType = apps.get_model('equipment_api', 'EquipmentType')
+    EquipmentData.objects.update(equipment_type=Subquery(
+        EquipmentType.objects.filter(id=OuterRef('type_id')).values('name')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_api', '0008_trend_rollups'),
+    ]
+
+    operations = [
+        # Reversing rebuilds the table as well
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.CreateModel(
+            name='EquipmentType',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='equipmentdata',
+            name='type',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='equipment_api.equipmenttype'),
+        ),
+        migrations.RunPython(fill_type_ids, fill_type_names),
+        migrations.RemoveIndex(
+            model_name='equipmentdata',
+            name='equipment_type_idx',
+        ),
+        # State only: gives the column a default, so reversing can add it back
+        # to a table full of rows before fill_type_names sets the names
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='equipmentdata',
+                name='equipment_type',
+                field=models.CharField(default='', max_length=100),
+            ),
+        ]),
+        migrations.RemoveField(
+            model_name='equipmentdata',
+            name='equipment_type',
+        ),
+        migrations.AlterField(
+            model_name='equipmentdata',
+            name='type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='equipment_api.equipmenttype'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentdata',
+            index=models.Index(fields=['dataset', 'type'], name='equipment_type_idx'),
+        ),
+        # Covered by the composite indexes, which all start with dataset
+        migrations.AlterField(
+            model_name='equipmentdata',
+            name='dataset',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to='equipment_api.dataset'),
+        ),
+        # Both hold JSON text already, which JSONField reads as is
+        migrations.AlterField(
+            model_name='dataset',
+            name='type_distribution',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='dataset',
+            name='type_stats',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
-import json
+import uuid
+from .stats import sample_variance
 
 
 class Dataset(models.Model):
@@ -13,7 +16,24 @@ class Dataset(models.Model):
     avg_flowrate = models.FloatField(default=0.0)  # Pre-calculated for faster API response
     avg_pressure = models.FloatField(default=0.0)  # Pre-calculated for faster API response
     avg_temperature = models.FloatField(default=0.0)  # Pre-calculated for faster API response
-    type_distribution = models.TextField(default='{}')  # Equipment type distribution as JSON
+    # Sums of squared deviations from the mean (Welford's M2). Together with
+    # total_count and avg_* they let appends update the summary and variance
+    # from the new rows alone (see stats.merge_moments)
+    m2_flowrate = models.FloatField(default=0.0)
+    m2_pressure = models.FloatField(default=0.0)
+    m2_temperature = models.FloatField(default=0.0)
+    # Equipment type distribution {type: count}. A JSONField, so it can be
+    # filtered on in queries (type_distribution__Pump__gte=...) and arrives as a dict
+    type_distribution = models.JSONField(default=dict)
+    # Per type: count, and mean and M2 of each metric (see stats.merge_type_stats).
+    # Kept up to date batch by batch like the totals; feeds the trend rollups
+    type_stats = models.JSONField(default=dict)
+    is_complete = models.BooleanField(default=True)  # False while a chunked upload is still being ingested
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)  # SHA-256 of the uploaded file
+    file_size = models.BigIntegerField(default=0)  # Bytes of CSV uploaded into this dataset (for upload quotas)
+    # Set when this dataset is a lightweight reference to an identical earlier upload:
+    # its equipment rows are stored once, under the source dataset
+    source = models.ForeignKey('self', on_delete=models.RESTRICT, null=True, blank=True, related_name='references')
     
     class Meta:
         ordering = ['-uploaded_at']  # Show newest datasets first
@@ -21,30 +41,209 @@ class Dataset(models.Model):
     def __str__(self):
         return f"{self.name} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
     
+    @property
+    def storage_id(self):
+        # ID of the dataset that owns the equipment rows
+        return self.source_id or self.id
+    
+    def get_equipment(self):
+        # Equipment rows for this dataset, following a deduplicated reference to its source
+        return EquipmentData.objects.filter(dataset_id=self.storage_id)
+    
+    def get_readings(self):
+        # Time-stamped readings for this dataset (empty if the CSV had no Timestamp column)
+        return EquipmentReading.objects.filter(dataset_id=self.storage_id)
+    
+    def delete(self, *args, **kwargs):
+        # If other uploads reference this dataset's rows, hand the rows over to the
+        # newest reference (which becomes the new source) instead of deleting them.
+        # Its trend rollups are kept, marked as evicted
+        TrendRollup.objects.filter(dataset_id=self.id).update(evicted=True)
+        heir = self.references.order_by('-uploaded_at').first()
+        if heir is None:
+            return super().delete(*args, **kwargs)
+        with transaction.atomic():
+            self.equipment.update(dataset=heir)
+            self.readings.update(dataset=heir)
+            self.references.exclude(id=heir.id).update(source=heir)
+            heir.source = None
+            heir.save(update_fields=['source'])
+            return super().delete(*args, **kwargs)
+    
+    def get_variance(self, metric):
+        # Sample variance of 'flowrate', 'pressure' or 'temperature'
+        return sample_variance(self.total_count, getattr(self, f'm2_{metric}'))
+    
     def get_type_distribution(self):
-        # Safely parse JSON string to dict, returns empty dict on error
-        try:
-            return json.loads(self.type_distribution)
-        except:
-            return {}
+        # Most common type first; PostgreSQL's jsonb doesn't keep the stored key order
+        return dict(sorted(self.type_distribution.items(), key=lambda item: -item[1]))
     
     def set_type_distribution(self, distribution_dict):
-        # Convert dict to JSON string for database storage
-        self.type_distribution = json.dumps(distribution_dict)
+        self.type_distribution = distribution_dict
+    
+    def get_type_stats(self):
+        return self.type_stats
+
+
+class EquipmentType(models.Model):
+    # Lookup table of equipment type names (Pump, Tank, Reactor, etc). Equipment
+    # rows store the small integer key instead of repeating the name. Types are
+    # only ever added (see ingest.equipment_type_ids), so ids stay valid for the
+    # life of the process and can be cached
+    id = models.SmallAutoField(primary_key=True)
+    name = models.CharField(max_length=100, unique=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class EquipmentManager(models.Manager):
+    # Every query carries the type's name as equipment_type, so the API, exports,
+    # frames and filters read it like the column it used to be (a join with the
+    # small EquipmentType table; unused in counts, updates and deletes)
+    def get_queryset(self):
+        return super().get_queryset().annotate(equipment_type=F('type__name'))
 
 
 class EquipmentData(models.Model):
     # Individual equipment items from uploaded CSV
     # One record per row in the original CSV file
-    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='equipment')  # Parent dataset
+    # Parent dataset. Both composite indexes below start with it, so it needs none of its own
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='equipment', db_index=False)
     equipment_name = models.CharField(max_length=255)  # Equipment identifier/name
-    equipment_type = models.CharField(max_length=100)  # Type/category (Pump, Tank, Reactor, etc)
+    # Type/category; its name is the equipment_type annotation of EquipmentManager
+    type = models.ForeignKey(EquipmentType, on_delete=models.PROTECT, related_name='+', db_index=False)
     flowrate = models.FloatField()  # Flowrate measurement value
     pressure = models.FloatField()  # Pressure measurement value
     temperature = models.FloatField()  # Temperature measurement value
     
+    objects = EquipmentManager()
+    
     class Meta:
         ordering = ['equipment_name']  # Sort alphabetically for consistent display
+        # Used by the search endpoint (see search.py), which is always scoped to
+        # datasets, hence the leading dataset column. Substring matching uses a
+        # trigram index created in migration 0006, since it is database specific
+        indexes = [
+            models.Index(F('dataset'), Lower('equipment_name'), name='equipment_name_lower_idx'),
+            models.Index(fields=['dataset', 'type'], name='equipment_type_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.equipment_name} ({self.type})"
+
+
+class EquipmentReading(models.Model):
+    # Time series store: one record per CSV row that has a Timestamp
+    # Queried per equipment over a time range, hence the composite index
+    # The composite index below starts with dataset, so the FK needs no index of its own
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='readings', db_index=False)
+    equipment_name = models.CharField(max_length=255)  # Equipment identifier/name
+    timestamp = models.DateTimeField()  # When the reading was taken (stored as UTC)
+    flowrate = models.FloatField()
+    pressure = models.FloatField()
+    temperature = models.FloatField()
     
+    class Meta:
+        ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['dataset', 'equipment_name', 'timestamp'], name='reading_series_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.equipment_name} @ {self.timestamp:%Y-%m-%d %H:%M:%S}"
+
+
+class TrendRollup(models.Model):
+    # Materialized summary of one complete dataset for the trends endpoint: a row
+    # for the whole dataset (equipment_type '') and one per equipment type.
+    # Rewritten from the dataset's stored summary whenever it changes (see
+    # rollups.py), so trends never read equipment rows. Rows outlive their
+    # dataset - retention only marks them evicted - which lets trends reach
+    # further back than the datasets that are kept (TREND_WINDOW uploads).
+    # Both foreign keys lead composite indexes, so they need none of their own;
+    # dataset has no constraint because rows stay after the dataset is deleted
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trend_rollups', db_index=False)
+    dataset = models.ForeignKey(
+        Dataset, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    dataset_name = models.CharField(max_length=255)
+    uploaded_at = models.DateTimeField()
+    equipment_type = models.CharField(max_length=100, blank=True, default='')  # '' = all types
+    count = models.IntegerField()
+    avg_flowrate = models.FloatField()
+    avg_pressure = models.FloatField()
+    avg_temperature = models.FloatField()
+    std_flowrate = models.FloatField()  # Sample standard deviations
+    std_pressure = models.FloatField()
+    std_temperature = models.FloatField()
+    evicted = models.BooleanField(default=False)  # The dataset itself has been deleted
+
+    class Meta:
+        ordering = ['uploaded_at']
+        indexes = [
+            models.Index(fields=['user', 'uploaded_at'], name='rollup_user_time_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dataset', 'equipment_type'], name='unique_rollup_type'),
+        ]
+
+    def __str__(self):
+        return f"{self.dataset_name} ({self.equipment_type or 'all types'})"
+
+
+class UploadSession(models.Model):
+    # State of a resumable chunked upload (see ingest.store_chunk, advance_parsing
+    # and finalize_upload)
+    # Chunks are parsed in order as they arrive, so ingestion overlaps with transfer
+    STATUS_PENDING = 'pending'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # Upload ID handed to the client
+    filename = models.CharField(max_length=255)  # Original CSV filename
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')  # Owner
+    created_at = models.DateTimeField(auto_now_add=True)
+    chunk_size = models.IntegerField()  # Expected size of every chunk except the last
+    total_size = models.BigIntegerField(null=True, blank=True)  # Declared file size, if the client sent it
+    content_hash = models.CharField(max_length=64, blank=True, default='')  # Declared SHA-256 of the whole file, if sent
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error = models.TextField(blank=True, default='')  # Parse/validation error when status is failed
+    dataset = models.OneToOneField(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_session')  # Dataset being filled
+    # Incremental parser state
+    parsed_chunks = models.IntegerField(default=0)  # Chunks 0..parsed_chunks-1 have been ingested
+    header = models.BinaryField(default=b'')  # CSV header line, prepended to every parsed block
+    carry = models.BinaryField(default=b'')  # Trailing partial line left over from the last parsed chunk
+    row_count = models.IntegerField(default=0)  # Rows ingested so far (the summary is kept on the dataset itself)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+
+class UploadChunk(models.Model):
+    # One received chunk of an UploadSession; the SHA-256 makes retried PUTs idempotent
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()  # Zero-based chunk number
+    size = models.IntegerField()  # Bytes in this chunk
+    sha256 = models.CharField(max_length=64)  # Hex digest of the chunk body
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['index']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='unique_upload_chunk'),
+        ]
+
     def __str__(self):
-        return f"{self.equipment_name} ({self.equipment_type})"
+        return f"{self.session_id} chunk {self.index}"
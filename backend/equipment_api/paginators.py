@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+# Pagination for admin changelists over the equipment tables, which grow to
+# millions of rows. Django's Paginator runs an exact COUNT(*) on every page
+# view, which at 10M rows takes longer than reading the page itself. Here an
+# unfiltered list takes its size from the database's own statistics, and a
+# filtered or searched one counts matching rows only up to ADMIN_COUNT_LIMIT.
+# Past that the admin shows the limit as the total, so the last pages aren't
+# reachable from the page links - narrow the filter instead.
+
+ADMIN_COUNT_LIMIT = getattr(settings, 'ADMIN_COUNT_LIMIT', 100000)
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Approximate number of rows in model's table without scanning it, or None
+    if the database has no cheap estimate.
+    SQLite: the row count ANALYZE recorded in sqlite_stat1, or failing that the
+    span of primary keys (ids are assigned in increasing order; retention
+    deletes the oldest datasets first, so there are few gaps to overcount).
+    PostgreSQL: the planner's reltuples.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+                )
+                if cursor.fetchone():
+                    # Every index's stat starts with the number of rows in the table
+                    cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                    row = cursor.fetchone()
+                    if row:
+                        return int(row[0].split()[0])
+                pk, quoted = connection.ops.quote_name(model._meta.pk.column), connection.ops.quote_name(table)
+                # Separate subqueries: SQLite only reads MIN/MAX off the index when each stands alone
+                cursor.execute(f'SELECT (SELECT MAX({pk}) FROM {quoted}) - (SELECT MIN({pk}) FROM {quoted}) + 1')
+                return cursor.fetchone()[0] or 0
+            if connection.vendor == 'postgresql':
+                # -1 until the table has been vacuumed or analyzed
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+    except DatabaseError:
+        pass
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count never scans more than ADMIN_COUNT_LIMIT rows."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            # Small tables are counted exactly: it's cheap and the estimate can be stale
+            if estimate is not None and estimate > ADMIN_COUNT_LIMIT:
+                return estimate
+        # COUNT over a LIMITed subquery stops after ADMIN_COUNT_LIMIT matches
+        return queryset[:ADMIN_COUNT_LIMIT].count()
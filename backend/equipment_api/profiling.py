@@ -0,0 +1,131 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+import uuid
+from pathlib import Path
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, reset_queries
+from django.http import FileResponse
+
+# On-demand profiling of single requests, for staff users only (logged in to
+# the admin, or sending a Bearer token).
+# Add ?profile=1 (or the header X-Profile: 1) to any API request: it runs under
+# cProfile with SQL logging on, and the pstats file plus a JSON summary (top
+# functions, query count and the slowest queries) are written to PROFILE_ROOT.
+# ?profile=download returns the pstats file instead of the normal response.
+# The .prof files open in snakeviz, or flameprof for a flame graph.
+
+PROFILE_ROOT = Path(getattr(settings, 'PROFILE_ROOT', settings.BASE_DIR / 'profiles'))
+TOP_FUNCTIONS = 30
+TOP_QUERIES = 20
+
+
+def requested_mode(request):
+    # The switch alone, before checking who asked (that may need a query)
+    return request.GET.get('profile') or request.META.get('HTTP_X_PROFILE')
+
+
+def is_staff_request(request):
+    # Token users are built without a query (auth.known_user) and carry no
+    # staff flag, so theirs is looked up - only for requests asking for a profile
+    token_user = getattr(request, 'token_user', None)
+    if token_user is not None:
+        return User.objects.filter(pk=token_user.pk, is_active=True, is_staff=True).exists()
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+def profile_mode(request):
+    # '1' or 'download' if profiling was asked for by a staff user, else None
+    mode = requested_mode(request)
+    if not mode or not is_staff_request(request):
+        return None
+    return 'download' if mode == 'download' else '1'
+
+
+def summarize(request, response, profiler, seconds, queries):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    query_times = [float(q['time']) for q in queries]
+    slowest = sorted(queries, key=lambda q: float(q['time']), reverse=True)[:TOP_QUERIES]
+    return {
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': round(seconds * 1000, 2),
+        'query_count': len(queries),
+        'query_time_ms': round(sum(query_times) * 1000, 2),
+        'slowest_queries': [{'time_ms': round(float(q['time']) * 1000, 2), 'sql': q['sql'][:1000]} for q in slowest],
+        'top_functions': stream.getvalue(),
+    }
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when a staff user asks for it (see above). Must come after
+    AuthenticationMiddleware and TokenAuthenticationMiddleware. Requests without the switch only pay for the
+    query-parameter and header lookups.
+
+    cProfile only sees the thread it runs on. In an async chain a profiled
+    request is therefore run from a worker thread: sync views, and the ORM
+    calls of async views, come back to that thread and are profiled (with
+    their queries); the event-loop parts of async views are not.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        if not requested_mode(request):
+            return await self.get_response(request)
+        return await sync_to_async(self.profile)(request, async_to_sync(self.get_response))
+
+    def profile(self, request, get_response):
+        mode = profile_mode(request)
+        if mode is None:
+            return get_response(request)
+
+        # connection.queries is only recorded in DEBUG or with a forced debug cursor
+        force_debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        reset_queries()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            queries = list(connection.queries)
+        finally:
+            connection.force_debug_cursor = force_debug_cursor
+
+        profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        PROFILE_ROOT.mkdir(parents=True, exist_ok=True)
+        prof_path = PROFILE_ROOT / f'{profile_id}.prof'
+        profiler.dump_stats(prof_path)
+        summary = summarize(request, response, profiler, seconds, queries)
+        (PROFILE_ROOT / f'{profile_id}.json').write_text(json.dumps(summary, indent=2))
+
+        if mode == 'download':
+            response = FileResponse(open(prof_path, 'rb'), as_attachment=True, filename=prof_path.name)
+        response['X-Profile-Id'] = profile_id
+        response['X-Profile-Queries'] = str(summary['query_count'])
+        response['X-Profile-Query-Time'] = f"{summary['query_time_ms']:.1f}ms"
+        return response
@@ -0,0 +1,64 @@
+from django.http import HttpResponse
+
+# Minimal single-range support (RFC 9110 section 14) for binary downloads.
+# Multi-range requests are answered with the full body, which the spec allows.
+
+
+def parse_range_header(header, size):
+    """
+    Parse a 'bytes=start-end' Range header.
+    Returns (start, end) inclusive, None if the header should be ignored,
+    or 'unsatisfiable' if the range lies outside the content.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+
+    start_text, sep, end_text = header[len('bytes='):].strip().partition('-')
+    if not sep:
+        return None
+
+    try:
+        if start_text == '':
+            # Suffix range: the last N bytes
+            suffix = int(end_text)
+            if suffix <= 0:
+                return 'unsatisfiable'
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        return 'unsatisfiable'
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def ranged_response(request, content, content_type, etag, filename=None):
+    """Build a 200/206/416 response for content, honouring Range and If-Range."""
+    size = len(content)
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+
+    # If-Range: only serve the partial body when the client still has the same version
+    byte_range = None
+    if range_header and (not if_range or if_range == etag):
+        byte_range = parse_range_header(range_header, size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range is not None:
+        start, end = byte_range
+        response = HttpResponse(content[start:end + 1], content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        response = HttpResponse(content, content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,218 @@
+import io
+import time
+from .chart_render import render_chart
+
+# PDF report drawing with ReportLab. Like chart_render.py nothing here imports
+# Django: reports.prepare_report reads what a report needs from the database
+# into plain data, and render_report turns that into the PDF in the process
+# pool (executors.run_in_process), so report rendering - pure Python that
+# holds the GIL - doesn't stall the other requests a worker is serving.
+
+# Charts embedded in the report: kind and size in pixels, drawn at 150 dpi.
+# The first two share a row, the histograms span the page.
+REPORT_CHARTS = [('types', 600, 450), ('averages', 600, 450), ('histograms', 1200, 360)]
+REPORT_CHART_DPI = 150
+
+
+def anomaly_elements(report, styles):
+    # "Anomalies" section: summary line plus a table of the first flagged rows
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
+
+    elements = [Paragraph("<b>Anomalies</b>", styles['Heading2']), Spacer(1, 0.1*inch)]
+    by_method = ', '.join(f'{method}: {count}' for method, count in report['by_method'].items())
+    elements.append(Paragraph(
+        f"{report['anomaly_count']} of {report['total_rows']} equipment items flagged ({by_method})",
+        styles['Normal']
+    ))
+    if not report['anomalies']:
+        elements.append(Spacer(1, 0.3*inch))
+        return elements
+
+    data = [['Name', 'Type', 'Flagged']]
+    for anomaly in report['anomalies']:
+        # e.g. "pressure (iqr, zscore); temperature (limits)"
+        metrics = {}
+        for reason in anomaly['reasons']:
+            metrics.setdefault(reason['metric'], []).append(reason['method'])
+        flagged = '; '.join(f"{metric} ({', '.join(methods)})" for metric, methods in metrics.items())
+        data.append([anomaly['equipment_name'][:20], anomaly['equipment_type'][:15], flagged])
+
+    table = Table(data, colWidths=[2*inch, 1.5*inch, 3*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.mistyrose),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(Spacer(1, 0.1*inch))
+    elements.append(table)
+    elements.append(Spacer(1, 0.3*inch))
+    return elements
+
+
+def chart_elements(charts, styles):
+    # "Charts" section: types and averages side by side, histograms below
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Image, Paragraph, Spacer, Table
+
+    def image(png, width_inches, size):
+        width, height = size
+        return Image(io.BytesIO(png), width=width_inches * inch, height=width_inches * inch * height / width)
+
+    sizes = [(width, height) for _, width, height in REPORT_CHARTS]
+    row = Table([[image(charts[0], 3.2, sizes[0]), image(charts[1], 3.2, sizes[1])]])
+    return [
+        Paragraph("<b>Charts</b>", styles['Heading2']),
+        Spacer(1, 0.1*inch),
+        row,
+        Spacer(1, 0.1*inch),
+        image(charts[2], 6.5, sizes[2]),
+        Spacer(1, 0.3*inch),
+    ]
+
+
+def render_pdf(data, charts):
+    """Render the PDF report from prepare_report data and chart PNGs; returns bytes."""
+    # ReportLab is imported on first use (see lazy.py)
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.units import inch
+
+    buffer = io.BytesIO()
+
+    # invariant=True makes ReportLab omit creation timestamps and random IDs,
+    # so the same dataset always renders to byte-identical output. Clients rely
+    # on that when they resume a download with a Range request.
+    doc = SimpleDocTemplate(buffer, pagesize=letter, invariant=True)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Title
+    title = Paragraph(f"<b>Equipment Data Report</b>", styles['Title'])
+    elements.append(title)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Dataset info
+    info_text = f"""
+    <b>Dataset:</b> {data['name']}<br/>
+    <b>Uploaded:</b> {data['uploaded_at']}<br/>
+    <b>Uploaded by:</b> {data['uploaded_by']}<br/>
+    <b>Total Equipment:</b> {data['total_count']}<br/>
+    """
+    info = Paragraph(info_text, styles['Normal'])
+    elements.append(info)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Summary statistics
+    summary_title = Paragraph("<b>Summary Statistics</b>", styles['Heading2'])
+    elements.append(summary_title)
+    elements.append(Spacer(1, 0.1*inch))
+
+    summary_data = [
+        ['Metric', 'Average Value'],
+        ['Flowrate', f"{data['averages']['flowrate']:.2f}"],
+        ['Pressure', f"{data['averages']['pressure']:.2f}"],
+        ['Temperature', f"{data['averages']['temperature']:.2f}"]
+    ]
+
+    summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Type distribution
+    dist_title = Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2'])
+    elements.append(dist_title)
+    elements.append(Spacer(1, 0.1*inch))
+
+    type_dist = data['type_distribution']
+    dist_data = [['Equipment Type', 'Count']]
+    for eq_type, count in type_dist.items():
+        dist_data.append([eq_type, str(count)])
+
+    dist_table = Table(dist_data, colWidths=[3*inch, 2*inch])
+    dist_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(dist_table)
+    elements.append(Spacer(1, 0.3*inch))
+
+    if charts:
+        elements.extend(chart_elements(charts, styles))
+
+    if data['anomalies'] is not None:
+        elements.extend(anomaly_elements(data['anomalies'], styles))
+
+    # Equipment details
+    equipment_title = Paragraph("<b>Equipment Details</b>", styles['Heading2'])
+    elements.append(equipment_title)
+    elements.append(Spacer(1, 0.1*inch))
+
+    eq_data = [['Name', 'Type', 'Flow', 'Press', 'Temp']]
+    for name, eq_type, flowrate, pressure, temperature in data['equipment']:
+        eq_data.append([
+            name[:20],
+            eq_type[:15],
+            f'{flowrate:.1f}',
+            f'{pressure:.1f}',
+            f'{temperature:.1f}'
+        ])
+
+    eq_table = Table(eq_data, colWidths=[2*inch, 1.5*inch, 0.8*inch, 0.8*inch, 0.8*inch])
+    eq_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(eq_table)
+
+    if data['total_count'] > len(data['equipment']):
+        note = Paragraph(f"<i>Note: Showing first {len(data['equipment'])} of {data['total_count']} equipment items</i>", styles['Normal'])
+        elements.append(Spacer(1, 0.1*inch))
+        elements.append(note)
+
+    # Build PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def render_report(data):
+    """
+    Draw the charts data['charts'] still needs (render_chart arguments rather
+    than cached PNGs), then the PDF. Returns (pdf bytes, the PNGs drawn here -
+    None where the chart came from the cache - and the time taken in seconds).
+    """
+    start = time.perf_counter()
+    drawn = [None if isinstance(chart, bytes) else render_chart(*chart) for chart in data['charts']]
+    charts = [chart if png is None else png for chart, png in zip(data['charts'], drawn)]
+    return render_pdf(data, charts), drawn, time.perf_counter() - start
+
@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import zipfile
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+from django.core.cache import cache
+from .executors import PROCESS_WORKERS, run_in_process, submit_in_process
+from .anomalies import default_anomaly_params, detect_anomalies
+from .charts import CHART_CACHE_TIMEOUT, chart_data, chart_spec, lookup_chart, render_args
+from .metrics import REPORT_REQUESTS, REPORT_RENDER_LATENCY
+from .report_render import REPORT_CHART_DPI, REPORT_CHARTS, render_report
+from .stats import METRIC_COLUMNS
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+# Rendered reports are cached so repeated downloads (and Range requests that
+# resume an interrupted download) don't re-render the whole document
+REPORT_CACHE_TIMEOUT = 60 * 60  # seconds
+
+# Anomalous rows listed in the report (the summary line counts all of them)
+REPORT_ANOMALY_ROWS = 20
+# Equipment rows listed in the report
+REPORT_EQUIPMENT_ROWS = 20
+
+# Most datasets in one report bundle (/api/reports/bundle/)
+REPORT_BUNDLE_MAX = 50
+
+# What render_report needs, plus the cache keys its results are stored under
+ReportJob = namedtuple('ReportJob', 'key data chart_keys')
+
+
+def report_cache_key(dataset, include_anomalies=False):
+    # total_count is part of the key so the cached PDF is dropped if the dataset changes
+    suffix = ':anomalies' if include_anomalies else ''
+    return f'report_pdf:{dataset.id}:{dataset.total_count}{suffix}'
+
+
+def report_anomalies(dataset):
+    # The anomaly report, trimmed to what the PDF lists
+    with stage('anomalies'):
+        report = detect_anomalies(dataset, default_anomaly_params())
+    return {**report, 'anomalies': report['anomalies'][:REPORT_ANOMALY_ROWS]}
+
+
+def report_charts(dataset):
+    # For each of REPORT_CHARTS: its chart cache key, and the cached PNG (shared
+    # with /api/charts/) or the render_chart arguments for drawing it
+    keys, charts = [], []
+    for kind, width, height in REPORT_CHARTS:
+        spec = chart_spec(kind, 'png', width, height, dpi=REPORT_CHART_DPI)
+        key, content = lookup_chart(dataset, spec)
+        if content is None:
+            with stage('chart_data'):
+                content = render_args(spec, chart_data(dataset, spec))
+        keys.append(key)
+        charts.append(content)
+    return keys, charts
+
+
+def prepare_report(dataset, include_anomalies=False):
+    """Read everything a dataset's report needs from the database, for report_render.render_report."""
+    chart_keys, charts = report_charts(dataset)
+    equipment = dataset.get_equipment().values_list(
+        'equipment_name', 'equipment_type', *METRIC_COLUMNS
+    )[:REPORT_EQUIPMENT_ROWS]
+    data = {
+        'name': dataset.name,
+        'uploaded_at': dataset.uploaded_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'uploaded_by': dataset.uploaded_by.username,
+        'total_count': dataset.total_count,
+        'averages': {metric: getattr(dataset, f'avg_{metric}') for metric in METRIC_COLUMNS},
+        'type_distribution': dataset.get_type_distribution(),
+        'charts': charts,
+        'anomalies': report_anomalies(dataset) if include_anomalies else None,
+        'equipment': list(equipment),
+    }
+    return ReportJob(report_cache_key(dataset, include_anomalies), data, chart_keys)
+
+
+def finish_report(job, result):
+    """Cache render_report's result (the PDF and any charts drawn for it); returns (pdf_bytes, etag)."""
+    pdf, drawn, seconds = result
+    REPORT_RENDER_LATENCY.observe(seconds)
+    cache.set_many(
+        {key: png for key, png in zip(job.chart_keys, drawn) if png is not None}, CHART_CACHE_TIMEOUT
+    )
+    cached = (pdf, '"%s"' % hashlib.md5(pdf).hexdigest())
+    cache.set(job.key, cached, REPORT_CACHE_TIMEOUT)
+    return cached
+
+
+def cached_report(dataset, include_anomalies=False):
+    # (pdf_bytes, etag) from the cache, or None
+    with stage('cache'):
+        cached = cache.get(report_cache_key(dataset, include_anomalies))
+    REPORT_REQUESTS.labels('miss' if cached is None else 'hit').inc()
+    return cached
+
+
+def get_pdf_report(dataset, include_anomalies=False):
+    """Return (pdf_bytes, etag) for a dataset, rendering only on cache miss."""
+    cached = cached_report(dataset, include_anomalies)
+    if cached is None:
+        job = prepare_report(dataset, include_anomalies)
+        # In the process pool, so rendering doesn't hold this worker's GIL
+        with stage('render'):
+            result = run_in_process(render_report, job.data)
+        cached = finish_report(job, result)
+    return cached
+
+
+class ZipStream:
+    """Write-only file for zipfile that hands back what was written since the last take()."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def bundle_entry_name(dataset):
+    return f'report_{dataset.id}.pdf'
+
+
+def parse_dataset_ids(value):
+    """Comma separated dataset ids for a bundle, in order and without repeats; raises ValueError."""
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise ValueError('ids must be a comma separated list of dataset ids')
+    if not ids:
+        raise ValueError('ids must list at least one dataset')
+    if len(ids) > REPORT_BUNDLE_MAX:
+        raise ValueError(f'at most {REPORT_BUNDLE_MAX} datasets per bundle')
+    return ids
+
+
+def report_bundle_chunks(datasets, include_anomalies=False):
+    """
+    ZIP archive of the PDF reports of datasets, yielded entry by entry.
+    Cached reports come first; the others are rendered in the process pool,
+    at most PROCESS_WORKERS at a time (so a bundle doesn't queue ahead of every
+    other report and chart request), and each is sent as soon as it's done.
+    The next report is prepared while the pool renders, and a report that
+    fails is listed in errors.txt at the end instead of ending the archive.
+    """
+    stream = ZipStream()
+    errors = []
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+        # PDFs are compressed already; ZIP_STORED just packs them
+        misses = []
+        for dataset in datasets:
+            cached = cached_report(dataset, include_anomalies)
+            if cached is None:
+                misses.append(dataset)
+                continue
+            archive.writestr(bundle_entry_name(dataset), cached[0])
+            yield stream.take()
+
+        misses = iter(misses)
+        running = {}
+
+        def failed(dataset, error):
+            logger.exception('Report for dataset %s failed', dataset.id)
+            errors.append(f'{bundle_entry_name(dataset)}: {error}')
+
+        def start_next():
+            for dataset in misses:
+                try:
+                    job = prepare_report(dataset, include_anomalies)
+                    running[submit_in_process(render_report, job.data)] = (dataset, job)
+                    return
+                except Exception as e:
+                    failed(dataset, e)
+
+        for _ in range(PROCESS_WORKERS):
+            start_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                dataset, job = running.pop(future)
+                start_next()
+                try:
+                    pdf, _ = finish_report(job, future.result())
+                except Exception as e:
+                    failed(dataset, e)
+                    continue
+                archive.writestr(bundle_entry_name(dataset), pdf)
+                yield stream.take()
+
+        if errors:
+            archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+    yield stream.take()
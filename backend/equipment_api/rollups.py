@@ -0,0 +1,112 @@
+import math
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateTimeField, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import TrendRollup
+from .stats import METRIC_COLUMNS, sample_variance
+
+# Trend rollups: per-dataset and per-type averages of a user's uploads, kept
+# in the TrendRollup table so /api/trends/ answers with one indexed query
+# instead of clients fetching /history/ and then every /summary/<id>/.
+# The rows are written from the summary each dataset already keeps (totals
+# plus type_stats), never from its equipment rows, when a dataset is
+# completed, appended to or re-uploaded. Retention marks them evicted rather
+# than deleting them; only uploads older than the newest TREND_WINDOW are
+# dropped.
+
+TREND_WINDOW = getattr(settings, 'TREND_WINDOW', 100)  # uploads per user kept in the rollups
+DEFAULT_TREND_POINTS = 20
+
+# Lower bound for the window query when a user has fewer uploads than asked for
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def rollup_row(dataset, equipment_type, count, moments):
+    # moments: {metric: (mean, m2)}
+    row = TrendRollup(
+        user_id=dataset.uploaded_by_id, dataset_id=dataset.id, dataset_name=dataset.name,
+        uploaded_at=dataset.uploaded_at, equipment_type=equipment_type, count=count
+    )
+    for metric, (mean, m2) in moments.items():
+        setattr(row, f'avg_{metric}', mean)
+        setattr(row, f'std_{metric}', math.sqrt(sample_variance(count, m2)))
+    return row
+
+
+def refresh_rollups(dataset):
+    """Rewrite the rollup rows of a complete dataset from its stored summary."""
+    rows = [rollup_row(dataset, '', dataset.total_count, {
+        metric: (getattr(dataset, f'avg_{metric}'), getattr(dataset, f'm2_{metric}')) for metric in METRIC_COLUMNS
+    })]
+    for eq_type, stats in dataset.get_type_stats().items():
+        rows.append(rollup_row(dataset, eq_type, stats['count'], {metric: stats[metric] for metric in METRIC_COLUMNS}))
+    with transaction.atomic():
+        TrendRollup.objects.filter(dataset_id=dataset.id).delete()
+        TrendRollup.objects.bulk_create(rows)
+
+
+def prune_rollups(user):
+    # Drop the rollups of uploads older than the user's newest TREND_WINDOW
+    oldest_kept = list(
+        TrendRollup.objects.filter(user=user, equipment_type='')
+        .order_by('-uploaded_at').values_list('uploaded_at', flat=True)[TREND_WINDOW - 1:TREND_WINDOW]
+    )
+    if oldest_kept:
+        TrendRollup.objects.filter(user=user, uploaded_at__lt=oldest_kept[0]).delete()
+
+
+def parse_trend_params(params):
+    """(points, equipment type or None) from query parameters; raises ValueError."""
+    try:
+        points = int(params.get('points') or DEFAULT_TREND_POINTS)
+    except ValueError:
+        raise ValueError('points must be an integer')
+    if not 1 <= points <= TREND_WINDOW:
+        raise ValueError(f'points must be between 1 and {TREND_WINDOW}')
+    return points, params.get('type') or None
+
+
+def trend_rows(user, points, equipment_type=None):
+    """
+    Rollup rows of the user's newest `points` uploads, oldest first: a single
+    query on the (user, uploaded_at) index. Overall rows are always included;
+    per-type rows for every type, or only equipment_type if given.
+    """
+    newest = TrendRollup.objects.filter(user=user, equipment_type='').order_by('-uploaded_at')
+    start = Coalesce(
+        Subquery(newest.values('uploaded_at')[points - 1:points]), Value(EPOCH), output_field=DateTimeField()
+    )
+    rows = TrendRollup.objects.filter(user=user, uploaded_at__gte=start)
+    if equipment_type:
+        rows = rows.filter(equipment_type__in=['', equipment_type])
+    return rows.order_by('uploaded_at', 'dataset_id', 'equipment_type')
+
+
+def rollup_stats(row):
+    return {
+        'count': row.count,
+        **{f'avg_{metric}': getattr(row, f'avg_{metric}') for metric in METRIC_COLUMNS},
+        **{f'std_{metric}': getattr(row, f'std_{metric}') for metric in METRIC_COLUMNS},
+    }
+
+
+def trend_points(rows):
+    """One point per upload: its overall statistics plus a 'types' mapping."""
+    points = {}
+    for row in rows:
+        point = points.get(row.dataset_id)
+        if point is None:
+            point = points[row.dataset_id] = {
+                'dataset_id': row.dataset_id,
+                'name': row.dataset_name,
+                'uploaded_at': row.uploaded_at.isoformat(),
+                'evicted': row.evicted,
+                'types': {},
+            }
+        if row.equipment_type:
+            point['types'][row.equipment_type] = rollup_stats(row)
+        else:
+            point.update(rollup_stats(row))
+    return list(points.values())
@@ -0,0 +1,127 @@
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+from .models import EquipmentData
+from .stats import METRIC_COLUMNS
+
+METRICS = list(METRIC_COLUMNS)
+MODES = ['prefix', 'substring']
+
+# Trigram indexes can only narrow down patterns of at least three characters
+MIN_SUBSTRING_LENGTH = 3
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Trigram index over equipment names (created by migration 0006):
+# an FTS5 table kept in sync by triggers on SQLite, a pg_trgm GIN index on PostgreSQL
+FTS_TABLE = 'equipment_api_equipmentdata_fts'
+TRIGRAM_INDEX = 'equipment_name_trgm_idx'
+
+
+def parse_search_params(query_params):
+    """
+    Build the search parameters from request query parameters:
+    q, mode (prefix or substring), type (comma separated), dataset,
+    <metric>_min / <metric>_max (inclusive), limit and after (id cursor).
+    Raises ValueError on invalid values.
+    """
+    def number(name, cast=float):
+        value = query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            raise ValueError(f'{name} must be a number')
+
+    params = {
+        'q': query_params.get('q', '').strip(),
+        'mode': query_params.get('mode', 'prefix'),
+        'types': [t.strip() for t in query_params.get('type', '').split(',') if t.strip()],
+        'dataset': number('dataset', int),
+        'ranges': {metric: (number(f'{metric}_min'), number(f'{metric}_max')) for metric in METRICS},
+        'limit': min(max(number('limit', int) or DEFAULT_LIMIT, 1), MAX_LIMIT),
+        'after': number('after', int),
+    }
+    if params['mode'] not in MODES:
+        raise ValueError(f'mode must be one of: {", ".join(MODES)}')
+    if params['mode'] == 'substring' and 0 < len(params['q']) < MIN_SUBSTRING_LENGTH:
+        raise ValueError(f'substring search needs at least {MIN_SUBSTRING_LENGTH} characters')
+    return params
+
+
+def has_trigram_index():
+    # The migration skips the index where the database can't build it
+    # (SQLite without FTS5 trigram support, PostgreSQL without pg_trgm)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [TRIGRAM_INDEX])
+        else:
+            return False
+        return cursor.fetchone() is not None
+
+
+def prefix_successor(prefix):
+    # Smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def filter_name(queryset, q, mode):
+    """
+    Restrict queryset to equipment whose name starts with (prefix) or contains
+    (substring) q, case-insensitively, through an index where there is one.
+    """
+    if not q:
+        return queryset
+    if mode == 'prefix' and connection.vendor == 'sqlite':
+        # Range scan over the lower(equipment_name) B-tree index; SQLite's LIKE can't use it
+        lowered = q.lower()
+        return queryset.alias(name_lower=Lower('equipment_name')).filter(
+            name_lower__gte=lowered, name_lower__lt=prefix_successor(lowered)
+        )
+    if mode == 'prefix':
+        # PostgreSQL: served by the trigram GIN index on UPPER(equipment_name)
+        return queryset.filter(equipment_name__istartswith=q)
+
+    queryset = queryset.filter(equipment_name__icontains=q)
+    if connection.vendor == 'sqlite' and has_trigram_index():
+        # The FTS5 table narrows the rows down by trigram; icontains above keeps the
+        # match exact. LIKE ... ESCAPE bypasses the FTS index, so wildcard characters
+        # in q become '_' here, which only widens the candidate set.
+        pattern = '%' + q.replace('%', '_') + '%'
+        queryset = queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE equipment_name LIKE %s', [pattern]
+        ))
+    return queryset
+
+
+def filter_equipment(queryset, params):
+    # Apply the name, type and metric range filters of params (see parse_search_params)
+    queryset = filter_name(queryset, params['q'], params['mode'])
+    if params['types']:
+        queryset = queryset.filter(equipment_type__in=params['types'])
+    for metric, (lower, upper) in params['ranges'].items():
+        if lower is not None:
+            queryset = queryset.filter(**{f'{metric}__gte': lower})
+        if upper is not None:
+            queryset = queryset.filter(**{f'{metric}__lte': upper})
+    return queryset
+
+
+def find_equipment(storage_ids, params):
+    """
+    Return (rows, next_cursor) for equipment in the given storage datasets that
+    matches params. Rows are ordered by id; the cursor is the last id on the page.
+    """
+    queryset = filter_equipment(EquipmentData.objects.filter(dataset_id__in=storage_ids), params)
+    if params['after'] is not None:
+        queryset = queryset.filter(id__gt=params['after'])
+
+    limit = params['limit']
+    rows = list(queryset.order_by('id').values(
+        'id', 'dataset_id', 'equipment_name', 'equipment_type', *METRICS
+    )[:limit + 1])
+    next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], next_cursor
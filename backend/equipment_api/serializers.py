@@ -1,9 +1,16 @@
+import json
+from itertools import islice
 from rest_framework import serializers
-from .models import Dataset, EquipmentData
+from .models import Dataset, EquipmentData, UploadSession
+
+# Equipment rows encoded per chunk by dataset_json_chunks
+EQUIPMENT_STREAM_BATCH = 2000
 
 
 class EquipmentDataSerializer(serializers.ModelSerializer):
     # Converts EquipmentData model instances to JSON for API responses
+    equipment_type = serializers.CharField(read_only=True)  # Type name, annotated by EquipmentManager
+    
     class Meta:
         model = EquipmentData
         fields = ['id', 'equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
@@ -12,37 +19,99 @@ class EquipmentDataSerializer(serializers.ModelSerializer):
 class DatasetSerializer(serializers.ModelSerializer):
     # Full dataset serializer - includes all equipment records
     # Used when client needs complete data for a dataset
-    equipment = EquipmentDataSerializer(many=True, read_only=True)  # Nested equipment list
-    type_distribution = serializers.SerializerMethodField()  # Parse JSON to dict
+    equipment = serializers.SerializerMethodField()  # Nested equipment list (shared rows for deduplicated uploads)
+    type_distribution = serializers.SerializerMethodField()  # Most common type first
     uploaded_by_username = serializers.CharField(source='uploaded_by.username', read_only=True)  # Username string
+    var_flowrate = serializers.SerializerMethodField()  # Sample variances from the stored M2 values
+    var_pressure = serializers.SerializerMethodField()
+    var_temperature = serializers.SerializerMethodField()
     
     class Meta:
         model = Dataset
         fields = [
             'id', 'name', 'uploaded_at', 'uploaded_by_username',
             'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature',
+            'var_flowrate', 'var_pressure', 'var_temperature',
             'type_distribution', 'equipment'
         ]
     
     def get_type_distribution(self, obj):
-        # Convert JSON string to dictionary for JSON response
         return obj.get_type_distribution()
+    
+    def get_equipment(self, obj):
+        return EquipmentDataSerializer(obj.get_equipment(), many=True).data
+    
+    def get_var_flowrate(self, obj):
+        return obj.get_variance('flowrate')
+    
+    def get_var_pressure(self, obj):
+        return obj.get_variance('pressure')
+    
+    def get_var_temperature(self, obj):
+        return obj.get_variance('temperature')
 
 
 class DatasetSummarySerializer(serializers.ModelSerializer):
     # Lightweight serializer without equipment details
     # Used for history list to reduce payload size
-    type_distribution = serializers.SerializerMethodField()  # Parse JSON to dict
+    type_distribution = serializers.SerializerMethodField()  # Most common type first
     uploaded_by_username = serializers.CharField(source='uploaded_by.username', read_only=True)
+    var_flowrate = serializers.SerializerMethodField()
+    var_pressure = serializers.SerializerMethodField()
+    var_temperature = serializers.SerializerMethodField()
     
     class Meta:
         model = Dataset
         fields = [
             'id', 'name', 'uploaded_at', 'uploaded_by_username',
             'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature',
+            'var_flowrate', 'var_pressure', 'var_temperature',
             'type_distribution'
         ]
     
     def get_type_distribution(self, obj):
-        # Convert JSON string to dictionary for JSON response
         return obj.get_type_distribution()
+    
+    def get_var_flowrate(self, obj):
+        return obj.get_variance('flowrate')
+    
+    def get_var_pressure(self, obj):
+        return obj.get_variance('pressure')
+    
+    def get_var_temperature(self, obj):
+        return obj.get_variance('temperature')
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    # Chunked upload state - clients use received_chunks to resume an interrupted upload
+    received_chunks = serializers.SerializerMethodField()
+    dataset_id = serializers.PrimaryKeyRelatedField(source='dataset', read_only=True)
+    
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'filename', 'created_at', 'chunk_size', 'total_size',
+            'status', 'error', 'parsed_chunks', 'row_count', 'received_chunks', 'dataset_id'
+        ]
+    
+    def get_received_chunks(self, obj):
+        return list(obj.chunks.values_list('index', flat=True))
+
+
+def dataset_json_chunks(dataset, **envelope):
+    """
+    Byte chunks of the JSON object {**envelope, 'data': DatasetSerializer(dataset).data},
+    with the equipment list read from a cursor and encoded batch by batch, so
+    answering a large upload doesn't hold every row (or its JSON) in memory.
+    """
+    fields = EquipmentDataSerializer.Meta.fields
+    head = json.dumps({**envelope, 'data': DatasetSummarySerializer(dataset).data}, separators=(',', ':'))
+    # Reopen the trailing '}}' to add the equipment list as the last field of data
+    yield (head[:-2] + ',"equipment":[').encode('utf-8')
+    rows = dataset.get_equipment().values_list(*fields).iterator(chunk_size=EQUIPMENT_STREAM_BATCH)
+    separator = ''
+    while batch := list(islice(rows, EQUIPMENT_STREAM_BATCH)):
+        encoded = ','.join(json.dumps(dict(zip(fields, row)), separators=(',', ':')) for row in batch)
+        yield (separator + encoded).encode('utf-8')
+        separator = ','
+    yield b']}}'
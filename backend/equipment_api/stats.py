@@ -0,0 +1,78 @@
+# Metric name on Dataset (avg_<metric>, m2_<metric>) -> CSV column
+METRIC_COLUMNS = {
+    'flowrate': 'Flowrate',
+    'pressure': 'Pressure',
+    'temperature': 'Temperature',
+}
+
+
+def batch_moments(values):
+    """Return (count, mean, m2) for a pandas Series of floats."""
+    count = len(values)
+    if count == 0:
+        return 0, 0.0, 0.0
+    mean = float(values.mean())
+    m2 = float(((values - mean) ** 2).sum())
+    return count, mean, m2
+
+
+def merge_moments(a, b):
+    """
+    Combine two (count, mean, m2) triples - Chan et al.'s parallel variant of
+    Welford's algorithm. Numerically stable, and needs no access to the
+    original values, so a dataset's summary can be updated from a new batch alone.
+    """
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    count = count_a + count_b
+    if count == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta * count_b / count
+    m2 = m2_a + m2_b + delta * delta * count_a * count_b / count
+    return count, mean, m2
+
+
+def sample_variance(count, m2):
+    # Matches pandas' Series.var() (ddof=1); undefined for fewer than two values
+    return m2 / (count - 1) if count > 1 else 0.0
+
+
+def merge_type_distribution(stored, type_counts):
+    """Add counts from a {type: count} mapping to a stored distribution; most common first."""
+    distribution = dict(stored or {})
+    for eq_type, count in type_counts.items():
+        distribution[eq_type] = distribution.get(eq_type, 0) + int(count)
+    return dict(sorted(distribution.items(), key=lambda item: -item[1]))
+
+
+def type_moments(df):
+    """{type: {'count': n, metric: [mean, m2]}} for a batch of upload rows (one groupby, not a loop)."""
+    columns = list(METRIC_COLUMNS.values())
+    grouped = df[columns].astype(float).groupby(df['Type'].astype(str))
+    counts, means = grouped.size(), grouped.mean()
+    # var() is undefined (NaN) for a single row, whose M2 is 0
+    m2 = (grouped.var() * (counts - 1).to_numpy()[:, None]).fillna(0.0)
+    return {
+        eq_type: {
+            'count': int(counts[eq_type]),
+            **{metric: [float(means.at[eq_type, column]), float(m2.at[eq_type, column])]
+               for metric, column in METRIC_COLUMNS.items()},
+        }
+        for eq_type in counts.index
+    }
+
+
+def merge_type_stats(stored, batch):
+    """Merge type_moments of a new batch into stored per-type statistics."""
+    stats = dict(stored or {})
+    for eq_type, moments in batch.items():
+        stored = stats.get(eq_type, {'count': 0, **{metric: [0.0, 0.0] for metric in METRIC_COLUMNS}})
+        merged = {'count': stored['count'] + moments['count']}
+        for metric in METRIC_COLUMNS:
+            _, mean, m2 = merge_moments(
+                (stored['count'], *stored[metric]), (moments['count'], *moments[metric])
+            )
+            merged[metric] = [mean, m2]
+        stats[eq_type] = merged
+    return stats
@@ -0,0 +1,476 @@
+import gzip
+import hashlib
+import io
+import json
+import tempfile
+import zipfile
+from pathlib import Path
+from unittest import mock
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from .auth import DEMO_USER_CACHE_KEY, DEMO_USERNAME, issue_token
+from .models import Dataset, UploadSession
+from .stats import METRIC_COLUMNS
+
+HEADER = b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+CSV = HEADER + b'P1,Pump,10,1,2\nV1,Valve,20,3,4\n'
+
+
+def streamed_json(response):
+    return json.loads(b''.join(response.streaming_content))
+
+
+class ChunkedUploadTests(TestCase):
+
+    def setUp(self):
+        # The cached demo user id would outlive the rolled back user row
+        cache.clear()
+
+    def initiate(self, **fields):
+        response = self.client.post('/api/uploads/', {'filename': 'plant.csv', 'chunk_size': 1024, **fields},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def put_chunk(self, upload_id, index, body):
+        return self.client.put(f'/api/uploads/{upload_id}/chunks/{index}/', body,
+                               content_type='application/octet-stream')
+
+    def test_bad_data_in_a_later_chunk_fails_the_upload(self):
+        upload_id = self.initiate()
+        self.assertEqual(self.put_chunk(upload_id, 0, HEADER + b'P1,Pump,10,1,2\n').status_code, 201)
+        # Chunk 0 was parsed, so the upload already has a partial dataset
+        self.assertEqual(Dataset.objects.filter(is_complete=False).count(), 1)
+
+        response = self.put_chunk(upload_id, 1, b'P2,Pump,x,1,2\n')
+        self.assertEqual(response.status_code, 400, response.content)
+        upload = UploadSession.objects.get(id=upload_id)
+        self.assertEqual(upload.status, UploadSession.STATUS_FAILED)
+        self.assertIsNone(upload.dataset)
+        self.assertFalse(Dataset.objects.exists())
+
+    def upload_in_one_chunk(self, body, **fields):
+        upload_id = self.initiate(**fields)
+        self.assertEqual(self.put_chunk(upload_id, 0, body).status_code, 201)
+        return upload_id, self.client.post(f'/api/uploads/{upload_id}/complete/', {'total_chunks': 1},
+                                           content_type='application/json')
+
+    def test_malformed_sha256_is_rejected(self):
+        for value in ['abc', 'g' * 64, 'a' * 65]:
+            response = self.client.post('/api/uploads/', {'filename': 'plant.csv', 'sha256': value},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400, value)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_dataset_stores_the_computed_hash(self):
+        upload_id, response = self.upload_in_one_chunk(CSV)
+        self.assertEqual(response.status_code, 201)
+        dataset = Dataset.objects.get(id=streamed_json(response)['data']['id'])
+        self.assertEqual(dataset.content_hash, hashlib.sha256(CSV).hexdigest())
+
+    def test_declared_hash_must_match_the_chunks(self):
+        upload_id, response = self.upload_in_one_chunk(CSV, sha256=hashlib.sha256(b'other file').hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UploadSession.objects.get(id=upload_id).status, UploadSession.STATUS_FAILED)
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_declared_hash_never_reuses_stored_rows(self):
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', CSV)})
+        self.assertEqual(response.status_code, 201)
+        # Claims the earlier upload's hash but sends different content
+        other = HEADER + b'C1,Compressor,30,5,6\n'
+        upload_id = self.initiate(sha256=hashlib.sha256(CSV).hexdigest())
+        self.assertEqual(UploadSession.objects.get(id=upload_id).status, UploadSession.STATUS_PENDING)
+        self.put_chunk(upload_id, 0, other)
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/', {'total_chunks': 1},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Dataset.objects.count(), 1)
+
+    def test_extension_case_is_ignored(self):
+        self.initiate(filename='PLANT.CSV')
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('Plant.Csv', CSV)})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/uploads/', {'filename': 'plant.txt'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_header_only_file_is_rejected_by_both_upload_paths(self):
+        upload_id, response = self.upload_in_one_chunk(HEADER)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'CSV contains no rows')
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', HEADER)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'CSV contains no rows')
+        self.assertFalse(Dataset.objects.exists())
+
+
+class ReadQueryTests(TestCase):
+    # Counts every query a read makes, including the ones for its user
+
+    def setUp(self):
+        cache.clear()
+        self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', CSV)})
+        self.dataset = Dataset.objects.get()
+        self.user = User.objects.create_user('alice')
+        self.token = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(self.user)}'}
+
+    def test_history(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/history/').status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/history/', **self.token).status_code, 200)
+
+    def test_summary(self):
+        path = f'/api/summary/{self.dataset.id}/'
+        # The dataset, then its rows
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(path).status_code, 200)
+        # Another user's dataset: the lookup among the user's own misses first
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(path, **self.token).status_code, 200)
+
+    def test_health(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/health/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/health/', **self.token).status_code, 200)
+
+    def test_bad_token_is_rejected(self):
+        for token in [issue_token(self.user) + 'x', 'not-a-token']:
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/history/', HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_demo_user_is_created_once_on_a_cache_miss(self):
+        User.objects.filter(username=DEMO_USERNAME).delete()
+        self.assertIsNone(cache.get(DEMO_USER_CACHE_KEY))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/history/').status_code, 200)
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1, inserts)
+        # Now cached: only the history query
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/history/').status_code, 200)
+        self.assertEqual(User.objects.filter(username=DEMO_USERNAME).count(), 1)
+
+
+class AppendTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def upload(self, body, name='plant.csv'):
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, body)})
+        self.assertEqual(response.status_code, 201)
+        return streamed_json(response)
+
+    def append(self, dataset_id, body):
+        return self.client.post(f'/api/append/{dataset_id}/', {'file': SimpleUploadedFile('more.csv', body)})
+
+    def test_appended_dataset_is_not_reused_for_its_original_file(self):
+        dataset_id = self.upload(CSV)['data']['id']
+        self.assertEqual(self.append(dataset_id, HEADER + b'X9,Pump,30,5,6\n').status_code, 200)
+
+        body = self.upload(CSV)
+        self.assertFalse(body['deduplicated'])
+        self.assertNotEqual(body['data']['id'], dataset_id)
+        self.assertEqual(body['data']['total_count'], 2)
+        self.assertEqual([row['equipment_name'] for row in body['data']['equipment']], ['P1', 'V1'])
+
+    def test_merged_statistics_match_a_full_recompute(self):
+        first = HEADER + b''.join(
+            f'E{i},{("Pump", "Valve", "Tank")[i % 3]},{1e6 + i * 0.37},{5 + i % 7},{300 - i * 1.1}\n'.encode()
+            for i in range(9)
+        )
+        more = HEADER + b''.join(
+            f'F{i},{("Pump", "Mixer")[i % 2]},{1e6 - i * 0.91},{2 + i % 5},{280 + i * 0.6}\n'.encode()
+            for i in range(7)
+        )
+        dataset_id = self.upload(first)['data']['id']
+        # Small batches, so the merge also runs between batches of one file
+        with mock.patch('equipment_api.ingest.INGEST_BATCH_ROWS', 3):
+            self.assertEqual(self.append(dataset_id, more).status_code, 200)
+
+        df = pd.concat([pd.read_csv(io.BytesIO(first)), pd.read_csv(io.BytesIO(more))])
+        dataset = Dataset.objects.get(id=dataset_id)
+        self.assertEqual(dataset.total_count, len(df))
+        for metric, column in METRIC_COLUMNS.items():
+            self.assertAlmostEqual(getattr(dataset, f'avg_{metric}'), df[column].mean(), places=6)
+            self.assertAlmostEqual(getattr(dataset, f'm2_{metric}'), df[column].var(ddof=0) * len(df), places=6)
+        self.assertEqual(dataset.type_distribution, df['Type'].value_counts().to_dict())
+        for eq_type, group in df.groupby('Type'):
+            stats = dataset.type_stats[eq_type]
+            self.assertEqual(stats['count'], len(group))
+            for metric, column in METRIC_COLUMNS.items():
+                mean, m2 = stats[metric]
+                self.assertAlmostEqual(mean, group[column].mean(), places=6)
+                self.assertAlmostEqual(m2, group[column].var(ddof=0) * len(group), places=6)
+
+    def test_append_reports_the_new_rows(self):
+        dataset_id = self.upload(CSV)['data']['id']
+        response = self.append(dataset_id, HEADER + b'X9,Pump,30,5,6\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['appended_count'], 1)
+        self.assertEqual(response.json()['data']['total_count'], 3)
+        self.assertEqual(self.append(999999, CSV).status_code, 404)
+        self.assertEqual(self.append(dataset_id, b'Name\nX\n').status_code, 400)
+        self.assertEqual(Dataset.objects.get(id=dataset_id).total_count, 3)
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        profile_root = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_root.cleanup)
+        patcher = mock.patch('equipment_api.profiling.PROFILE_ROOT', Path(profile_root.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_profiled(self, user):
+        return self.client.get('/api/history/?profile=1', HTTP_AUTHORIZATION=f'Bearer {issue_token(user)}')
+
+    def test_staff_token_gets_a_profile(self):
+        response = self.get_profiled(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Profile-Id', response)
+
+    def test_other_tokens_do_not(self):
+        response = self.get_profiled(User.objects.create_user('alice'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        response = self.client.get('/api/history/?profile=1')
+        self.assertNotIn('X-Profile-Id', response)
+
+
+class ReadingAdminTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        body = b'Equipment Name,Type,Flowrate,Pressure,Temperature,Timestamp\n' \
+               b'Pump-1,Pump,10,1,2,2026-01-01T00:00:00Z\nValve-1,Valve,20,3,4,2026-01-01T00:00:00Z\n'
+        self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', body)})
+        self.dataset = Dataset.objects.get()
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+    def search(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/admin/equipment_api/equipmentreading/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'LIKE' in q['sql']])
+        return [str(reading) for reading in response.context['cl'].result_list]
+
+    def test_search_is_a_prefix_range_within_a_dataset(self):
+        self.assertEqual(len(self.search(f'q=Pump&dataset={self.dataset.id}')), 1)
+        self.assertEqual(self.search(f'q=pump&dataset={self.dataset.id}'), [])
+        # Across every dataset it would be a scan
+        self.assertEqual(self.search('q=Pump'), [])
+
+
+class ReadingsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        body = (b'Equipment Name,Type,Flowrate,Pressure,Temperature,Timestamp\n'
+                b'P1,Pump,10,1,2,2026-01-01T00:00:00Z\nP1,Pump,20,1,2,2026-01-01T00:30:00Z\n'
+                b'P1,Pump,40,3,4,2026-01-01T01:10:00Z\nV1,Valve,5,1,1,2026-01-01T00:10:00Z\n')
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', body)})
+        self.dataset_id = streamed_json(response)['data']['id']
+
+    def test_readings_are_aggregated_per_bucket(self):
+        response = self.client.get(f'/api/readings/{self.dataset_id}/?equipment=P1&bucket=1h')
+        self.assertEqual(response.status_code, 200)
+        buckets = response.json()['buckets']
+        self.assertEqual([(b['start'], b['count']) for b in buckets],
+                         [('2026-01-01T00:00:00Z', 2), ('2026-01-01T01:00:00Z', 1)])
+        self.assertEqual(buckets[0]['flowrate'], {'min': 10.0, 'mean': 15.0, 'max': 20.0})
+
+        response = self.client.get(f'/api/readings/{self.dataset_id}/?equipment=P1&bucket=1h&start=2026-01-01T01:00:00')
+        self.assertEqual([b['count'] for b in response.json()['buckets']], [1])
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get(f'/api/readings/{self.dataset_id}/').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/readings/{self.dataset_id}/?equipment=P1&bucket=xx').status_code, 400)
+
+
+class AnomalyTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        body = HEADER + b'P1,Pump,10,1,2\nP2,Pump,11,1,2\nP3,Pump,12,1,2\nP4,Pump,10,1,2\nP5,Pump,500,1,2\nV1,Valve,20,3,4\n'
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', body)})
+        self.dataset_id = streamed_json(response)['data']['id']
+
+    def test_outlier_is_flagged_within_its_type(self):
+        response = self.client.get(f'/api/anomalies/{self.dataset_id}/')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['total_rows'], 6)
+        self.assertEqual([a['equipment_name'] for a in body['anomalies']], ['P5'])
+        self.assertEqual(body['anomalies'][0]['reasons'], [{'method': 'iqr', 'metric': 'flowrate', 'value': 500.0}])
+
+    def test_limits_from_the_query(self):
+        response = self.client.get(f'/api/anomalies/{self.dataset_id}/?methods=limits&flowrate_max=15')
+        self.assertEqual(sorted(a['equipment_name'] for a in response.json()['anomalies']), ['P5', 'V1'])
+        self.assertEqual(self.client.get(f'/api/anomalies/{self.dataset_id}/?methods=magic').status_code, 400)
+
+
+class CompareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        base = HEADER + b'P1,Pump,10,1,2\nP2,Pump,11,1,2\nV1,Valve,20,3,4\n'
+        other = HEADER + b'P1,Pump,15,1,2\nP2,Pump,11,1,2\nC1,Compressor,30,5,6\n'
+        self.base_id, self.other_id = [
+            streamed_json(self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, body)}))['data']['id']
+            for name, body in [('base.csv', base), ('other.csv', other)]
+        ]
+
+    def test_diff_by_equipment_name(self):
+        response = self.client.get(f'/api/compare/{self.base_id}/{self.other_id}/')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['summary'], {'added': 1, 'removed': 1, 'changed': 1, 'unchanged': 1})
+        by_name = {row['equipment_name']: row for row in body['results']}
+        self.assertEqual({name: row['status'] for name, row in by_name.items()},
+                         {'C1': 'added', 'V1': 'removed', 'P1': 'changed'})
+        self.assertEqual(by_name['P1']['delta']['flowrate'], 5.0)
+        self.assertEqual(body['top_movers']['flowrate'][0]['equipment_name'], 'P1')
+
+    def test_pages_follow_the_cursor(self):
+        url = f'/api/compare/{self.base_id}/{self.other_id}/?limit=2'
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), 2)
+        second = self.client.get(f'{url}&after={first["next"]}').json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        names = [row['equipment_name'] for row in first['results'] + second['results']]
+        self.assertEqual(sorted(names), ['C1', 'P1', 'V1'])
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        body = HEADER + b'Pump-1,Pump,10,1,2\nPump-2,Pump,12,1,2\nValve-1,Valve,20,3,4\n'
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', body)})
+        self.dataset_id = streamed_json(response)['data']['id']
+
+    def names(self, query):
+        response = self.client.get(f'/api/search/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [row['equipment_name'] for row in response.json()['results']]
+
+    def test_prefix_and_substring(self):
+        self.assertEqual(self.names('q=pump'), ['Pump-1', 'Pump-2'])
+        self.assertEqual(self.names('q=e-1&mode=substring'), ['Valve-1'])
+        self.assertEqual(self.names(f'q=p&dataset={self.dataset_id}&flowrate_min=11'), ['Pump-2'])
+        self.assertEqual(self.client.get('/api/search/?q=ab&mode=substring').status_code, 400)
+
+    def test_pages_follow_the_cursor(self):
+        first = self.client.get('/api/search/?limit=2').json()
+        self.assertEqual(len(first['results']), 2)
+        second = self.client.get(f'/api/search/?limit=2&after={first["next"]}').json()
+        self.assertEqual([row['equipment_name'] for row in second['results']], ['Valve-1'])
+        self.assertIsNone(second['next'])
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', CSV)})
+        self.dataset_id = streamed_json(response)['data']['id']
+
+    def export(self, file_format, query=''):
+        response = self.client.get(f'/api/export/{self.dataset_id}/{file_format}/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_can_be_uploaded_again(self):
+        response, body = self.export('csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="plant.csv"')
+        df = pd.read_csv(io.BytesIO(body))
+        self.assertEqual(list(df.columns), ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
+        self.assertEqual(df['Equipment Name'].tolist(), ['P1', 'V1'])
+
+    def test_compressed_and_parquet_formats_with_filters(self):
+        _, body = self.export('csv.gz', 'q=P1&columns=equipment_name,flowrate')
+        self.assertEqual(gzip.decompress(body), b'Equipment Name,Flowrate\r\nP1,10.0\r\n')
+        _, body = self.export('parquet')
+        df = pd.read_parquet(io.BytesIO(body))
+        self.assertEqual(df['Flowrate'].tolist(), [10.0, 20.0])
+        self.assertEqual(self.client.get(f'/api/export/{self.dataset_id}/xml/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/export/{self.dataset_id}/csv/?columns=secret').status_code, 400)
+
+
+class ReportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dataset_ids = [
+            streamed_json(self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, body)}))['data']['id']
+            for name, body in [('plant.csv', CSV), ('more.csv', HEADER + b'C1,Compressor,30,5,6\n')]
+        ]
+
+    def test_range_resumes_the_same_report(self):
+        url = f'/api/report/{self.dataset_ids[0]}/'
+        full = self.client.get(url)
+        self.assertEqual(full.status_code, 200)
+        self.assertTrue(full.content.startswith(b'%PDF'))
+        etag = full['ETag']
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(full.content)}')
+        self.assertEqual(response.content, full.content[10:20])
+        # A changed report is sent whole rather than spliced onto the old one
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, full.content)
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(full.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_bundle_zips_the_reports(self):
+        response = self.client.get(f'/api/reports/bundle/?ids={",".join(map(str, self.dataset_ids))}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as bundle:
+            names = bundle.namelist()
+            self.assertEqual(len(names), 2)
+            self.assertTrue(all(bundle.read(name).startswith(b'%PDF') for name in names))
+
+        response = self.client.get(f'/api/reports/bundle/?ids={self.dataset_ids[0]},999999')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['missing'], [999999])
+
+
+class ChartTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', CSV)})
+        self.dataset_id = streamed_json(response)['data']['id']
+
+    def test_unchanged_chart_is_revalidated_with_its_etag(self):
+        url = f'/api/charts/{self.dataset_id}/types/svg/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Appending rows changes the chart
+        self.client.post(f'/api/append/{self.dataset_id}/', {'file': SimpleUploadedFile('more.csv', CSV)})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unknown_kind_is_rejected(self):
+        self.assertEqual(self.client.get(f'/api/charts/{self.dataset_id}/pies/svg/').status_code, 400)
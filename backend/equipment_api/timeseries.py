@@ -0,0 +1,107 @@
+import re
+from datetime import datetime, timezone
+from django.db.models import Avg, Count, Func, IntegerField, Max, Min
+from .stats import METRIC_COLUMNS
+
+# Bucket sizes picked automatically when the client doesn't ask for one,
+# smallest first; the first that yields at most DEFAULT_BUCKET_COUNT buckets wins
+AUTO_BUCKET_SIZES = [60, 300, 900, 3600, 6 * 3600, 86400, 7 * 86400, 30 * 86400]
+DEFAULT_BUCKET_COUNT = 500
+# Upper limit on buckets per response, to keep payloads bounded
+MAX_BUCKET_COUNT = 10000
+
+BUCKET_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+class EpochSeconds(Func):
+    """Whole seconds since 1970-01-01 UTC of a datetime column, computed in the database."""
+    output_field = IntegerField()
+    template = 'CAST(EXTRACT(EPOCH FROM %(expressions)s) AS BIGINT)'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Datetimes are stored as UTC text; julianday() is available on every
+        # SQLite version Django supports (unixepoch() needs 3.38+)
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(ROUND((julianday(%(expressions)s) - 2440587.5) * 86400) AS INTEGER)',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+def parse_bucket(value):
+    """Parse a bucket size like '300', '15m', '1h' or '1d' into seconds; None if invalid."""
+    match = re.fullmatch(r'\s*(\d+)\s*([smhdw]?)\s*', value or '')
+    if not match:
+        return None
+    seconds = int(match.group(1)) * BUCKET_UNITS[match.group(2) or 's']
+    return seconds or None
+
+
+def pick_bucket(start, end):
+    span = max((end - start).total_seconds(), 1)
+    for size in AUTO_BUCKET_SIZES:
+        if span / size <= DEFAULT_BUCKET_COUNT:
+            return size
+    return AUTO_BUCKET_SIZES[-1]
+
+
+def bucketed_readings(readings, start, end, bucket=None):
+    """
+    Downsample a queryset of EquipmentReading into fixed-width time buckets.
+
+    start/end bound the range (end exclusive) and default to the first/last
+    reading. Buckets are aligned to multiples of the bucket size since the
+    epoch, so the same bucket covers the same interval across queries.
+    Returns (bucket_seconds, buckets), where each bucket has its start time,
+    reading count and min/mean/max per metric. Grouping and aggregation run
+    in the database, so only one row per bucket is transferred.
+    Raises ValueError if the range would produce more than MAX_BUCKET_COUNT buckets.
+    """
+    if start is None:
+        start = readings.order_by('timestamp').values_list('timestamp', flat=True).first()
+    # An explicit end is exclusive; without one the range runs up to and
+    # including the last reading
+    end_filter = 'timestamp__lt'
+    if end is None:
+        end = readings.order_by('-timestamp').values_list('timestamp', flat=True).first()
+        end_filter = 'timestamp__lte'
+    if start is None or end is None:
+        return bucket or 0, []
+
+    bucket = bucket or pick_bucket(start, end)
+    if (end - start).total_seconds() / bucket > MAX_BUCKET_COUNT:
+        minimum = int((end - start).total_seconds() // MAX_BUCKET_COUNT) + 1
+        raise ValueError(f'Too many buckets; use a bucket of at least {minimum} seconds')
+
+    readings = readings.filter(timestamp__gte=start, **{end_filter: end})
+    aggregates = {'count': Count('id')}
+    for metric in METRIC_COLUMNS:
+        aggregates[f'{metric}_min'] = Min(metric)
+        aggregates[f'{metric}_mean'] = Avg(metric)
+        aggregates[f'{metric}_max'] = Max(metric)
+    rows = (
+        readings.order_by()
+        .annotate(bucket=EpochSeconds('timestamp') / bucket)
+        .values('bucket')
+        .annotate(**aggregates)
+        .order_by('bucket')
+    )
+
+    buckets = []
+    for row in rows:
+        buckets.append({
+            'start': datetime.fromtimestamp(row['bucket'] * bucket, tz=timezone.utc),
+            'count': row['count'],
+            **{
+                metric: {
+                    'min': row[f'{metric}_min'],
+                    'mean': row[f'{metric}_mean'],
+                    'max': row[f'{metric}_max'],
+                }
+                for metric in METRIC_COLUMNS
+            }
+        })
+    return bucket, buckets
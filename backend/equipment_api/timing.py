@@ -0,0 +1,111 @@
+import json
+import logging
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Per-stage request timings, reported in the Server-Timing response header
+# and logged as one JSON line per request. Stages are marked with
+#     with stage('parse'): ...
+# or @timed('render'). Outside an instrumented request (or with
+# SERVER_TIMING = False) stage() returns a shared no-op context manager.
+
+logger = logging.getLogger('equipment_api.timing')
+
+_timings = ContextVar('request_timings', default=None)
+_NO_STAGE = nullcontext()
+
+
+class Stage:
+    __slots__ = ('timings', 'name', 'start')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        # Repeated stages (e.g. one insert per chunk) add up
+        elapsed = (time.perf_counter() - self.start) * 1000
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+
+
+def stage(name):
+    """Context manager timing a named stage of the current request."""
+    timings = _timings.get()
+    return _NO_STAGE if timings is None else Stage(timings, name)
+
+
+def timed(name):
+    """Decorator form of stage()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing_header(timings):
+    # e.g. 'parse;dur=12.3, insert;dur=40.1, total;dur=61.0'
+    return ', '.join(f'{name};dur={ms:.1f}' for name, ms in timings.items())
+
+
+class ServerTimingMiddleware:
+    """
+    Collect stage timings for each request, add them (plus the total) as a
+    Server-Timing header and log them. Removed from the middleware chain
+    entirely when settings.SERVER_TIMING is False. Works in sync and async
+    chains (the context variable follows async views into sync_to_async).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    def finish(self, request, response, timings, start):
+        timings['total'] = (time.perf_counter() - start) * 1000
+
+        response['Server-Timing'] = server_timing_header(timings)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'timings_ms': {name: round(ms, 2) for name, ms in timings.items()},
+        }))
+        return response
@@ -0,0 +1,28 @@
+import hashlib
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Computes the SHA-256 of each uploaded file while it streams in.
+
+    Must come first in FILE_UPLOAD_HANDLERS: it passes every chunk on
+    unchanged to the regular memory/temp-file handlers and stores the digests
+    in request.upload_hashes (field name -> hex digest), so no second pass over
+    the file is needed for deduplication.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_hashes'):
+            self.request.upload_hashes = {}
+        self.request.upload_hashes[self.field_name] = self.hasher.hexdigest()
+        # Returning None lets the next handler build the file object
+        return None
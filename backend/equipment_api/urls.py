@@ -1,12 +1,28 @@
 from django.urls import path
 from . import views
+from .metrics import metrics_view
 
 urlpatterns = [
     path('auth/login/', views.login_view, name='login'),
     path('auth/logout/', views.logout_view, name='logout'),
     path('upload/', views.upload_csv, name='upload'),
+    path('append/<int:dataset_id>/', views.append_csv, name='append'),
+    path('uploads/', views.initiate_upload, name='upload-initiate'),
+    path('uploads/<uuid:upload_id>/', views.upload_status, name='upload-status'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', views.upload_chunk, name='upload-chunk'),
+    path('uploads/<uuid:upload_id>/complete/', views.complete_upload, name='upload-complete'),
     path('summary/<int:dataset_id>/', views.get_summary, name='summary'),
+    path('readings/<int:dataset_id>/', views.get_readings, name='readings'),
+    path('anomalies/<int:dataset_id>/', views.get_anomalies, name='anomalies'),
+    path('compare/<int:base_id>/<int:other_id>/', views.compare_datasets, name='compare'),
+    path('export/<int:dataset_id>/<str:file_format>/', views.export_dataset, name='export'),
+    path('search/', views.search_equipment, name='search'),
     path('history/', views.get_history, name='history'),
+    path('trends/', views.get_trends, name='trends'),
+    path('events/', views.event_stream, name='events'),
     path('report/<int:dataset_id>/', views.generate_pdf_report, name='report'),
+    path('reports/bundle/', views.report_bundle, name='report-bundle'),
+    path('charts/<int:dataset_id>/<slug:kind>/<slug:file_format>/', views.chart_image, name='chart'),
     path('health/', views.health_check, name='health'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
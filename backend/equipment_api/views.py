@@ -1,34 +1,97 @@
+import asyncio
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.models import User
+from django.contrib.auth import authenticate, logout
 from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
 from django.views.decorators.csrf import csrf_exempt
-from .models import Dataset, EquipmentData
-from .serializers import DatasetSerializer, DatasetSummarySerializer, EquipmentDataSerializer
-import pandas as pd
-import io
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.units import inch
-from django.http import HttpResponse
-from datetime import datetime
-
-
-def get_request_user(request):
-    """Return authenticated user or a fallback demo user for dev mode."""
-    user = getattr(request, 'user', None)
-    if user and getattr(user, 'is_authenticated', False):
-        return user
-    demo_user, created = User.objects.get_or_create(username='demo')
-    if created or demo_user.has_usable_password():
-        demo_user.set_unusable_password()
-        demo_user.save()
-    return demo_user
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
+from django.core import signing
+from .auth import TOKEN_MAX_AGE, aget_request_user, get_request_user, issue_token, token_user
+from .models import Dataset, EquipmentData, UploadSession
+from .serializers import (
+    DatasetSerializer, DatasetSummarySerializer, EquipmentDataSerializer, UploadSessionSerializer, dataset_json_chunks
+)
+from .ingest import (
+    IngestError, UploadNotReady, create_dataset_from_frames, read_csv_batches, store_chunk,
+    find_duplicate, create_dataset_reference, append_frames_to_dataset,
+    advance_parsing, finalize_upload, parse_sha256, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+)
+from .admission import Overloaded, QuotaExceeded, admission, admit_upload, check_quota, chunk_cost, precheck_upload
+from .ranges import ranged_response
+from .anomalies import detect_anomalies, parse_anomaly_params
+from .diff import (
+    STATUSES, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, DEFAULT_TOP, MAX_TOP,
+    get_diff, diff_page, diff_summary, top_movers
+)
+from .reports import get_pdf_report, parse_dataset_ids, report_bundle_chunks
+from .charts import CHART_FORMATS, aget_chart, chart_etag, parse_chart_spec
+from .metrics import UPLOAD_BYTES
+from .timing import stage
+from .search import parse_search_params, find_equipment
+from .export import FORMATS, ExportUnavailable, export_chunks, export_filename, parse_columns
+from .timeseries import bucketed_readings, parse_bucket
+from .rollups import parse_trend_params, trend_points, trend_rows
+from . import events
+from datetime import datetime, timezone as dt_timezone
+
+
+async def aget_visible_dataset(request, dataset_id):
+    # Async get_visible_dataset; the owner is fetched along for uploaded_by_username
+    user = await aget_request_user(request)
+    datasets = Dataset.objects.select_related('uploaded_by')
+    dataset = await datasets.filter(id=dataset_id, uploaded_by=user).afirst()
+    return dataset or await datasets.filter(id=dataset_id).afirst()
+
+
+async def aiterate(iterator):
+    # Feed a sync iterator (DB cursor plus encoding) to an async response.
+    # Each step runs on this request's sync thread, so the cursor stays with
+    # the connection that opened it.
+    next_chunk = sync_to_async(next)
+    done = object()
+    while (chunk := await next_chunk(iterator, done)) is not done:
+        yield chunk
+
+
+def dataset_response(request, dataset, status_code, **envelope):
+    # {**envelope, 'data': <dataset with its equipment list>} streamed while it's
+    # encoded (see serializers.dataset_json_chunks); async iterator under ASGI,
+    # as in export_dataset
+    chunks = dataset_json_chunks(dataset, **envelope)
+    if isinstance(request._request, ASGIRequest):
+        chunks = aiterate(chunks)
+    return StreamingHttpResponse(chunks, status=status_code, content_type='application/json')
+
+
+def overloaded_response(error):
+    # 429 for an upload refused by admission control (see admission.py)
+    return Response(
+        {'error': str(error), 'retry_after': error.retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+def refuse_upload_early(request, user, new_dataset=True):
+    # Quota and queue checks from Content-Length alone, before a large body is
+    # received for nothing. Returns the error response, or None to carry on.
+    try:
+        precheck_upload(user, int(request.META.get('CONTENT_LENGTH') or 0), new_dataset)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except QuotaExceeded as e:
+        return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except ValueError:
+        pass
+    return None
 
 
 @api_view(['POST'])
@@ -44,11 +107,13 @@ def login_view(request):
     
     user = authenticate(request, username=username, password=password)
     if user is not None:
-        login(request, user)
+        # No session is created: clients send the token as "Authorization: Bearer <token>"
         return Response({
             'message': 'Login successful',
             'username': user.username,
-            'user_id': user.id
+            'user_id': user.id,
+            'token': issue_token(user),
+            'expires_in': TOKEN_MAX_AGE
         })
     else:
         return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -58,7 +123,7 @@ def login_view(request):
 @csrf_exempt
 @permission_classes([AllowAny])
 def logout_view(request):
-    """Logout endpoint"""
+    """Logout endpoint (tokens are stateless: clients discard theirs; this ends any session)"""
     logout(request)
     return Response({'message': 'Logout successful'})
 
@@ -68,101 +133,506 @@ def logout_view(request):
 @permission_classes([AllowAny])
 def upload_csv(request):
     """Upload and process CSV file"""
+    user = get_request_user(request)
+    refused = refuse_upload_early(request, user)
+    if refused is not None:
+        return refused
+    
     if 'file' not in request.FILES:
         return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
     
     csv_file = request.FILES['file']
     
     # Validate file type
-    if not csv_file.name.endswith('.csv'):
+    if not csv_file.name.lower().endswith('.csv'):
         return Response({'error': 'File must be a CSV'}, status=status.HTTP_400_BAD_REQUEST)
     
+    UPLOAD_BYTES.labels('file').observe(csv_file.size)
     try:
-        # Read CSV with pandas
-        df = pd.read_csv(csv_file)
-        
-        # Validate required columns
-        required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-        if not all(col in df.columns for col in required_columns):
-            return Response({
-                'error': f'CSV must contain columns: {", ".join(required_columns)}'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Calculate summary statistics
-        total_count = len(df)
-        avg_flowrate = df['Flowrate'].mean()
-        avg_pressure = df['Pressure'].mean()
-        avg_temperature = df['Temperature'].mean()
-        type_distribution = df['Type'].value_counts().to_dict()
+        # The file was hashed while it streamed in (uploads.HashingUploadHandler);
+        # re-uploads of identical content share the stored rows instead of being parsed again
+        content_hash = getattr(request, 'upload_hashes', {}).get('file', '')
+        with stage('dedup'):
+            duplicate = find_duplicate(user, content_hash)
+        if duplicate is not None:
+            dataset = create_dataset_reference(duplicate, csv_file.name, user)
+        else:
+            # Once admitted, parse and store the CSV batch by batch, then apply retention
+            with admit_upload(user, csv_file):
+                dataset = create_dataset_from_frames(
+                    csv_file.name, user, read_csv_batches(csv_file), content_hash, csv_file.size
+                )
         
-        # Create dataset
-        user = get_request_user(request)
-        dataset = Dataset.objects.create(
-            name=csv_file.name,
-            uploaded_by=user,
-            total_count=total_count,
-            avg_flowrate=avg_flowrate,
-            avg_pressure=avg_pressure,
-            avg_temperature=avg_temperature
+        return dataset_response(
+            request, dataset, status.HTTP_201_CREATED,
+            message='File uploaded successfully', deduplicated=duplicate is not None
         )
-        dataset.set_type_distribution(type_distribution)
-        dataset.save()
-        
-        # Create equipment records
-        for _, row in df.iterrows():
-            EquipmentData.objects.create(
-                dataset=dataset,
-                equipment_name=row['Equipment Name'],
-                equipment_type=row['Type'],
-                flowrate=row['Flowrate'],
-                pressure=row['Pressure'],
-                temperature=row['Temperature']
-            )
-        
-        # Keep only last 5 datasets per user
-        user_datasets = Dataset.objects.filter(uploaded_by=user)
-        if user_datasets.count() > 5:
-            datasets_to_delete = user_datasets[5:]
-            for ds in datasets_to_delete:
-                ds.delete()
-        
-        serializer = DatasetSerializer(dataset)
-        return Response({
-            'message': 'File uploaded successfully',
-            'data': serializer.data
-        }, status=status.HTTP_201_CREATED)
     
+    except Overloaded as e:
+        return overloaded_response(e)
+    except QuotaExceeded as e:
+        return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
+@api_view(['POST'])
+@csrf_exempt
 @permission_classes([AllowAny])
-def get_summary(request, dataset_id):
-    """Get summary for a specific dataset"""
+def append_csv(request, dataset_id):
+    """
+    Append the rows of an uploaded CSV to an existing dataset.
+    The summary (count, averages, variances, type distribution) is updated
+    from the new rows only, so the cost depends on the batch size.
+    """
+    user = get_request_user(request)
+    refused = refuse_upload_early(request, user, new_dataset=False)
+    if refused is not None:
+        return refused
+    
+    if 'file' not in request.FILES:
+        return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    csv_file = request.FILES['file']
+    if not csv_file.name.lower().endswith('.csv'):
+        return Response({'error': 'File must be a CSV'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    UPLOAD_BYTES.labels('append').observe(csv_file.size)
     try:
-        user = get_request_user(request)
-        dataset = Dataset.objects.get(id=dataset_id, uploaded_by=user)
-        serializer = DatasetSerializer(dataset)
-        return Response(serializer.data)
-    except Dataset.DoesNotExist:
+        with admit_upload(user, csv_file, new_dataset=False):
+            dataset, appended = append_frames_to_dataset(
+                dataset_id, user, read_csv_batches(csv_file), csv_file.size
+            )
+    except Overloaded as e:
+        return overloaded_response(e)
+    except QuotaExceeded as e:
+        return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if dataset is None:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    # The equipment list is omitted - clients already have the earlier rows
+    return Response({
+        'message': f'Appended {appended} rows',
+        'appended_count': appended,
+        'data': DatasetSummarySerializer(dataset).data
+    })
+
+
+@api_view(['POST'])
+@csrf_exempt
+@permission_classes([AllowAny])
+def initiate_upload(request):
+    """
+    Start a resumable chunked upload for a large CSV file.
+    The optional sha256 of the whole file is checked against the chunks when
+    the upload is completed; a mismatch fails the upload.
+    """
+    filename = request.data.get('filename', '')
+    if not filename.lower().endswith('.csv'):
+        return Response({'error': 'File must be a CSV'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        content_hash = parse_sha256(request.data.get('sha256'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        chunk_size = int(request.data.get('chunk_size') or DEFAULT_CHUNK_SIZE)
+        total_size = request.data.get('total_size')
+        total_size = int(total_size) if total_size is not None else None
+    except (TypeError, ValueError):
+        return Response({'error': 'chunk_size and total_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        return Response({'error': f'chunk_size must be between 1 and {MAX_CHUNK_SIZE}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # A declared hash is never used to reuse stored rows: it's only known to be
+    # right once the chunks have been received and hashed
+    user = get_request_user(request)
+    if total_size:
         try:
-            dataset = Dataset.objects.get(id=dataset_id)
-            serializer = DatasetSerializer(dataset)
-            return Response(serializer.data)
-        except Dataset.DoesNotExist:
-            return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+            check_quota(user, total_size, 0)
+        except QuotaExceeded as e:
+            return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    
+    upload = UploadSession.objects.create(
+        filename=filename,
+        uploaded_by=user,
+        chunk_size=chunk_size,
+        total_size=total_size,
+        content_hash=content_hash
+    )
+    return Response(UploadSessionSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+def get_upload_session(request, upload_id):
+    # Chunked uploads are only visible to the user who started them
+    return UploadSession.objects.filter(id=upload_id, uploaded_by=get_request_user(request)).first()
 
 
 @api_view(['GET'])
+@permission_classes([AllowAny])
+def upload_status(request, upload_id):
+    """Report received/parsed chunks so a client can resume an upload"""
+    upload = get_upload_session(request, upload_id)
+    if upload is None:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(UploadSessionSerializer(upload).data)
+
+
+@api_view(['PUT'])
 @csrf_exempt
 @permission_classes([AllowAny])
-def get_history(request):
-    """Get last 5 datasets"""
+def upload_chunk(request, upload_id, index):
+    """
+    Store one chunk (raw request body) of a chunked upload.
+    An optional X-Chunk-SHA256 header is verified against the body. Re-sending
+    a chunk with identical content is a no-op, so retries are always safe.
+    """
+    upload = get_upload_session(request, upload_id)
+    if upload is None:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    if upload.status != UploadSession.STATUS_PENDING:
+        return Response({'error': f'Upload is {upload.status}'}, status=status.HTTP_409_CONFLICT)
+    
+    try:
+        # Read the raw stream rather than request.body so chunks larger than
+        # DATA_UPLOAD_MAX_MEMORY_SIZE are written to disk without buffering
+        with stage('store'):
+            chunk, created = store_chunk(upload, index, request.stream, request.META.get('HTTP_X_CHUNK_SHA256'))
+        if created:
+            UPLOAD_BYTES.labels('chunk').observe(chunk.size)
+        # Ingest every chunk that is now contiguous, overlapping parsing with the
+        # transfer - unless admission control has no room right now: the chunk is
+        # stored, and a later PUT or the completion parses it instead
+        try:
+            with admission.admit(chunk_cost(upload, index), timeout=0):
+                advance_parsing(upload)
+        except Overloaded:
+            pass
+    except IngestError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'index': chunk.index,
+        'size': chunk.size,
+        'sha256': chunk.sha256,
+        'created': created
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@csrf_exempt
+@permission_classes([AllowAny])
+def complete_upload(request, upload_id):
+    """Finalize a chunked upload and return the dataset (idempotent)"""
+    upload = get_upload_session(request, upload_id)
+    if upload is None:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        total_chunks = int(request.data.get('total_chunks'))
+    except (TypeError, ValueError):
+        return Response({'error': 'total_chunks is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    already_complete = upload.status == UploadSession.STATUS_COMPLETE
+    try:
+        if already_complete:
+            dataset = upload.dataset
+        else:
+            # Chunks deferred by admission control are parsed here
+            with admission.admit(chunk_cost(upload, upload.parsed_chunks)):
+                dataset = finalize_upload(upload, total_chunks)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except UploadNotReady as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    except IngestError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if dataset is None:
+        # Completed earlier but the dataset has since been removed by retention
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return dataset_response(
+        request, dataset, status.HTTP_200_OK if already_complete else status.HTTP_201_CREATED,
+        message='File uploaded successfully'
+    )
+
+
+@require_GET
+async def get_summary(request, dataset_id):
+    """Get summary for a specific dataset"""
+    dataset = await aget_visible_dataset(request, dataset_id)
+    if dataset is None:
+        return JsonResponse({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    # Serializing reads every equipment row, so it runs off the event loop
+    with stage('serialize'):
+        data = await sync_to_async(lambda: DatasetSerializer(dataset).data)()
+    return JsonResponse(data)
+
+
+def get_visible_dataset(request, dataset_id):
+    # Same lookup as get_summary: the user's own dataset first, then any dataset; None if missing
     user = get_request_user(request)
-    datasets = Dataset.objects.filter(uploaded_by=user)[:5]
-    serializer = DatasetSummarySerializer(datasets, many=True)
-    return Response(serializer.data)
+    dataset = Dataset.objects.filter(id=dataset_id, uploaded_by=user).first()
+    return dataset or Dataset.objects.filter(id=dataset_id).first()
+
+
+def parse_time_param(value):
+    # ISO 8601 datetime or date; naive values are taken as UTC. None if missing, ValueError if invalid.
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date/time: {value}')
+        parsed = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_readings(request, dataset_id):
+    """
+    Time-bucketed aggregates of one equipment's readings.
+    Query parameters: equipment (required), start/end (ISO 8601, end exclusive)
+    and bucket (seconds, or with a unit: 15m, 1h, 1d; picked from the range if omitted).
+    """
+    dataset = get_visible_dataset(request, dataset_id)
+    if dataset is None:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    equipment = request.query_params.get('equipment')
+    if not equipment:
+        return Response({'error': 'equipment parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    bucket = None
+    if request.query_params.get('bucket'):
+        bucket = parse_bucket(request.query_params['bucket'])
+        if bucket is None:
+            return Response({'error': 'bucket must be a number of seconds, optionally with a unit (s, m, h, d, w)'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        start = parse_time_param(request.query_params.get('start'))
+        end = parse_time_param(request.query_params.get('end'))
+        readings = dataset.get_readings().filter(equipment_name=equipment)
+        bucket, buckets = bucketed_readings(readings, start, end, bucket)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'dataset_id': dataset.id,
+        'equipment': equipment,
+        'bucket_seconds': bucket,
+        'buckets': buckets
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_anomalies(request, dataset_id):
+    """
+    Flag outliers per equipment type (z-score, IQR, engineering limits).
+    Query parameters: methods, z, iqr_k, limit and <metric>_min/<metric>_max.
+    """
+    dataset = get_visible_dataset(request, dataset_id)
+    if dataset is None:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        params = parse_anomaly_params(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({'dataset_id': dataset.id, **detect_anomalies(dataset, params)})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def compare_datasets(request, base_id, other_id):
+    """
+    Diff two datasets joined on equipment name: added/removed/changed
+    equipment with per-metric deltas, plus the top movers per metric.
+    Query parameters: status (comma separated, default added,removed,changed),
+    limit, after (cursor from the previous page's "next") and top.
+    """
+    base = get_visible_dataset(request, base_id)
+    other = get_visible_dataset(request, other_id)
+    if base is None or other is None:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    statuses = [s.strip() for s in request.query_params.get('status', 'added,removed,changed').split(',') if s.strip()]
+    if not statuses or any(s not in STATUSES for s in statuses):
+        return Response({'error': f'status must be a comma separated subset of: {", ".join(STATUSES)}'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        top = min(max(int(request.query_params.get('top', DEFAULT_TOP)), 0), MAX_TOP)
+    except ValueError:
+        return Response({'error': 'limit and top must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # The full diff is computed once per dataset pair and cached; pages are slices of it
+    diff = get_diff(base, other)
+    results, next_cursor = diff_page(diff, statuses, request.query_params.get('after'), limit)
+    
+    return Response({
+        'base': {'id': base.id, 'name': base.name, 'total_count': base.total_count},
+        'other': {'id': other.id, 'name': other.name, 'total_count': other.total_count},
+        'summary': diff_summary(diff),
+        'average_delta': {
+            metric: getattr(other, f'avg_{metric}') - getattr(base, f'avg_{metric}')
+            for metric in ('flowrate', 'pressure', 'temperature')
+        },
+        'top_movers': top_movers(diff, top),
+        'results': results,
+        'next': next_cursor
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_equipment(request):
+    """
+    Find equipment by name across the user's datasets (or one, with dataset=<id>).
+    Query parameters: q, mode (prefix or substring), type (comma separated),
+    <metric>_min/<metric>_max, limit and after (cursor from the previous page's "next").
+    """
+    try:
+        params = parse_search_params(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if params['dataset'] is not None:
+        dataset = get_visible_dataset(request, params['dataset'])
+        if dataset is None:
+            return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+        datasets = [dataset]
+    else:
+        datasets = Dataset.objects.filter(uploaded_by=get_request_user(request), is_complete=True)
+    
+    # Rows live under the storage dataset; report them under the dataset the user sees
+    dataset_ids = {}
+    for dataset in datasets:
+        dataset_ids.setdefault(dataset.storage_id, dataset.id)
+    rows, next_cursor = find_equipment(list(dataset_ids), params)
+    for row in rows:
+        row['dataset_id'] = dataset_ids[row['dataset_id']]
+    
+    return Response({'results': rows, 'next': next_cursor})
+
+
+@require_GET
+async def export_dataset(request, dataset_id, file_format):
+    """
+    Stream a dataset's equipment rows as csv, csv.gz or parquet.
+    Query parameters: columns (comma separated) and the search filters
+    q, mode, type and <metric>_min/<metric>_max.
+    """
+    if file_format not in FORMATS:
+        return JsonResponse({'error': f'format must be one of: {", ".join(FORMATS)}'}, status=status.HTTP_404_NOT_FOUND)
+    dataset = await aget_visible_dataset(request, dataset_id)
+    if dataset is None:
+        return JsonResponse({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        params = parse_search_params(request.GET)
+        columns = parse_columns(request.GET.get('columns'))
+        chunks = export_chunks(dataset, file_format, columns, params)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ExportUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    
+    # Rows are read and encoded batch by batch while the response is sent,
+    # so memory use doesn't grow with the dataset. Under ASGI the body must be
+    # an async iterator (Django would otherwise buffer all of it first); under
+    # WSGI it must stay a sync one, for the same reason.
+    if isinstance(request, ASGIRequest):
+        chunks = aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type=FORMATS[file_format][1])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(dataset, file_format)}"'
+    return response
+
+
+@require_GET
+async def get_history(request):
+    """Get last 5 datasets"""
+    user = await aget_request_user(request)
+    datasets = Dataset.objects.filter(uploaded_by=user, is_complete=True).select_related('uploaded_by')[:5]
+    serializer = DatasetSummarySerializer([dataset async for dataset in datasets], many=True)
+    return JsonResponse(serializer.data, safe=False)
+
+
+@require_GET
+async def get_trends(request):
+    """
+    Averages and standard deviations of the user's uploads over time, overall
+    and per equipment type, oldest first. Answered from the trend rollups in
+    one query, so evicted uploads are included and no equipment rows are read.
+    Query parameters: points (newest uploads, default 20) and type.
+    """
+    try:
+        points, equipment_type = parse_trend_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    user = await aget_request_user(request)
+    rows = [row async for row in trend_rows(user, points, equipment_type)]
+    return JsonResponse({'points': trend_points(rows)})
+
+
+async def event_chunks(subscription):
+    # The open stream under ASGI: events as they're published, keep-alive
+    # comments in between. The subscription ends when the client disconnects
+    # (Django cancels the response) or the server shuts down.
+    try:
+        yield f'retry: {events.RETRY_MILLISECONDS}\n\n'.encode()
+        while True:
+            yield await subscription.aget(events.EVENT_KEEPALIVE)
+    finally:
+        events.unsubscribe(subscription)
+
+
+def sync_event_chunks(subscription):
+    # The same under WSGI (runserver), which ties up a thread per open stream
+    try:
+        yield f'retry: {events.RETRY_MILLISECONDS}\n\n'.encode()
+        while True:
+            yield subscription.get(events.EVENT_KEEPALIVE)
+    finally:
+        events.unsubscribe(subscription)
+
+
+@require_GET
+async def event_stream(request):
+    """
+    Server-Sent Events for the current user (see events.py): 'progress' while
+    an upload is stored, 'ready' and 'updated' with the /history/ entry of a
+    dataset, 'evicted' when retention deletes one, and 'resync' when events
+    were dropped. EventSource can't send an Authorization header, so the
+    token may be passed as ?token= here instead.
+    """
+    user = None
+    if request.GET.get('token'):
+        try:
+            user = token_user(request.GET['token'])
+        except signing.BadSignature:
+            return JsonResponse({'error': 'Invalid or expired token'}, status=status.HTTP_401_UNAUTHORIZED)
+    user = user or await aget_request_user(request)
+    
+    # Subscribed before the response starts, so a client that fetches
+    # /history/ once the stream is open misses nothing in between
+    if isinstance(request, ASGIRequest):
+        chunks = event_chunks(events.subscribe(user.id, asyncio.get_running_loop()))
+    else:
+        chunks = sync_event_chunks(events.subscribe(user.id))
+    response = StreamingHttpResponse(chunks, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx would otherwise hold events back
+    return response
 
 
 @api_view(['GET'])
@@ -179,123 +649,77 @@ def generate_pdf_report(request, dataset_id):
         except Dataset.DoesNotExist:
             return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Create HTTP response with PDF
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="report_{dataset.id}_{datetime.now().strftime("%Y%m%d")}.pdf"'
-    
-    # Create PDF
-    doc = SimpleDocTemplate(response, pagesize=letter)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title = Paragraph(f"<b>Equipment Data Report</b>", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Dataset info
-    info_text = f"""
-    <b>Dataset:</b> {dataset.name}<br/>
-    <b>Uploaded:</b> {dataset.uploaded_at.strftime('%Y-%m-%d %H:%M:%S')}<br/>
-    <b>Uploaded by:</b> {dataset.uploaded_by.username}<br/>
-    <b>Total Equipment:</b> {dataset.total_count}<br/>
+    # Served from cache when possible; Range requests let clients resume
+    # interrupted downloads of large reports
+    # ?anomalies=1 adds a section listing outliers (default detection parameters)
+    include_anomalies = request.query_params.get('anomalies') in ('1', 'true')
+    pdf, etag = get_pdf_report(dataset, include_anomalies)
+    filename = f'report_{dataset.id}_{datetime.now().strftime("%Y%m%d")}.pdf'
+    return ranged_response(request, pdf, 'application/pdf', etag, filename=filename)
+
+
+@require_GET
+async def report_bundle(request):
     """
-    info = Paragraph(info_text, styles['Normal'])
-    elements.append(info)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Summary statistics
-    summary_title = Paragraph("<b>Summary Statistics</b>", styles['Heading2'])
-    elements.append(summary_title)
-    elements.append(Spacer(1, 0.1*inch))
-    
-    summary_data = [
-        ['Metric', 'Average Value'],
-        ['Flowrate', f'{dataset.avg_flowrate:.2f}'],
-        ['Pressure', f'{dataset.avg_pressure:.2f}'],
-        ['Temperature', f'{dataset.avg_temperature:.2f}']
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Type distribution
-    dist_title = Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2'])
-    elements.append(dist_title)
-    elements.append(Spacer(1, 0.1*inch))
-    
-    type_dist = dataset.get_type_distribution()
-    dist_data = [['Equipment Type', 'Count']]
-    for eq_type, count in type_dist.items():
-        dist_data.append([eq_type, str(count)])
-    
-    dist_table = Table(dist_data, colWidths=[3*inch, 2*inch])
-    dist_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(dist_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Equipment details
-    equipment_title = Paragraph("<b>Equipment Details</b>", styles['Heading2'])
-    elements.append(equipment_title)
-    elements.append(Spacer(1, 0.1*inch))
-    
-    equipment = dataset.equipment.all()
-    eq_data = [['Name', 'Type', 'Flow', 'Press', 'Temp']]
-    for eq in equipment[:20]:  # Limit to first 20 for PDF
-        eq_data.append([
-            eq.equipment_name[:20],
-            eq.equipment_type[:15],
-            f'{eq.flowrate:.1f}',
-            f'{eq.pressure:.1f}',
-            f'{eq.temperature:.1f}'
-        ])
-    
-    eq_table = Table(eq_data, colWidths=[2*inch, 1.5*inch, 0.8*inch, 0.8*inch, 0.8*inch])
-    eq_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(eq_table)
-    
-    if dataset.total_count > 20:
-        note = Paragraph(f"<i>Note: Showing first 20 of {dataset.total_count} equipment items</i>", styles['Normal'])
-        elements.append(Spacer(1, 0.1*inch))
-        elements.append(note)
-    
-    # Build PDF
-    doc.build(elements)
+    ZIP of the PDF reports of several datasets, streamed as the reports are rendered.
+    Query parameters: ids (comma separated; default: the datasets listed by
+    /api/history/) and anomalies=1 (adds the anomalies section to every report).
+    """
+    include_anomalies = request.GET.get('anomalies') in ('1', 'true')
+    datasets = Dataset.objects.select_related('uploaded_by')
+    if request.GET.get('ids'):
+        try:
+            ids = parse_dataset_ids(request.GET['ids'])
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        found = {dataset.id: dataset async for dataset in datasets.filter(id__in=ids)}
+        missing = [dataset_id for dataset_id in ids if dataset_id not in found]
+        if missing:
+            return JsonResponse({'error': 'Dataset not found', 'missing': missing}, status=status.HTTP_404_NOT_FOUND)
+        datasets = [found[dataset_id] for dataset_id in ids]
+    else:
+        user = await aget_request_user(request)
+        datasets = [dataset async for dataset in datasets.filter(uploaded_by=user, is_complete=True)[:5]]
+    
+    # Entries are written as reports finish, so the download starts with the
+    # first one rather than after all of them (async iterator under ASGI, as in
+    # export_dataset)
+    chunks = report_bundle_chunks(datasets, include_anomalies)
+    if isinstance(request, ASGIRequest):
+        chunks = aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="reports_{datetime.now().strftime("%Y%m%d")}.zip"'
     return response
 
 
-@api_view(['GET'])
-@csrf_exempt
-@permission_classes([AllowAny])
-def health_check(request):
+@require_GET
+async def chart_image(request, dataset_id, kind, file_format):
+    """
+    Server-rendered chart of a dataset as png or svg: types, averages or histograms.
+    Query parameters: width and height (pixels), bins (histograms).
+    Clients revalidate with If-None-Match and get 304 while the dataset is unchanged.
+    """
+    try:
+        spec = parse_chart_spec(kind, file_format, request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    dataset = await aget_visible_dataset(request, dataset_id)
+    if dataset is None:
+        return JsonResponse({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    # Answered before anything is read or drawn when the client's copy is current
+    etag = chart_etag(dataset, spec)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    content, etag = await aget_chart(dataset, spec)
+    response = HttpResponse(content, content_type=CHART_FORMATS[file_format])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@require_GET
+async def health_check(request):
     """Health check endpoint"""
-    return Response({'status': 'ok', 'message': 'API is running'})
+    return JsonResponse({'status': 'ok', 'message': 'API is running'})
@@ -0,0 +1,48 @@
+"""
+gunicorn settings, loaded automatically when gunicorn is started from this
+directory, for the WSGI app on sync workers (`gunicorn backend.wsgi`) or the
+ASGI app on uvicorn workers
+(`gunicorn backend.asgi:application -k uvicorn_worker.UvicornWorker`).
+"""
+
+import gc
+import os
+import shutil
+import tempfile
+
+# Every worker writes its Prometheus samples to files in this directory so that
+# /api/metrics/ can report totals across workers (see equipment_api/metrics.py).
+# Set here, before any worker imports the app.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'equipment_metrics')
+)
+# With preload the master creates its metrics before on_starting runs
+os.makedirs(metrics_dir, exist_ok=True)
+
+# GUNICORN_PRELOAD=1 (or --preload) loads the app in the master, and when_ready
+# also imports the views, pandas, numpy and ReportLab there. Workers are forked
+# with all of it loaded: they boot faster and share those pages copy-on-write
+# instead of each importing its own copy on first use. Code changes then need a
+# full restart, since HUP reuses the preloaded code.
+preload_app = os.environ.get('GUNICORN_PRELOAD') == '1'
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to this one
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from equipment_api.lazy import preload
+        preload()
+        # Leave everything imported so far out of garbage collection: the
+        # collector writing to those objects in a worker would copy their pages
+        gc.freeze()
+
+
+def child_exit(server, worker):
+    # Keep the dead worker's counters and histograms, drop its live-only files
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Deterministic generator for equipment CSVs of any size
+The type mix and per-type value distributions follow sample_equipment_data.csv,
+with a small share of outliers so the anomaly endpoint has something to find.
+The same --seed always produces the same file. Rows are generated and written
+in blocks, so memory use doesn't depend on --rows.
+
+Usage (from the backend directory):
+    python synthetic_data.py --rows 1000000 -o equipment_1m.csv
+    python synthetic_data.py --rows 100000 --equipment 100 --interval 60 -o readings.csv
+        # 100 pieces of equipment, one reading per minute each (adds a Timestamp column)
+"""
+
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# type: (share of rows, (mean, std) of flowrate, pressure, temperature)
+TYPE_PROFILES = {
+    'Pump': (0.28, (126.0, 8.0), (5.5, 0.35), (115.0, 5.0)),
+    'Valve': (0.22, (60.0, 3.0), (4.1, 0.15), (105.0, 3.0)),
+    'Compressor': (0.14, (97.0, 4.0), (8.2, 0.3), (96.0, 3.0)),
+    'HeatExchanger': (0.14, (152.0, 6.0), (6.25, 0.2), (131.0, 4.0)),
+    'Reactor': (0.11, (142.0, 6.0), (7.35, 0.3), (139.0, 4.0)),
+    'Condenser': (0.11, (162.0, 6.0), (6.85, 0.2), (126.0, 4.0)),
+}
+TYPES = list(TYPE_PROFILES)
+WEIGHTS = np.array([profile[0] for profile in TYPE_PROFILES.values()])
+MEANS = np.array([[m for m, _ in profile[1:]] for profile in TYPE_PROFILES.values()])
+STDS = np.array([[s for _, s in profile[1:]] for profile in TYPE_PROFILES.values()])
+METRIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Share of values pushed 4-8 standard deviations away from their type's mean
+OUTLIER_RATE = 0.005
+BLOCK_ROWS = 250000
+DEFAULT_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def equipment_types(equipment, seed):
+    # Type of each distinct piece of equipment (fixed for the whole file)
+    rng = np.random.default_rng([seed, 0])
+    return rng.choice(len(TYPES), size=equipment, p=WEIGHTS / WEIGHTS.sum())
+
+
+def generate_block(start, rows, seed=0, equipment=None, interval=None, start_time=DEFAULT_START):
+    """
+    Rows start .. start+rows-1 of the file as a DataFrame with the upload columns.
+    equipment limits the number of distinct names (rows cycle through them);
+    interval (seconds) adds a Timestamp that advances once per cycle.
+    """
+    index = np.arange(start, start + rows)
+    rng = np.random.default_rng([seed, 1, start])
+    if equipment:
+        type_index = equipment_types(equipment, seed)[index % equipment]
+    else:
+        # Every row is its own piece of equipment
+        equipment = start + rows
+        type_index = rng.choice(len(TYPES), size=rows, p=WEIGHTS / WEIGHTS.sum())
+
+    values = rng.normal(MEANS[type_index], STDS[type_index])
+    outliers = rng.random(values.shape) < OUTLIER_RATE
+    shift = rng.uniform(4, 8, values.shape) * rng.choice([-1, 1], values.shape) * STDS[type_index]
+    values = np.where(outliers, values + shift, values)
+    values = np.round(np.maximum(values, 0), 2)
+
+    types = np.array(TYPES)[type_index]
+    names = pd.Series(types, dtype=object) + '-' + pd.Series(index % equipment + 1).astype(str)
+    df = pd.DataFrame({'Equipment Name': names, 'Type': types})
+    for position, column in enumerate(METRIC_COLUMNS):
+        df[column] = values[:, position]
+    if interval:
+        seconds = (index // equipment) * interval
+        df['Timestamp'] = pd.to_datetime(start_time) + pd.to_timedelta(seconds, unit='s')
+    return df
+
+
+def generate_frame(rows, seed=0, equipment=None, interval=None):
+    """The whole file as a DataFrame (for tests and benchmarks that need it in memory)."""
+    return pd.concat(
+        [generate_block(start, min(BLOCK_ROWS, rows - start), seed, equipment, interval)
+         for start in range(0, rows, BLOCK_ROWS)] or [generate_block(0, 0, seed)],
+        ignore_index=True
+    )
+
+
+def generate_csv_bytes(rows, seed=0, equipment=None, interval=None):
+    return generate_frame(rows, seed, equipment, interval).to_csv(index=False).encode()
+
+
+def write_csv(path, rows, seed=0, equipment=None, interval=None):
+    for start in range(0, rows, BLOCK_ROWS):
+        block = generate_block(start, min(BLOCK_ROWS, rows - start), seed, equipment, interval)
+        block.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic equipment CSV')
+    parser.add_argument('--rows', type=int, required=True, help='Number of rows')
+    parser.add_argument('--seed', type=int, default=0, help='Same seed, same file')
+    parser.add_argument('--equipment', type=int, help='Distinct equipment names (default: one per row)')
+    parser.add_argument('--interval', type=int, help='Seconds between readings; adds a Timestamp column')
+    parser.add_argument('-o', '--output', required=True, help='CSV file to write')
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.seed, args.equipment, args.interval)
+    print(f'Wrote {args.rows} rows to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
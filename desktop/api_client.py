@@ -0,0 +1,336 @@
+"""
+HTTP helpers for the desktop app
+Kept free of Qt so they can be reused from worker threads and scripts.
+requests is imported inside the functions to keep app startup fast
+(see bench_startup.py).
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+
+# Connection pool sized for the handful of parallel transfers the app runs
+POOL_SIZE = 10
+# Retries for idempotent requests on connection errors and gateway failures,
+# waiting 0.5s, 1s, 2s... between attempts
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 502, 503, 504)
+# (connect, read) timeouts - the read timeout applies per chunk, not to the
+# whole transfer, so large downloads over slow links don't time out
+DEFAULT_TIMEOUT = (10, 60)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Files larger than this use the resumable chunked upload API instead of a
+# single multipart POST
+CHUNKED_UPLOAD_THRESHOLD = 50 * 1024 * 1024
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+FINALIZE_ATTEMPTS = 6
+
+
+class DownloadCancelled(Exception):
+    """Raised when the user cancels a download; the partial file is kept for resuming."""
+
+
+class MultipartFileBody:
+    """
+    File-like multipart/form-data body for a single file field.
+
+    requests reads `files=` uploads fully into memory before sending; passing
+    this object as `data=` instead streams the file from disk (with a proper
+    Content-Length, since it defines __len__) and reports progress as the
+    socket consumes it.
+    """
+
+    def __init__(self, file_path, field_name='file', progress_callback=None):
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(file_path)
+        self._preamble = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n'
+        ).encode('utf-8')
+        self._epilogue = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self._file = open(file_path, 'rb')
+        self._file_size = os.path.getsize(file_path)
+        self._stage = 0  # 0 = preamble, 1 = file, 2 = epilogue, 3 = done
+        self._sent = 0
+        self._progress_callback = progress_callback
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return len(self._preamble) + self._file_size + len(self._epilogue)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = UPLOAD_CHUNK_SIZE
+        data = b''
+        if self._stage == 0:
+            data, self._stage = self._preamble, 1
+        elif self._stage == 1:
+            data = self._file.read(size)
+            if not data:
+                self._stage = 2
+                return self.read(size)
+        elif self._stage == 2:
+            data, self._stage = self._epilogue, 3
+        self._sent += len(data)
+        if data and self._progress_callback:
+            self._progress_callback(self._sent, len(self))
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def upload_file(session, api_url, file_path, progress_callback=None, resume_state=None):
+    """
+    Upload a CSV file and return the requests Response of the final call
+    (201 with the dataset JSON on success).
+
+    Small files are POSTed to /upload/ as a multipart form streamed from disk;
+    files above CHUNKED_UPLOAD_THRESHOLD go through upload_file_chunked.
+    progress_callback(sent_bytes, total_bytes) is called as data is sent.
+    """
+    if os.path.getsize(file_path) > CHUNKED_UPLOAD_THRESHOLD:
+        return upload_file_chunked(session, api_url, file_path, progress_callback, resume_state)
+
+    body = MultipartFileBody(file_path, progress_callback=progress_callback)
+    try:
+        return session.post(
+            f'{api_url}/upload/', data=body,
+            headers={'Content-Type': body.content_type},
+            timeout=DEFAULT_TIMEOUT
+        )
+    finally:
+        body.close()
+
+
+def file_sha256(file_path):
+    # Hash the file in blocks so multi-GB files don't need to fit in memory
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def upload_file_chunked(session, api_url, file_path, progress_callback=None, resume_state=None):
+    """
+    Upload a large CSV with the resumable chunked upload API:
+    initiate, PUT each chunk with its SHA-256, then complete.
+
+    resume_state is an optional dict; the upload ID is stored in it so that
+    calling again with the same dict after a failure only sends the chunks the
+    server hasn't received yet. Chunk PUTs are idempotent and retried with
+    backoff by the session (see create_session).
+    """
+    resume_state = resume_state if resume_state is not None else {}
+    total_size = os.path.getsize(file_path)
+
+    upload = None
+    if resume_state.get('upload_id'):
+        response = session.get(f"{api_url}/uploads/{resume_state['upload_id']}/", timeout=DEFAULT_TIMEOUT)
+        if response.status_code == 200 and response.json()['status'] == 'pending':
+            upload = response.json()
+    if upload is None:
+        # The server checks the file hash against the chunks it received when
+        # the upload is completed
+        response = session.post(f'{api_url}/uploads/', json={
+            'filename': os.path.basename(file_path),
+            'total_size': total_size,
+            'chunk_size': CHUNKED_UPLOAD_CHUNK_SIZE,
+            'sha256': file_sha256(file_path)
+        }, timeout=DEFAULT_TIMEOUT)
+        if response.status_code != 201:
+            return response
+        upload = response.json()
+        resume_state['upload_id'] = upload['id']
+
+    chunk_size = upload['chunk_size']
+    total_chunks = max((total_size + chunk_size - 1) // chunk_size, 1)
+    received = set(upload['received_chunks'])
+    sent = sum(min(chunk_size, total_size - i * chunk_size) for i in received)
+    if progress_callback:
+        progress_callback(sent, total_size)
+
+    with open(file_path, 'rb') as f:
+        for index in range(total_chunks):
+            if index in received:
+                continue
+            f.seek(index * chunk_size)
+            chunk = f.read(chunk_size)
+            response = session.put(
+                f"{api_url}/uploads/{upload['id']}/chunks/{index}/",
+                data=chunk,
+                headers={
+                    'Content-Type': 'application/octet-stream',
+                    'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest()
+                },
+                timeout=DEFAULT_TIMEOUT
+            )
+            if response.status_code not in (200, 201):
+                return response
+            sent += len(chunk)
+            if progress_callback:
+                progress_callback(sent, total_size)
+
+    # 409 means the server is still parsing the last chunks, 429 that it is busy
+    # with other uploads (Retry-After says for how long) - wait and retry
+    for attempt in range(FINALIZE_ATTEMPTS):
+        response = session.post(
+            f"{api_url}/uploads/{upload['id']}/complete/",
+            json={'total_chunks': total_chunks},
+            timeout=DEFAULT_TIMEOUT
+        )
+        if response.status_code not in (409, 429):
+            break
+        retry_after = response.headers.get('Retry-After', '')
+        time.sleep(int(retry_after) if retry_after.isdigit() else RETRY_BACKOFF * (2 ** attempt))
+    return response
+
+
+def parse_server_timing(header):
+    """
+    Parse a Server-Timing header ('parse;dur=12.3, insert;dur=40.1, ...')
+    into a list of (stage, milliseconds); entries without a duration are skipped.
+    """
+    timings = []
+    for entry in (header or '').split(','):
+        name, *params = [part.strip() for part in entry.split(';')]
+        for param in params:
+            key, _, value = param.partition('=')
+            if key == 'dur' and name:
+                try:
+                    timings.append((name, float(value)))
+                except ValueError:
+                    pass
+    return timings
+
+
+def format_server_timing(header):
+    # One line per stage for display, e.g. 'parse       12 ms'; empty if no timings
+    timings = parse_server_timing(header)
+    width = max((len(name) for name, _ in timings), default=0)
+    return '\n'.join(f'{name.ljust(width)}  {ms:8.0f} ms' for name, ms in timings)
+
+
+def create_session():
+    # Build the HTTP session used for all API calls: pooled keep-alive
+    # connections with automatic retries and exponential backoff
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD', 'PUT', 'OPTIONS']),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def iter_events(session, url, timeout=DEFAULT_TIMEOUT):
+    """
+    Read a Server-Sent Events stream such as /api/events/, yielding
+    (event name, data decoded from JSON) pairs - ('open', None) first, once
+    the server has accepted the connection. Keep-alive comments reset the read
+    timeout without yielding anything. Returns when the server ends the
+    stream; raises requests exceptions on HTTP errors and timeouts.
+    """
+    headers = {'Accept': 'text/event-stream'}
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        yield 'open', None
+        event, data = 'message', []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                # A blank line ends the event
+                if data:
+                    yield event, json.loads('\n'.join(data))
+                event, data = 'message', []
+                continue
+            field, _, value = line.partition(':')
+            value = value[1:] if value.startswith(' ') else value
+            if field == 'event':
+                event = value
+            elif field == 'data':
+                data.append(value)
+
+
+def download_file(session, url, file_path, progress_callback=None, is_cancelled=None, headers_callback=None):
+    """
+    Stream url to file_path in chunks, resuming a previous partial download.
+
+    Data is written to '<file_path>.part' and renamed once complete. If a .part
+    file exists, a Range request continues from its size; If-Range (with the
+    ETag saved next to the .part file) makes the server send the full file
+    instead if the report changed in the meantime.
+    progress_callback(received_bytes, total_bytes) is called after each chunk
+    (total_bytes is 0 when unknown). Raises DownloadCancelled when
+    is_cancelled() returns True, and requests exceptions on HTTP errors.
+    headers_callback(headers) receives the response headers before the body is read.
+    """
+    part_path = file_path + '.part'
+    etag_path = part_path + '.etag'
+
+    headers = {}
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset and os.path.exists(etag_path):
+        with open(etag_path) as f:
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = f.read().strip()
+    else:
+        offset = 0
+
+    with session.get(url, headers=headers, stream=True, timeout=DEFAULT_TIMEOUT) as response:
+        if response.status_code == 416:
+            # The .part file is already complete (or stale) - start over
+            os.remove(part_path)
+            return download_file(session, url, file_path, progress_callback, is_cancelled, headers_callback)
+        response.raise_for_status()
+        if headers_callback:
+            headers_callback(response.headers)
+
+        if response.status_code == 206:
+            # Content-Range: bytes <start>-<end>/<total>
+            total = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+            mode = 'ab'
+        else:
+            # Full body: either a fresh download or the server ignored the range
+            offset = 0
+            total = int(response.headers.get('Content-Length', 0))
+            mode = 'wb'
+
+        etag = response.headers.get('ETag')
+        if etag:
+            with open(etag_path, 'w') as f:
+                f.write(etag)
+
+        received = offset
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if is_cancelled and is_cancelled():
+                    raise DownloadCancelled()
+                f.write(chunk)
+                received += len(chunk)
+                if progress_callback:
+                    progress_callback(received, total)
+
+    os.replace(part_path, file_path)
+    if os.path.exists(etag_path):
+        os.remove(etag_path)
+    return file_path
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Startup-time benchmark for the desktop app
+Runs `python -X importtime -c "import main"` in a fresh interpreter and fails
+(non-zero exit) if importing main.py got slower than the budget or if any of
+the heavy modules (requests, pandas, matplotlib) is imported at module level.
+
+Usage (from the desktop directory):
+    python bench_startup.py                  # default budget
+    python bench_startup.py --budget-ms 400  # custom budget
+    python bench_startup.py --runs 10        # more runs, median is reported
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Importing main.py (PyQt5 widgets + core) stays well under this on a
+# developer laptop; pulling matplotlib/requests back in roughly triples it
+DEFAULT_BUDGET_MS = 500.0
+HEAVY_MODULES = ('requests', 'pandas', 'matplotlib')
+
+
+def run_importtime():
+    # Returns {module_name: cumulative_us} for a single cold import of main
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=HERE, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing main failed:\n{result.stderr}')
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Desktop startup import-time benchmark')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='Maximum allowed median import time of main.py')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold imports to time')
+    args = parser.parse_args()
+
+    totals = []
+    heavy_found = set()
+    for _ in range(args.runs):
+        timings = run_importtime()
+        totals.append(timings['main'] / 1000.0)
+        heavy_found.update(
+            name for name in timings
+            if name.split('.')[0] in HEAVY_MODULES
+        )
+
+    median_ms = statistics.median(totals)
+    print(f'main.py import time: median {median_ms:.1f} ms '
+          f'(min {min(totals):.1f}, max {max(totals):.1f}, runs {args.runs})')
+
+    failed = False
+    if heavy_found:
+        print(f'FAIL: heavy modules imported at startup: {", ".join(sorted(heavy_found))}')
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f'FAIL: import time exceeds budget of {args.budget_ms:.0f} ms')
+        failed = True
+
+    if not failed:
+        print('OK')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,44 @@
+import os
 import sys
-import requests
-import pandas as pd
-from io import StringIO
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QLineEdit, 
                              QFileDialog, QTableWidget, QTableWidgetItem, 
                              QMessageBox, QTabWidget, QComboBox, QTextEdit,
                              QDialog, QProgressBar, QScrollArea, QFrame,
-                             QGridLayout, QSpinBox, QDoubleSpinBox)
-from PyQt5.QtCore import Qt, QSize, QTimer
+                             QGridLayout, QSpinBox, QDoubleSpinBox,
+                             QProgressDialog, QCheckBox)
+from PyQt5.QtCore import Qt, QObject, QSize, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QIcon, QFont, QColor, QPixmap
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-from matplotlib import pyplot as plt
-import matplotlib.patches as mpatches
+from api_client import create_session, download_file, iter_events, upload_file, format_server_timing, DownloadCancelled
+
+# Number of files uploaded in parallel in batch mode. Beyond a handful the
+# Django workers, not the client, become the bottleneck.
+BATCH_UPLOAD_WORKERS = 4
+
+# Seconds before reconnecting a dropped event stream, doubling up to the maximum
+EVENT_RETRY_MIN = 1
+EVENT_RETRY_MAX = 30
+
+# Charts tab: (chart kind, width, height, grid row, column, column span).
+# The images are drawn by the backend, so the app doesn't need matplotlib.
+CHART_LAYOUT = [
+    ('types', 600, 400, 0, 0, 1),
+    ('averages', 600, 400, 0, 1, 1),
+    ('histograms', 1200, 400, 1, 0, 2),
+]
+
+# requests is NOT imported here - it takes longer to load than the rest of
+# the app, so it is imported on first use (and warmed up in a background
+# thread once the window is visible). bench_startup.py fails if it or another
+# heavy module creeps back into the module-level imports.
+
+
+def preload_heavy_modules():
+    # Import the slow modules ahead of time so the first API call is fast
+    import requests  # noqa: F401
 
 # QSS stylesheet - defines the visual appearance of all PyQt5 widgets
 # Uses minimal, elegant design with modern blue color scheme
@@ -150,19 +175,257 @@ MODERN_STYLE = """
     }
 """
 
+class DownloadWorker(QThread):
+    # Streams a file to disk on a background thread so the UI stays responsive
+    # Emits progress(received_bytes, total_bytes) and exactly one of
+    # finished_ok(path, server_timing), cancelled() or failed(message)
+    progress = pyqtSignal(int, int)
+    finished_ok = pyqtSignal(str, str)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, session, url, file_path):
+        super().__init__()
+        self.session = session
+        self.url = url
+        self.file_path = file_path
+        self._cancel_requested = False
+        self.server_timing = ''
+
+    def cancel(self):
+        # Checked between chunks by download_file
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            download_file(
+                self.session, self.url, self.file_path,
+                progress_callback=self.progress.emit,
+                is_cancelled=lambda: self._cancel_requested,
+                headers_callback=self.on_headers
+            )
+            self.finished_ok.emit(self.file_path, self.server_timing)
+        except DownloadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def on_headers(self, headers):
+        self.server_timing = format_server_timing(headers.get('Server-Timing'))
+
+
+class UploadWorker(QThread):
+    # Uploads one CSV on a background thread (chunked and resumable for large files)
+    # Emits progress(sent_bytes, total_bytes), then finished_ok(dataset, server_timing) or failed(message)
+    # server_timing is the server's per-stage breakdown of the final request, one line per stage
+    progress = pyqtSignal(int, int)
+    finished_ok = pyqtSignal(dict, str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, session, api_url, file_path, resume_state):
+        super().__init__()
+        self.session = session
+        self.api_url = api_url
+        self.file_path = file_path
+        self.resume_state = resume_state
+
+    def run(self):
+        try:
+            response = upload_file(
+                self.session, self.api_url, self.file_path,
+                progress_callback=self.progress.emit,
+                resume_state=self.resume_state
+            )
+            # API returns 201 on success with full dataset JSON
+            # (200 when a chunked upload had already been completed)
+            if response.status_code in (200, 201):
+                self.finished_ok.emit(
+                    response.json().get('data'),
+                    format_server_timing(response.headers.get('Server-Timing'))
+                )
+            else:
+                try:
+                    self.failed.emit(response.json().get('error', 'Upload failed'))
+                except ValueError:
+                    self.failed.emit(f'Upload failed (HTTP {response.status_code})')
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class BatchUploadWorker(QThread):
+    # Uploads a list of CSV files concurrently with a bounded thread pool
+    # Emits file_progress(row, percent) while a file is sent,
+    # file_done(row, ok, message) when it finishes, and all_done(ok_count, failed_count)
+    file_progress = pyqtSignal(int, int)
+    file_done = pyqtSignal(int, bool, str)
+    all_done = pyqtSignal(int, int)
+
+    def __init__(self, session, api_url, file_paths, max_workers=BATCH_UPLOAD_WORKERS):
+        super().__init__()
+        self.session = session
+        self.api_url = api_url
+        self.file_paths = file_paths
+        self.max_workers = max_workers
+        self._cancel_requested = False
+
+    def cancel(self):
+        # Files already being sent finish; queued files are skipped
+        self._cancel_requested = True
+
+    def upload_one(self, row, file_path):
+        if self._cancel_requested:
+            self.file_done.emit(row, False, 'Skipped')
+            return False
+        
+        def on_progress(sent, total):
+            self.file_progress.emit(row, int(sent * 100 / total) if total else 0)
+        
+        try:
+            response = upload_file(self.session, self.api_url, file_path, progress_callback=on_progress)
+            if response.status_code in (200, 201):
+                dataset = response.json().get('data', {})
+                self.file_done.emit(row, True, f"Done ({dataset.get('total_count', 0)} items)")
+                return True
+            try:
+                message = response.json().get('error', f'HTTP {response.status_code}')
+            except ValueError:
+                message = f'HTTP {response.status_code}'
+            self.file_done.emit(row, False, message)
+        except Exception as e:
+            self.file_done.emit(row, False, str(e))
+        return False
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self.upload_one, range(len(self.file_paths)), self.file_paths))
+        succeeded = sum(results)
+        self.all_done.emit(succeeded, len(results) - succeeded)
+
+
+class EventStream(QObject):
+    # Listens to /api/events/ and keeps reconnecting until the app exits
+    # Emits event_received(name, data) for each server event, plus ('open', None)
+    # on every (re)connection and ('closed', None) when the connection drops,
+    # or unavailable() once if the server has no event stream.
+    # A daemon thread rather than a QThread: it spends its life blocked on the
+    # socket, and a daemon thread needn't be stopped before the app exits.
+    event_received = pyqtSignal(str, object)
+    unavailable = pyqtSignal()
+
+    def __init__(self, session, api_url):
+        super().__init__()
+        self.session = session
+        self.api_url = api_url
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        import requests
+        delay = EVENT_RETRY_MIN
+        while True:
+            try:
+                for name, data in iter_events(self.session, f'{self.api_url}/events/'):
+                    self.event_received.emit(name, data)
+                    delay = EVENT_RETRY_MIN
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    self.unavailable.emit()
+                    return
+            except Exception:
+                pass
+            self.event_received.emit('closed', None)
+            time.sleep(delay)
+            delay = min(delay * 2, EVENT_RETRY_MAX)
+
+
+class BatchUploadDialog(QDialog):
+    # Per-file progress and status for a folder upload
+    # The button emits cancel_requested while uploading and closes the dialog afterwards
+    cancel_requested = pyqtSignal()
+
+    def __init__(self, parent, file_paths):
+        super().__init__(parent)
+        self.setWindowTitle('Batch Upload')
+        self.resize(700, 400)
+        
+        layout = QVBoxLayout()
+        self.status_label = QLabel(f'Uploading {len(file_paths)} files...')
+        layout.addWidget(self.status_label)
+        
+        self.table = QTableWidget(len(file_paths), 3)
+        self.table.setHorizontalHeaderLabels(['File', 'Progress', 'Status'])
+        self.progress_bars = []
+        for row, file_path in enumerate(file_paths):
+            self.table.setItem(row, 0, QTableWidgetItem(os.path.basename(file_path)))
+            bar = QProgressBar()
+            bar.setRange(0, 100)
+            bar.setValue(0)
+            self.table.setCellWidget(row, 1, bar)
+            self.progress_bars.append(bar)
+            self.table.setItem(row, 2, QTableWidgetItem('Queued'))
+        self.table.resizeColumnsToContents()
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+        
+        self.finished_uploading = False
+        self.cancel_btn = QPushButton('Cancel')
+        self.cancel_btn.clicked.connect(self.on_button_clicked)
+        layout.addWidget(self.cancel_btn)
+        self.setLayout(layout)
+    
+    def on_button_clicked(self):
+        if self.finished_uploading:
+            self.accept()
+        else:
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText('Cancelling - waiting for files in progress...')
+            self.cancel_requested.emit()
+    
+    def set_progress(self, row, percent):
+        self.progress_bars[row].setValue(percent)
+        self.table.item(row, 2).setText('Uploading')
+    
+    def set_done(self, row, ok, message):
+        if ok:
+            self.progress_bars[row].setValue(100)
+        item = self.table.item(row, 2)
+        item.setText(message)
+        item.setForeground(QColor('#059669' if ok else '#dc2626'))
+    
+    def set_finished(self, succeeded, failed):
+        self.finished_uploading = True
+        self.status_label.setText(f'Finished: {succeeded} uploaded, {failed} failed')
+        self.cancel_btn.setText('Close')
+        self.cancel_btn.setEnabled(True)
+
+
 class MainWindow(QMainWindow):
     # Main application window - orchestrates the desktop UI
     # Manages file upload, API communication, and visualization
     def __init__(self, session, api_url, username):
         super().__init__()
-        self.session = session  # HTTP session for API calls
+        self._session = session  # HTTP session for API calls (created lazily when None)
         self.api_url = api_url  # Backend API base URL
         self.username = username  # Current user (hardcoded as 'admin')
         self.current_dataset = None  # Currently loaded dataset
+        self.anomalies = {}  # equipment id -> anomaly reasons for the current dataset
+        self.upload_resume_state = {}  # file path -> chunked upload state, so a failed large upload resumes
+        self.chart_cache = {}  # (chart url, width, height) -> (ETag, PNG bytes)
+        self.history = []  # /history/ entries shown in the dropdown, newest first
+        self.stream_connected = False  # True while server events keep self.history current
+        self.upload_progress = None  # {'name', 'dialog', 'sent'} of the upload in progress
         self.setStyleSheet(MODERN_STYLE)
         
         self.initUI()
     
+    @property
+    def session(self):
+        # Creating the session imports requests, so defer it until the first API call
+        if self._session is None:
+            self._session = create_session()
+        return self._session
+    
     def initUI(self):
         # Build the UI layout - header, upload controls, tabs, download button
         self.setWindowTitle(f'Equipment Visualizer - {self.username}')
@@ -246,6 +509,11 @@ class MainWindow(QMainWindow):
         upload_btn.clicked.connect(self.upload_file)
         upload_row.addWidget(upload_btn)
         
+        folder_btn = QPushButton('Upload Folder')
+        folder_btn.setMinimumWidth(150)
+        folder_btn.clicked.connect(self.upload_folder)
+        upload_row.addWidget(folder_btn)
+        
         controls_layout.addLayout(upload_row)
         
         # History section
@@ -316,17 +584,22 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(self.tabs)
         
         # Download button
+        pdf_layout = QHBoxLayout()
         pdf_btn = QPushButton('Download PDF Report')
         pdf_btn.setMinimumHeight(45)
         pdf_btn.clicked.connect(self.download_pdf)
         pdf_btn_font = QFont('Inter', 11, QFont.Bold)
         pdf_btn.setFont(pdf_btn_font)
-        main_layout.addWidget(pdf_btn)
+        pdf_layout.addWidget(pdf_btn, 1)
+        self.pdf_anomalies_check = QCheckBox('Include anomalies')
+        pdf_layout.addWidget(self.pdf_anomalies_check)
+        main_layout.addLayout(pdf_layout)
         
         central_widget.setLayout(main_layout)
         
-        # Load initial history
-        self.load_history()
+        # Connect to the event stream once the event loop is running so the
+        # window paints first; history is loaded as soon as it opens
+        QTimer.singleShot(0, self.start_event_stream)
     
     def browse_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -346,27 +619,111 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, 'Error', 'Please select a file first')
             return
         
-        try:
-            with open(self.file_path, 'rb') as f:
-                files = {'file': f}
-                response = self.session.post(
-                    f'{self.api_url}/upload/',
-                    files=files
-                )
-            
-            # API returns 201 on success with full dataset JSON
-            if response.status_code == 201:
-                data = response.json()
-                self.current_dataset = data.get('data')
-                self.display_summary()
-                self.display_charts()
-                self.display_table()
+        # Large files use the resumable chunked API; retrying the same file
+        # after a failure only sends the chunks the server is missing
+        resume_state = self.upload_resume_state.setdefault(self.file_path, {})
+        
+        progress_dialog = QProgressDialog('Uploading...', None, 0, 100, self)
+        progress_dialog.setWindowTitle('Upload')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        # Kept open once the file is sent, showing the server's progress events
+        progress_dialog.setAutoClose(False)
+        progress_dialog.setAutoReset(False)
+        self.upload_progress = {'name': os.path.basename(self.file_path), 'dialog': progress_dialog, 'sent': False}
+        
+        worker = UploadWorker(self.session, self.api_url, self.file_path, resume_state)
+        self.upload_worker = worker  # Keep a reference so the thread isn't garbage collected
+        file_path = self.file_path
+        
+        def on_progress(sent, total):
+            if total:
+                progress_dialog.setValue(int(sent * 100 / total))
+            if self.upload_progress is not None:
+                self.upload_progress['sent'] = sent >= total
+        
+        def on_finished(dataset, server_timing):
+            progress_dialog.close()
+            self.upload_progress = None
+            self.upload_resume_state.pop(file_path, None)
+            self.current_dataset = dataset
+            self.display_summary()
+            self.display_charts()
+            self.load_anomalies()
+            self.display_table()
+            # The 'ready' event has added it to the history already
+            if not self.stream_connected:
                 self.load_history()
-                QMessageBox.information(self, 'Success', 'File uploaded and analyzed successfully!')
-            else:
-                QMessageBox.warning(self, 'Error', response.json().get('error', 'Upload failed'))
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Upload failed: {str(e)}')
+            self.show_success('File uploaded and analyzed successfully!', server_timing)
+        
+        def on_failed(message):
+            progress_dialog.close()
+            self.upload_progress = None
+            QMessageBox.critical(self, 'Error', f'Upload failed: {message}')
+        
+        worker.progress.connect(on_progress)
+        worker.finished_ok.connect(on_finished)
+        worker.failed.connect(on_failed)
+        worker.start()
+    
+    def upload_folder(self):
+        # Batch mode - upload every CSV in a folder in parallel, then refresh history once
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder of CSV Files")
+        if not folder:
+            return
+        
+        file_paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if name.lower().endswith('.csv')
+        )
+        if not file_paths:
+            QMessageBox.warning(self, 'Error', 'No CSV files found in the selected folder')
+            return
+        
+        dialog = BatchUploadDialog(self, file_paths)
+        worker = BatchUploadWorker(self.session, self.api_url, file_paths)
+        self.batch_worker = worker  # Keep a reference so the thread isn't garbage collected
+        
+        worker.file_progress.connect(dialog.set_progress)
+        worker.file_done.connect(dialog.set_done)
+        worker.all_done.connect(dialog.set_finished)
+        worker.all_done.connect(lambda succeeded, failed: self.stream_connected or self.load_history())
+        dialog.cancel_requested.connect(worker.cancel)
+        worker.start()
+        dialog.exec_()
+    
+    def start_event_stream(self):
+        # Server events update the history in place instead of refetching it
+        # after every upload; without them it's fetched as before
+        self.event_stream = EventStream(self.session, self.api_url)
+        self.event_stream.event_received.connect(self.on_server_event)
+        self.event_stream.unavailable.connect(self.load_history)
+        self.event_stream.start()
+    
+    def on_server_event(self, name, data):
+        if name == 'open':
+            # Events sent while disconnected aren't replayed
+            self.stream_connected = True
+            self.load_history()
+        elif name == 'closed':
+            self.stream_connected = False
+        elif name == 'resync':
+            self.load_history()
+        elif name in ('ready', 'updated'):
+            self.history = [data] + [item for item in self.history if item['id'] != data['id']]
+            self.history.sort(key=lambda item: item['uploaded_at'], reverse=True)
+            self.populate_history()
+        elif name == 'evicted':
+            self.history = [item for item in self.history if item['id'] != data['id']]
+            self.populate_history()
+        elif name == 'progress' and self.upload_progress and self.upload_progress['name'] == data['name']:
+            # Rows stored so far by the upload in progress, shown once the file
+            # is sent (chunked uploads are stored while they're sent)
+            if self.upload_progress['sent']:
+                progress_dialog = self.upload_progress['dialog']
+                progress_dialog.setLabelText(f"Processing... {data['rows']:,} rows stored")
+                if data['total_bytes']:
+                    progress_dialog.setValue(int(data['bytes'] * 100 / data['total_bytes']))
     
     def load_history(self):
         # Fetch and populate the dataset history dropdown
@@ -374,15 +731,25 @@ class MainWindow(QMainWindow):
         try:
             response = self.session.get(f'{self.api_url}/history/')
             if response.status_code == 200:
-                history = response.json()
-                self.history_combo.clear()
-                self.history_combo.addItem("-- Select a dataset --", None)
-                for item in history:
-                    display_text = f"{item['name']} ({item['total_count']} items)"
-                    self.history_combo.addItem(display_text, item['id'])
+                self.history = response.json()
+                self.populate_history()
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to load history: {str(e)}')
     
+    def populate_history(self):
+        # Rebuild the dropdown from self.history, keeping the selected dataset.
+        # Signals are blocked so rebuilding doesn't reload it
+        selected = self.history_combo.currentData()
+        self.history_combo.blockSignals(True)
+        self.history_combo.clear()
+        self.history_combo.addItem("-- Select a dataset --", None)
+        for item in self.history:
+            display_text = f"{item['name']} ({item['total_count']} items)"
+            self.history_combo.addItem(display_text, item['id'])
+        index = self.history_combo.findData(selected) if selected is not None else 0
+        self.history_combo.setCurrentIndex(max(index, 0))
+        self.history_combo.blockSignals(False)
+    
     def load_dataset(self):
         # Load previously uploaded dataset when user selects from history
         # Makes API call to get full dataset details
@@ -396,10 +763,23 @@ class MainWindow(QMainWindow):
                 self.current_dataset = response.json()
                 self.display_summary()
                 self.display_charts()
+                self.load_anomalies()
                 self.display_table()
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to load dataset: {str(e)}')
     
+    def load_anomalies(self):
+        # Fetch outliers flagged by the backend so display_table can highlight them
+        # A failure only means no highlighting, so it isn't reported
+        self.anomalies = {}
+        try:
+            response = self.session.get(f'{self.api_url}/anomalies/{self.current_dataset["id"]}/')
+            if response.status_code == 200:
+                for anomaly in response.json()['anomalies']:
+                    self.anomalies[anomaly['id']] = anomaly['reasons']
+        except Exception:
+            pass
+    
     def display_summary(self):
         if not self.current_dataset:
             return
@@ -433,6 +813,20 @@ EQUIPMENT TYPE DISTRIBUTION
         
         self.summary_tab.setText(summary_text)
     
+    def fetch_chart(self, kind, width, height):
+        # PNG drawn by the server (GET /charts/). Images are kept with their
+        # ETag and revalidated, so reopening an unchanged dataset costs a 304
+        url = f'{self.api_url}/charts/{self.current_dataset["id"]}/{kind}/png/'
+        key = (url, width, height)
+        cached = self.chart_cache.get(key)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        response = self.session.get(url, params={'width': width, 'height': height}, headers=headers)
+        if response.status_code == 304:
+            return cached[1]
+        response.raise_for_status()
+        self.chart_cache[key] = (response.headers.get('ETag'), response.content)
+        return response.content
+    
     def display_charts(self):
         if not self.current_dataset:
             return
@@ -441,69 +835,20 @@ EQUIPMENT TYPE DISTRIBUTION
         for i in reversed(range(self.charts_layout.count())): 
             self.charts_layout.itemAt(i).widget().setParent(None)
         
-        # Create a figure with subplots
-        fig = Figure(figsize=(12, 8), dpi=100, facecolor='white')
-        
-        # Pie chart for type distribution
-        ax1 = fig.add_subplot(2, 2, 1)
-        types = list(self.current_dataset['type_distribution'].keys())
-        counts = list(self.current_dataset['type_distribution'].values())
-        colors = ['#2563eb', '#1e40af', '#3b82f6', '#0ea5e9', '#06b6d4', '#10b981'][:len(types)]
-        ax1.pie(counts, labels=types, autopct='%1.1f%%', colors=colors, startangle=90)
-        ax1.set_title('Equipment Type Distribution', fontweight='bold', fontsize=12, color='#0f172a')
-        
-        # Bar chart for average parameters
-        ax2 = fig.add_subplot(2, 2, 2)
-        parameters = ['Flowrate', 'Pressure', 'Temperature']
-        values = [
-            self.current_dataset['avg_flowrate'],
-            self.current_dataset['avg_pressure'],
-            self.current_dataset['avg_temperature']
-        ]
-        bars = ax2.bar(parameters, values, color=['#2563eb', '#3b82f6', '#0ea5e9'])
-        ax2.set_title('Average Parameter Values', fontweight='bold', fontsize=12, color='#0f172a')
-        ax2.set_ylabel('Value', fontweight='bold', color='#0f172a')
-        ax2.tick_params(colors='#0f172a')
-        
-        # Add value labels on bars
-        for bar in bars:
-            height = bar.get_height()
-            ax2.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{height:.2f}', ha='center', va='bottom', fontweight='bold', color='#0f172a')
-        
-        # Equipment count stats
-        ax3 = fig.add_subplot(2, 2, 3)
-        type_names = list(self.current_dataset['type_distribution'].keys())[:10]
-        type_counts = list(self.current_dataset['type_distribution'].values())[:10]
-        bars = ax3.barh(type_names, type_counts, color=['#2563eb', '#1e40af', '#3b82f6', '#0ea5e9', '#06b6d4', '#10b981', '#059669', '#14b8a6', '#06b6d4', '#0284c7'][:len(type_names)])
-        ax3.set_title('Equipment Count by Type', fontweight='bold', fontsize=12, color='#0f172a')
-        ax3.set_xlabel('Count', fontweight='bold', color='#0f172a')
-        ax3.tick_params(colors='#0f172a')
-        
-        # Add count labels
-        for i, (name, count) in enumerate(zip(type_names, type_counts)):
-            ax3.text(count, i, f' {count}', va='center', fontweight='bold', color='#0f172a')
-        
-        # Summary text
-        ax4 = fig.add_subplot(2, 2, 4)
-        ax4.axis('off')
-        summary_info = f"""
-Dataset: {self.current_dataset['name']}
-Total Equipment: {self.current_dataset['total_count']}
-
-Key Metrics:
-• Avg Flowrate: {self.current_dataset['avg_flowrate']:.2f}
-• Avg Pressure: {self.current_dataset['avg_pressure']:.2f}
-• Avg Temperature: {self.current_dataset['avg_temperature']:.2f}
-
-Equipment Types: {len(self.current_dataset['type_distribution'])}
-        """
-        ax4.text(0.1, 0.5, summary_info, fontsize=11, verticalalignment='center',
-                family='monospace', color='#0f172a', bbox=dict(boxstyle='round', facecolor='#f8fafc', alpha=0.8, edgecolor='#e2e8f0'))
-        
-        fig.tight_layout()
-        canvas = FigureCanvas(fig)
-        self.charts_layout.addWidget(canvas)
+        # Type distribution and averages side by side, histograms below
+        container = QWidget()
+        grid = QGridLayout(container)
+        for kind, width, height, row, column, span in CHART_LAYOUT:
+            label = QLabel()
+            label.setAlignment(Qt.AlignCenter)
+            try:
+                pixmap = QPixmap()
+                pixmap.loadFromData(self.fetch_chart(kind, width, height), 'PNG')
+                label.setPixmap(pixmap)
+            except Exception as e:
+                label.setText(f'Failed to load {kind} chart: {str(e)}')
+            grid.addWidget(label, row, column, 1, span)
+        self.charts_layout.addWidget(container)
     
     def display_table(self):
         if not self.current_dataset or 'equipment' not in self.current_dataset:
@@ -528,10 +873,20 @@ Equipment Types: {len(self.current_dataset['type_distribution'])}
                 f"{item['temperature']:.2f}"
             ]
             
+            # Anomalous rows get a red background, the flagged values red text
+            reasons = self.anomalies.get(item['id'], [])
+            flagged_metrics = {reason['metric'] for reason in reasons}
+            tooltip = ', '.join(f"{reason['metric']}: {reason['method']}" for reason in reasons)
+            
             for col, text in enumerate(items):
                 table_item = QTableWidgetItem(text)
                 if col == 1:  # Type column - add styling
                     table_item.setForeground(QColor('#2563eb'))
+                if reasons:
+                    table_item.setBackground(QColor('#fef2f2'))
+                    table_item.setToolTip(f'Anomaly - {tooltip}')
+                    if col >= 2 and ('flowrate', 'pressure', 'temperature')[col - 2] in flagged_metrics:
+                        table_item.setForeground(QColor('#dc2626'))
                 self.table_widget.setItem(row, col, table_item)
         
         # Resize columns
@@ -557,33 +912,75 @@ Equipment Types: {len(self.current_dataset['type_distribution'])}
             if not file_path:
                 return
             
-            # Fetch PDF from backend
-            response = self.session.get(
-                f'{self.api_url}/report/{self.current_dataset["id"]}/',
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
-                QMessageBox.information(self, 'Success', f'PDF report saved to:\n{file_path}')
-            else:
-                QMessageBox.warning(self, 'Error', 'Failed to generate PDF report')
+            # Stream the PDF to disk on a worker thread; an interrupted or
+            # cancelled download resumes where it stopped next time
+            url = f'{self.api_url}/report/{self.current_dataset["id"]}/'
+            if self.pdf_anomalies_check.isChecked():
+                url += '?anomalies=1'
+            self.start_download(url, file_path)
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to download PDF: {str(e)}')
-
+    
+    def show_success(self, message, server_timing):
+        # Success box; "Show Details..." reveals the server's per-stage timings
+        box = QMessageBox(QMessageBox.Information, 'Success', message, QMessageBox.Ok, self)
+        if server_timing:
+            box.setDetailedText(f'Server time per stage:\n{server_timing}')
+        box.exec_()
+    
+    def start_download(self, url, file_path):
+        # Show a cancellable progress dialog while DownloadWorker runs
+        progress_dialog = QProgressDialog('Downloading PDF report...', 'Cancel', 0, 100, self)
+        progress_dialog.setWindowTitle('Download')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setValue(0)
+        
+        worker = DownloadWorker(self.session, url, file_path)
+        self.download_worker = worker  # Keep a reference so the thread isn't garbage collected
+        
+        def on_progress(received, total):
+            if total:
+                progress_dialog.setMaximum(100)
+                progress_dialog.setValue(int(received * 100 / total))
+                progress_dialog.setLabelText(f'Downloading PDF report... {received // 1024} of {total // 1024} KB')
+            else:
+                # Unknown size - show a busy indicator
+                progress_dialog.setMaximum(0)
+                progress_dialog.setLabelText(f'Downloading PDF report... {received // 1024} KB')
+        
+        def on_finished(path, server_timing):
+            progress_dialog.close()
+            self.show_success(f'PDF report saved to:\n{path}', server_timing)
+        
+        def on_cancelled():
+            progress_dialog.close()
+            QMessageBox.information(self, 'Cancelled', 'Download cancelled. Saving to the same file again will resume it.')
+        
+        def on_failed(message):
+            progress_dialog.close()
+            QMessageBox.warning(self, 'Error', f'Failed to download PDF: {message}\nTry again to resume the download.')
+        
+        worker.progress.connect(on_progress)
+        worker.finished_ok.connect(on_finished)
+        worker.cancelled.connect(on_cancelled)
+        worker.failed.connect(on_failed)
+        progress_dialog.canceled.connect(worker.cancel)
+        worker.start()
 
 def main():
     # Application entry point - creates and runs the PyQt5 app
     app = QApplication(sys.argv)
     
-    # Create HTTP session for API communication
-    session = requests.Session()
     api_url = "http://localhost:8000/api"
     
     # Hardcoded as admin (authentication removed for simplified access)
-    main_window = MainWindow(session, api_url, "admin")
+    # The HTTP session is created on first use (see MainWindow.session)
+    main_window = MainWindow(None, api_url, "admin")
     main_window.show()
+    
+    # Warm up heavy modules while the user looks at the freshly shown window
+    threading.Thread(target=preload_heavy_modules, daemon=True).start()
     sys.exit(app.exec_())
 
 
@@ -1,7 +1,8 @@
 import React from 'react';
+import axios from 'axios';
 import { Chart as ChartJS, ArcElement, CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend, PointElement, LineElement } from 'chart.js';
 import { Pie, Bar, Line } from 'react-chartjs-2';
-import { PieChart, BarChart3, TrendingUp } from 'lucide-react';
+import { PieChart, BarChart3, TrendingUp, Activity } from 'lucide-react';
 
 ChartJS.register(ArcElement, CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend, PointElement, LineElement);
 
@@ -168,6 +169,10 @@ function ChartsSection({ dataset }) {
     },
   };
 
+  // Histograms are binned over every row, so they're drawn by the server
+  // (GET /api/charts/); the browser revalidates the image with its ETag
+  const histogramUrl = `${axios.defaults.baseURL}/api/charts/${dataset.id}/histograms/svg/?width=1200&height=320`;
+
   return (
     <div className="charts-grid">
       <div className="card">
@@ -200,6 +205,20 @@ function ChartsSection({ dataset }) {
         </div>
       </div>
 
+      <div className="card" style={{ gridColumn: '1 / -1' }}>
+        <h3>
+          <Activity size={20} />
+          Parameter Distributions
+        </h3>
+        <div className="chart-container">
+          <img
+            src={histogramUrl}
+            alt="Flowrate, pressure and temperature histograms"
+            style={{ width: '100%', height: '100%', objectFit: 'contain' }}
+          />
+        </div>
+      </div>
+
       <div className="card">
         <h3>Quick Stats</h3>
         <div style={{ padding: '20px' }}>
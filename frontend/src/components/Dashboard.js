@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { Download, BarChart3 } from 'lucide-react';
 import UploadSection from './UploadSection';
@@ -13,12 +13,61 @@ function Dashboard({ username, onLogout }) {
   const [currentDataset, setCurrentDataset] = useState(null);  // Currently displayed dataset
   const [history, setHistory] = useState([]);  // List of last 5 uploaded datasets
   const [loading, setLoading] = useState(false);  // Loading state while fetching data
+  const [anomalies, setAnomalies] = useState(null);  // Outliers flagged in the current dataset
+  const [includeAnomalies, setIncludeAnomalies] = useState(false);  // Add an anomalies section to the PDF
+  const [ingestProgress, setIngestProgress] = useState(null);  // Latest 'progress' event: rows the server has stored
+  const currentId = useRef(null);  // Shown dataset's ID, for handlers created on mount
+  const streamOpen = useRef(false);  // Whether /api/events/ is connected and keeps the history current
 
-  // Load history on component mount
   useEffect(() => {
-    fetchHistory();
+    currentId.current = currentDataset ? currentDataset.id : null;
+  }, [currentDataset?.id]);
+
+  // Live updates: /api/events/ pushes upload progress and history changes, so
+  // the history list is patched in place rather than refetched after every
+  // action. It is fetched in full whenever the stream (re)connects, since
+  // events sent while disconnected aren't replayed, and once if the stream
+  // isn't available at all.
+  useEffect(() => {
+    if (!window.EventSource) {
+      fetchHistory();
+      return undefined;
+    }
+    let opened = false;
+    const source = new EventSource(`${axios.defaults.baseURL}/api/events/`);
+    const on = (name, handler) => source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+    source.onopen = () => {
+      opened = streamOpen.current = true;
+      fetchHistory();
+    };
+    source.onerror = () => {
+      streamOpen.current = false;
+      if (!opened) {
+        opened = true;  // Fall back to fetching without live updates
+        fetchHistory();
+      }
+    };
+    on('progress', setIngestProgress);
+    on('ready', upsertHistory);
+    on('updated', upsertHistory);
+    on('evicted', (data) => removeFromHistory(data.id));
+    on('resync', () => fetchHistory());
+    return () => source.close();
   }, []);
 
+  // Fetch flagged outliers whenever a different dataset is shown
+  useEffect(() => {
+    setAnomalies(null);
+    if (!currentDataset) return;
+    let cancelled = false;
+    axios.get(`/api/anomalies/${currentDataset.id}/`)
+      .then((response) => {
+        if (!cancelled) setAnomalies(response.data);
+      })
+      .catch((error) => console.error('Failed to fetch anomalies:', error));
+    return () => { cancelled = true; };
+  }, [currentDataset?.id, currentDataset?.total_count]);
+
   // Fetch list of previously uploaded datasets
   const fetchHistory = async () => {
     try {
@@ -26,8 +75,8 @@ function Dashboard({ username, onLogout }) {
       const historyData = response.data;
       setHistory(historyData);
 
-      if (currentDataset) {
-        const exists = historyData.some((ds) => ds.id === currentDataset.id);
+      if (currentId.current !== null) {
+        const exists = historyData.some((ds) => ds.id === currentId.current);
         if (!exists) {
           if (historyData.length > 0) {
             try {
@@ -47,10 +96,24 @@ function Dashboard({ username, onLogout }) {
     }
   };
 
-  // Called when user uploads new CSV file - updates current dataset and refreshes history
+  // A dataset became ready or was appended to: add or replace its entry, newest first
+  const upsertHistory = (dataset) => {
+    setIngestProgress(null);
+    setHistory((items) => [dataset, ...items.filter((ds) => ds.id !== dataset.id)]
+      .sort((a, b) => new Date(b.uploaded_at) - new Date(a.uploaded_at)));
+  };
+
+  // Retention deleted a dataset; if it was the one shown, fetchHistory shows the newest instead
+  const removeFromHistory = (datasetId) => {
+    setHistory((items) => items.filter((ds) => ds.id !== datasetId));
+    if (currentId.current === datasetId) fetchHistory();
+  };
+
+  // Called when user uploads new CSV file - updates current dataset; its 'ready'
+  // event adds it to the history, which is only refetched without the stream
   const handleUploadSuccess = (dataset) => {
     setCurrentDataset(dataset);
-    fetchHistory();  // Refresh history list after new upload
+    if (!streamOpen.current) fetchHistory();
   };
 
   // Load a previously uploaded dataset by ID - called when user selects from history
@@ -72,6 +135,7 @@ function Dashboard({ username, onLogout }) {
     
     try {
       const response = await axios.get(`/api/report/${currentDataset.id}/`, {
+        params: includeAnomalies ? { anomalies: 1 } : {},
         responseType: 'blob'  // Get binary PDF data
       });
       
@@ -107,7 +171,7 @@ function Dashboard({ username, onLogout }) {
         </div>
       </div>
 
-      <UploadSection onUploadSuccess={handleUploadSuccess} />
+      <UploadSection onUploadSuccess={handleUploadSuccess} serverProgress={ingestProgress} />
 
       {loading && (
         <div style={{ textAlign: 'center', padding: '40px 20px' }}>
@@ -127,13 +191,22 @@ function Dashboard({ username, onLogout }) {
 
           <ChartsSection dataset={currentDataset} />
           
-          <DataTable equipment={currentDataset.equipment} />
+          <DataTable equipment={currentDataset.equipment} anomalies={anomalies} />
 
           <div className="card" style={{ marginTop: '30px' }}>
             <button className="btn btn-success" onClick={handleDownloadPDF}>
               <Download size={16} />
               Download PDF Report
             </button>
+            <label style={{ marginLeft: '16px', color: '#64748b', fontSize: '14px' }}>
+              <input
+                type="checkbox"
+                checked={includeAnomalies}
+                onChange={(e) => setIncludeAnomalies(e.target.checked)}
+                style={{ marginRight: '6px' }}
+              />
+              Include anomalies
+            </label>
           </div>
         </>
       )}
@@ -1,7 +1,8 @@
 import React, { useState } from 'react';
-import { Table, Search, ArrowUp, ArrowDown } from 'lucide-react';
+import { Table, Search, ArrowUp, ArrowDown, AlertTriangle } from 'lucide-react';
 
-function DataTable({ equipment }) {
+// anomalies: optional response of /api/anomalies/<id>/ - flagged rows are highlighted
+function DataTable({ equipment, anomalies }) {
   const [sortColumn, setSortColumn] = useState('equipment_name');
   const [sortOrder, setSortOrder] = useState('asc');
   const [searchTerm, setSearchTerm] = useState('');
@@ -28,6 +29,23 @@ function DataTable({ equipment }) {
     item.equipment_type.toLowerCase().includes(searchTerm.toLowerCase())
   );
 
+  // Equipment id -> metrics flagged for that row
+  const flaggedMetrics = {};
+  (anomalies?.anomalies || []).forEach((anomaly) => {
+    flaggedMetrics[anomaly.id] = new Set(anomaly.reasons.map((reason) => reason.metric));
+  });
+
+  const describeAnomaly = (id) => {
+    const anomaly = anomalies.anomalies.find((a) => a.id === id);
+    return anomaly.reasons.map((reason) => `${reason.metric}: ${reason.method}`).join(', ');
+  };
+
+  const metricCell = (item, metric) => (
+    <td className={flaggedMetrics[item.id]?.has(metric) ? 'anomaly-cell' : undefined}>
+      {item[metric].toFixed(2)}
+    </td>
+  );
+
   const handleSort = (column) => {
     if (sortColumn === column) {
       setSortOrder(sortOrder === 'asc' ? 'desc' : 'asc');
@@ -66,6 +84,12 @@ function DataTable({ equipment }) {
 
       <p style={{ marginBottom: '15px', color: '#64748b', fontSize: '14px' }}>
         Showing <strong>{filteredEquipment.length}</strong> of <strong>{equipment.length}</strong> items
+        {anomalies?.anomaly_count > 0 && (
+          <span style={{ marginLeft: '12px', color: '#dc2626', display: 'inline-flex', alignItems: 'center', gap: '4px' }}>
+            <AlertTriangle size={14} />
+            <strong>{anomalies.anomaly_count}</strong> flagged as anomalies
+          </span>
+        )}
       </p>
 
       <div style={{ overflowX: 'auto' }}>
@@ -81,7 +105,12 @@ function DataTable({ equipment }) {
           </thead>
           <tbody>
             {filteredEquipment.map((item, idx) => (
-              <tr key={item.id} style={{ animation: `fadeIn 0.3s ease-out ${idx * 0.05}s` }}>
+              <tr
+                key={item.id}
+                className={flaggedMetrics[item.id] ? 'anomaly-row' : undefined}
+                title={flaggedMetrics[item.id] ? `Anomaly - ${describeAnomaly(item.id)}` : undefined}
+                style={{ animation: `fadeIn 0.3s ease-out ${idx * 0.05}s` }}
+              >
                 <td><strong>{item.equipment_name}</strong></td>
                 <td>
                   <span style={{
@@ -95,9 +124,9 @@ function DataTable({ equipment }) {
                     {item.equipment_type}
                   </span>
                 </td>
-                <td>{item.flowrate.toFixed(2)}</td>
-                <td>{item.pressure.toFixed(2)}</td>
-                <td>{item.temperature.toFixed(2)}</td>
+                {metricCell(item, 'flowrate')}
+                {metricCell(item, 'pressure')}
+                {metricCell(item, 'temperature')}
               </tr>
             ))}
           </tbody>
@@ -1,14 +1,109 @@
-import React, { useState } from 'react';
+import React, { useState, useRef } from 'react';
 import axios from 'axios';
 import { Upload, CheckCircle, AlertCircle } from 'lucide-react';
 
-function UploadSection({ onUploadSuccess }) {
+// Files larger than this use the resumable chunked upload API
+const CHUNKED_UPLOAD_THRESHOLD = 50 * 1024 * 1024;
+const CHUNK_SIZE = 5 * 1024 * 1024;
+const CHUNK_RETRIES = 3;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Hex SHA-256 of a chunk, or null where WebCrypto isn't available (non-HTTPS origins)
+const sha256Hex = async (buffer) => {
+  if (!window.crypto || !window.crypto.subtle) return null;
+  const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, '0'))
+    .join('');
+};
+
+// Upload a large file as numbered chunks: initiate, PUT each chunk, then complete.
+// Passing the previous uploadId resumes an interrupted upload - only the chunks
+// the server hasn't received are sent. Returns the dataset from the complete call.
+const uploadChunked = async (file, uploadId, onUploadId, onProgress) => {
+  let upload = null;
+  if (uploadId) {
+    try {
+      const response = await axios.get(`/api/uploads/${uploadId}/`);
+      if (response.data.status === 'pending') upload = response.data;
+    } catch (err) {
+      upload = null;
+    }
+  }
+  if (!upload) {
+    const response = await axios.post('/api/uploads/', {
+      filename: file.name,
+      total_size: file.size,
+      chunk_size: CHUNK_SIZE,
+    });
+    upload = response.data;
+    onUploadId(upload.id);
+  }
+
+  const chunkSize = upload.chunk_size;
+  const totalChunks = Math.max(Math.ceil(file.size / chunkSize), 1);
+  const received = new Set(upload.received_chunks);
+  let sent = 0;
+  received.forEach((index) => {
+    sent += Math.min(chunkSize, file.size - index * chunkSize);
+  });
+  onProgress(sent / file.size);
+
+  for (let index = 0; index < totalChunks; index++) {
+    if (received.has(index)) continue;
+    const buffer = await file.slice(index * chunkSize, (index + 1) * chunkSize).arrayBuffer();
+    const checksum = await sha256Hex(buffer);
+    const headers = { 'Content-Type': 'application/octet-stream' };
+    if (checksum) headers['X-Chunk-SHA256'] = checksum;
+
+    // Chunk PUTs are idempotent, so network failures are simply retried with backoff
+    for (let attempt = 0; ; attempt++) {
+      try {
+        await axios.put(`/api/uploads/${upload.id}/chunks/${index}/`, buffer, { headers });
+        break;
+      } catch (err) {
+        if (err.response || attempt >= CHUNK_RETRIES) throw err;
+        await sleep(500 * 2 ** attempt);
+      }
+    }
+    sent += buffer.byteLength;
+    onProgress(sent / file.size);
+  }
+
+  // 409 means the server is still parsing the last chunks, 429 that it is busy
+  // with other uploads (Retry-After says for how long)
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await axios.post(`/api/uploads/${upload.id}/complete/`, { total_chunks: totalChunks });
+      return response.data.data;
+    } catch (err) {
+      const status = err.response?.status;
+      if ((status !== 409 && status !== 429) || attempt >= 5) throw err;
+      const retryAfter = Number(err.response.headers['retry-after']);
+      await sleep(retryAfter > 0 ? retryAfter * 1000 : 500 * 2 ** attempt);
+    }
+  }
+};
+
+function UploadSection({ onUploadSuccess, serverProgress }) {
   const [file, setFile] = useState(null);
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(0);  // Fraction of the file sent (0-1)
+  const pendingUploads = useRef({});  // File key -> chunked upload ID, used to resume after a failure
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
   const [dragActive, setDragActive] = useState(false);
 
+  // Once the file is sent, the server's progress events (see Dashboard) show
+  // how much of it has been stored; chunked uploads are stored as they arrive
+  const uploadLabel = () => {
+    const stored = serverProgress && file && serverProgress.name === file.name ? serverProgress : null;
+    if (!stored || progress < 1) return `Uploading... ${Math.round(progress * 100)}%`;
+    const percent = stored.total_bytes ? ` ${Math.round((stored.bytes * 100) / stored.total_bytes)}%` : '';
+    return `Processing...${percent} (${stored.rows.toLocaleString()} rows)`;
+  };
+
   const handleDrag = (e) => {
     e.preventDefault();
     e.stopPropagation();
@@ -49,22 +144,37 @@ function UploadSection({ onUploadSuccess }) {
     setError('');
     setSuccess('');
 
-    const formData = new FormData();
-    formData.append('file', file);
+    setProgress(0);
 
     try {
-      const response = await axios.post('https://equipment-visualizer-api.onrender.com/api/upload/', formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      });
+      let dataset;
+      if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        const fileKey = `${file.name}:${file.size}:${file.lastModified}`;
+        dataset = await uploadChunked(
+          file,
+          pendingUploads.current[fileKey],
+          (uploadId) => { pendingUploads.current[fileKey] = uploadId; },
+          setProgress
+        );
+        delete pendingUploads.current[fileKey];
+      } else {
+        const formData = new FormData();
+        formData.append('file', file);
+        const response = await axios.post('/api/upload/', formData, {
+          headers: {
+            'Content-Type': 'multipart/form-data',
+          },
+          onUploadProgress: (e) => e.total && setProgress(e.loaded / e.total),
+        });
+        dataset = response.data.data;
+      }
 
       setSuccess('File uploaded and analyzed successfully');
       setFile(null);
       document.getElementById('file-input').value = '';
       
       setTimeout(() => {
-        onUploadSuccess(response.data.data);
+        onUploadSuccess(dataset);
       }, 500);
     } catch (error) {
       setError(error.response?.data?.error || 'Upload failed. Please try again.');
@@ -163,7 +273,7 @@ function UploadSection({ onUploadSuccess }) {
           style={{ marginTop: '20px', width: '100%' }}
         >
           <Upload size={16} />
-          {uploading ? 'Uploading...' : 'Upload & Analyze'}
+          {uploading ? uploadLabel() : 'Upload & Analyze'}
         </button>
       </form>
       